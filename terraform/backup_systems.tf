@@ -306,6 +306,11 @@ resource "aws_lambda_function" "db_backup" {
       DB_NAME       = aws_db_instance.main.db_name
       PROJECT_NAME  = var.project_name
       ENVIRONMENT   = var.environment
+      BACKUP_STREAMING = "true"
+      BACKUP_DUMP_FORMAT = "custom"
+      BACKUP_DUMP_JOBS   = "4"
+      BACKUP_VERIFY_JOBS = "4"
+      BACKUP_VERIFY_ENDPOINT = var.backup_verify_endpoint
     }
   }
   
@@ -326,6 +331,16 @@ data "archive_file" "db_backup_zip" {
     })
     filename = "index.py"
   }
+  
+  source {
+    content = file("${path.module}/lambda/logical_dump.py")
+    filename = "logical_dump.py"
+  }
+  
+  source {
+    content = file("${path.module}/lambda/lambda_runtime.py")
+    filename = "lambda_runtime.py"
+  }
 }
 
 # IAM Role for Lambda backup function
@@ -367,11 +382,20 @@ resource "aws_iam_role_policy" "lambda_backup_policy" {
         Action = [
           "s3:PutObject",
           "s3:PutObjectAcl",
+          "s3:PutObjectTagging",
+          "s3:AbortMultipartUpload",
           "s3:GetObject",
           "s3:DeleteObject"
         ]
         Resource = "${aws_s3_bucket.backups.arn}/*"
       },
+      {
+        Effect = "Allow"
+        Action = [
+          "s3:ListBucket"
+        ]
+        Resource = aws_s3_bucket.backups.arn
+      },
       {
         Effect = "Allow"
         Action = [
@@ -417,6 +441,39 @@ resource "aws_lambda_permission" "allow_eventbridge" {
   source_arn    = aws_cloudwatch_event_rule.backup_schedule.arn
 }
 
+# Restore the latest backup into a scratch database and compare it with the dump-time checksums,
+# only when a scratch instance is configured; verification never restores into the production instance
+resource "aws_cloudwatch_event_rule" "backup_verify_schedule" {
+  count = var.backup_verify_endpoint != "" ? 1 : 0
+  
+  name                = "${var.project_name}-backup-verify-schedule-${var.environment}"
+  description         = "Trigger restore verification of the latest database backup"
+  schedule_expression = "cron(30 4 * * ? *)"  # 4:30 AM daily
+  
+  tags = {
+    Name = "${var.project_name}-backup-verify-schedule-${var.environment}"
+  }
+}
+
+resource "aws_cloudwatch_event_target" "backup_verify_lambda" {
+  count = var.backup_verify_endpoint != "" ? 1 : 0
+  
+  rule      = aws_cloudwatch_event_rule.backup_verify_schedule[0].name
+  target_id = "BackupVerifyLambdaTarget"
+  arn       = aws_lambda_function.db_backup.arn
+  input     = jsonencode({ action = "verify_backup" })
+}
+
+resource "aws_lambda_permission" "allow_eventbridge_verify" {
+  count = var.backup_verify_endpoint != "" ? 1 : 0
+  
+  statement_id  = "AllowVerifyExecutionFromEventBridge"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.db_backup.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.backup_verify_schedule[0].arn
+}
+
 # CloudWatch Alarms for backup monitoring
 resource "aws_cloudwatch_metric_alarm" "backup_failures" {
   alarm_name          = "${var.project_name}-backup-failures-${var.environment}"
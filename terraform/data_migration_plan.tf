@@ -143,6 +143,41 @@ data "archive_file" "data_migration_zip" {
     content = file("${path.module}/lambda/data_validators.py")
     filename = "data_validators.py"
   }
+  
+  source {
+    content = file("${path.module}/lambda/transfer_engine.py")
+    filename = "transfer_engine.py"
+  }
+  
+  source {
+    content = file("${path.module}/lambda/migration_scheduler.py")
+    filename = "migration_scheduler.py"
+  }
+  
+  source {
+    content = file("${path.module}/lambda/incremental_sync.py")
+    filename = "incremental_sync.py"
+  }
+  
+  source {
+    content = file("${path.module}/lambda/cdc_replication.py")
+    filename = "cdc_replication.py"
+  }
+  
+  source {
+    content = file("${path.module}/lambda/columnar_backup.py")
+    filename = "columnar_backup.py"
+  }
+  
+  source {
+    content = file("${path.module}/lambda/schema_deferral.py")
+    filename = "schema_deferral.py"
+  }
+  
+  source {
+    content = file("${path.module}/lambda/lambda_runtime.py")
+    filename = "lambda_runtime.py"
+  }
 }
 
 # IAM role for migration Lambda
@@ -195,6 +230,14 @@ resource "aws_iam_role_policy" "migration_lambda_policy" {
           "arn:aws:secretsmanager:${var.aws_region}:${data.aws_caller_identity.current.account_id}:secret:supabase-connection*"
         ]
       },
+      {
+        # Batch reads still need GetSecretValue on each secret; the action itself has no resource scope
+        Effect = "Allow"
+        Action = [
+          "secretsmanager:BatchGetSecretValue"
+        ]
+        Resource = "*"
+      },
       {
         Effect = "Allow"
         Action = [
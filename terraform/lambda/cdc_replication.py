@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+CDC Replication Module
+DM_CRM Sales Dashboard - Change Data Capture
+
+Streams row changes from the source database through a logical replication
+slot (wal2json, format version 2) and applies them to the target in batched
+transactions. The slot position is only confirmed after the target commit,
+so an interrupted run replays from the last applied source transaction.
+"""
+
+import json
+import logging
+import re
+import select
+import time
+from decimal import Decimal
+from typing import Dict, Any, Optional, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+class ReplicationError(Exception):
+    """Custom exception for change data capture errors"""
+    pass
+
+class ChangeApplier:
+    """Apply decoded wal2json changes to the target in order, batching runs of similar statements"""
+
+    def __init__(self, target_conn, page_size: int = 500):
+        self.target_conn = target_conn
+        self.page_size = page_size
+        self.counts = {'inserted_or_updated': 0, 'deleted': 0, 'truncated': 0}
+
+    @staticmethod
+    def _key(change: Dict[str, Any], section: str) -> List[Dict[str, Any]]:
+        """Primary key columns (name, type, value) taken from the given change section"""
+
+        key_names = [pk['name'] for pk in change.get('pk', [])]
+        columns = {column['name']: column for column in change.get(section, [])}
+        return [columns[name] for name in key_names if name in columns]
+
+    def apply(self, changes: List[Dict[str, Any]]) -> None:
+        """Apply a list of changes in source order inside the current target transaction"""
+
+        group: List[Dict[str, Any]] = []
+        group_signature: Optional[Tuple] = None
+
+        for change in changes:
+            for operation in self._operations(change):
+                signature = operation['signature']
+                if group and signature != group_signature:
+                    self._flush(group)
+                    group = []
+                group_signature = signature
+                group.append(operation)
+
+        if group:
+            self._flush(group)
+
+    def _operations(self, change: Dict[str, Any]) -> List[Dict[str, Any]]:
+        action = change['action']
+        table = f"{change['schema']}.{change['table']}"
+
+        if action == 'T':
+            return [{'signature': ('truncate', table), 'table': table}]
+
+        if action == 'D':
+            key = self._key(change, 'identity')
+            return [self._delete(table, key)]
+
+        if action in ('I', 'U'):
+            operations = []
+            key_names = tuple(pk['name'] for pk in change.get('pk', []))
+            if not key_names:
+                raise ReplicationError(f"Change for {table} has no primary key; set a primary key or REPLICA IDENTITY")
+
+            if action == 'U' and change.get('identity'):
+                old_key = self._key(change, 'identity')
+                new_key = self._key(change, 'columns')
+                if [c['value'] for c in old_key] != [c['value'] for c in new_key]:
+                    operations.append(self._delete(table, old_key))
+
+            columns = change['columns']
+            operations.append({
+                'signature': ('upsert', table, tuple(c['name'] for c in columns), tuple(c['type'] for c in columns), key_names),
+                'table': table,
+                'columns': columns,
+                'key_names': key_names
+            })
+            return operations
+
+        return []
+
+    @staticmethod
+    def _delete(table: str, key: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            'signature': ('delete', table, tuple(c['name'] for c in key), tuple(c['type'] for c in key)),
+            'table': table,
+            'key': key
+        }
+
+    def _flush(self, group: List[Dict[str, Any]]) -> None:
+        import psycopg2.extras
+
+        cursor = self.target_conn.cursor()
+        kind = group[0]['signature'][0]
+        table = group[0]['table']
+
+        if kind == 'truncate':
+            cursor.execute(f"TRUNCATE TABLE {table} CASCADE")
+            self.counts['truncated'] += 1
+            return
+
+        if kind == 'delete':
+            key = group[0]['key']
+            key_list = ', '.join(f'"{c["name"]}"' for c in key)
+            template = '(' + ', '.join(f"%s::{c['type']}" for c in key) + ')'
+            values = [tuple(c['value'] for c in operation['key']) for operation in group]
+            psycopg2.extras.execute_values(
+                cursor, f"DELETE FROM {table} WHERE ({key_list}) IN (VALUES %s)",
+                values, template=template, page_size=self.page_size
+            )
+            self.counts['deleted'] += len(values)
+            return
+
+        # ON CONFLICT cannot touch a row twice in one statement, so keep the latest image per key
+        columns = group[0]['columns']
+        key_names = group[0]['key_names']
+        latest: Dict[tuple, tuple] = {}
+        for operation in group:
+            values = {c['name']: c['value'] for c in operation['columns']}
+            latest[tuple(values[name] for name in key_names)] = tuple(c['value'] for c in operation['columns'])
+
+        column_list = ', '.join(f'"{c["name"]}"' for c in columns)
+        key_list = ', '.join(f'"{name}"' for name in key_names)
+        template = '(' + ', '.join(f"%s::{c['type']}" for c in columns) + ')'
+        updates = [f'"{c["name"]}" = EXCLUDED."{c["name"]}"' for c in columns if c['name'] not in key_names]
+        conflict_action = f"DO UPDATE SET {', '.join(updates)}" if updates else "DO NOTHING"
+
+        psycopg2.extras.execute_values(
+            cursor, f"INSERT INTO {table} ({column_list}) VALUES %s ON CONFLICT ({key_list}) {conflict_action}",
+            list(latest.values()), template=template, page_size=self.page_size
+        )
+        self.counts['inserted_or_updated'] += len(latest)
+
+class ChangeStreamer:
+    """Logical replication slot management and bounded change streaming"""
+
+    PLUGIN = 'wal2json'
+
+    def __init__(self, connection_config: Dict[str, str], slot_name: str, tables: List[str],
+                 batch_size: int = 1000, application_name: str = 'migration-cdc'):
+        self.config = connection_config
+        self.slot_name = re.sub(r'[^a-z0-9_]', '_', slot_name.lower())
+        self.tables = tables
+        self.batch_size = batch_size
+        self.application_name = application_name
+
+    def create_slot(self, conn) -> Dict[str, Any]:
+        """Create the replication slot if it does not exist yet"""
+
+        cursor = conn.cursor()
+        cursor.execute("SELECT confirmed_flush_lsn FROM pg_replication_slots WHERE slot_name = %s", (self.slot_name,))
+        existing = cursor.fetchone()
+        if existing:
+            logger.info(f"Replication slot {self.slot_name} already exists")
+            return {'slot_name': self.slot_name, 'created': False, 'lsn': existing[0]}
+
+        cursor.execute("SELECT lsn FROM pg_create_logical_replication_slot(%s, %s)", (self.slot_name, self.PLUGIN))
+        lsn = cursor.fetchone()[0]
+        conn.commit()
+
+        logger.info(f"Created replication slot {self.slot_name} at {lsn}")
+        return {'slot_name': self.slot_name, 'created': True, 'lsn': lsn}
+
+    def drop_slot(self, conn) -> bool:
+        """Drop the replication slot; returns False if it did not exist"""
+
+        cursor = conn.cursor()
+        cursor.execute("SELECT pg_drop_replication_slot(slot_name) FROM pg_replication_slots WHERE slot_name = %s", (self.slot_name,))
+        dropped = cursor.rowcount > 0
+        conn.commit()
+        return dropped
+
+    def slot_status(self, conn) -> Dict[str, Any]:
+        """Report slot position and replication lag in bytes of WAL"""
+
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT active, confirmed_flush_lsn, pg_current_wal_lsn(),
+                   pg_wal_lsn_diff(pg_current_wal_lsn(), confirmed_flush_lsn)
+            FROM pg_replication_slots
+            WHERE slot_name = %s
+        """, (self.slot_name,))
+        row = cursor.fetchone()
+
+        if not row:
+            return {'slot_name': self.slot_name, 'exists': False}
+
+        return {
+            'slot_name': self.slot_name,
+            'exists': True,
+            'active': row[0],
+            'confirmed_flush_lsn': row[1],
+            'current_wal_lsn': row[2],
+            'lag_bytes': int(row[3]) if row[3] is not None else None
+        }
+
+    def _connect_replication(self):
+        import psycopg2.extras
+
+        return psycopg2.connect(
+            host=self.config['host'],
+            port=self.config['port'],
+            database=self.config['dbname'],
+            user=self.config['username'],
+            password=self.config['password'],
+            connect_timeout=30,
+            application_name=self.application_name,
+            connection_factory=psycopg2.extras.LogicalReplicationConnection
+        )
+
+    def stream_changes(self, target_conn, max_seconds: float, idle_seconds: float = 10.0) -> Dict[str, Any]:
+        """
+        Stream changes into the target until max_seconds elapse or the slot is idle.
+
+        Changes are buffered per source transaction and applied once the
+        source commit is seen; a target transaction is committed every
+        batch_size changes and the slot is then advanced to that commit.
+        The run is caught up when it stops because the slot went idle with
+        no source transaction left open.
+        """
+
+        replication_conn = self._connect_replication()
+        cursor = replication_conn.cursor()
+        cursor.start_replication(
+            slot_name=self.slot_name,
+            decode=True,
+            options={
+                'format-version': '2',
+                'include-pk': '1',
+                'include-types': '1',
+                'include-timestamp': '1',
+                'add-tables': ','.join(f"public.{table}" for table in self.tables)
+            }
+        )
+
+        applier = ChangeApplier(target_conn)
+        transaction: List[Dict[str, Any]] = []
+        batch: List[Dict[str, Any]] = []
+        batch_commit_lsn = None
+        last_commit_timestamp = None
+        transaction_open = False
+        caught_up = False
+        stats = {'transactions_applied': 0, 'changes_applied': 0, 'batches_committed': 0, 'flushed_lsn': None}
+
+        def commit_batch():
+            if not batch:
+                return
+            applier.apply(batch)
+            target_conn.commit()
+            cursor.send_feedback(flush_lsn=batch_commit_lsn, force=True)
+            stats['changes_applied'] += len(batch)
+            stats['batches_committed'] += 1
+            stats['flushed_lsn'] = batch_commit_lsn
+            batch.clear()
+
+        started = time.monotonic()
+        last_message = started
+
+        try:
+            while time.monotonic() - started < max_seconds:
+                message = cursor.read_message()
+
+                if message is None:
+                    if time.monotonic() - last_message > idle_seconds:
+                        caught_up = not transaction_open
+                        break
+                    select.select([cursor], [], [], 1.0)
+                    continue
+
+                last_message = time.monotonic()
+                change = json.loads(message.payload, parse_float=Decimal)
+                action = change.get('action')
+
+                if action == 'B':
+                    transaction = []
+                    transaction_open = True
+                elif action == 'C':
+                    batch.extend(transaction)
+                    transaction = []
+                    transaction_open = False
+                    batch_commit_lsn = message.data_start
+                    last_commit_timestamp = change.get('timestamp')
+                    stats['transactions_applied'] += 1
+                    if len(batch) >= self.batch_size:
+                        commit_batch()
+                elif action in ('I', 'U', 'D', 'T'):
+                    transaction.append(change)
+
+            # Changes of a source transaction still open are replayed on the next run
+            commit_batch()
+            if batch_commit_lsn is not None:
+                cursor.send_feedback(flush_lsn=batch_commit_lsn, force=True)
+
+        except Exception:
+            target_conn.rollback()
+            raise
+        finally:
+            replication_conn.close()
+
+        stats.update(applier.counts)
+        stats['seconds'] = round(time.monotonic() - started, 3)
+        stats['last_commit_timestamp'] = last_commit_timestamp
+        stats['caught_up'] = caught_up
+        return stats
+
+    @staticmethod
+    def replication_lag_bytes(stream_stats: Dict[str, Any], slot_status: Dict[str, Any]) -> Optional[int]:
+        """
+        WAL the target is behind by after a stream run.
+
+        A caught-up run reports 0: the slot's flushed position stops at the
+        last applied commit while the source keeps writing WAL that holds no
+        changes for the replicated tables, so the raw difference would keep
+        growing while the source is idle.
+        """
+
+        if stream_stats.get('caught_up'):
+            return 0
+
+        return slot_status.get('lag_bytes')
@@ -7,31 +7,37 @@ This function handles data migration from Supabase to AWS RDS PostgreSQL
 with comprehensive validation, backup, and monitoring.
 """
 
+# Imported first so that its import timer sees the rest of init
+from lambda_runtime import get_client, report_cold_start, secret_cache, is_authentication_failure
+
+import hashlib
 import json
-import boto3
 import logging
 import os
+import threading
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timezone
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Callable, TYPE_CHECKING
 import psycopg2
-import psycopg2.extras
-from botocore.exceptions import ClientError
 
-# Import custom modules
-from migration_utils import MigrationUtils
-from data_validators import DataValidators
+# Import custom modules; every action uses these two
+from migration_utils import MigrationUtils, MigrationCheckpoint, StreamingBackupWriter, BackupTableReader
+from data_validators import DataValidators, ValidationConnectionPool, ChecksumComparator
+
+# Feature modules, botocore and psycopg2.extras are imported by the actions that use
+# them, so that e.g. a validate_source cold start does not load replication or arrow code
+if TYPE_CHECKING:
+    from transfer_engine import CopyTransferEngine, RangePartitioner
+    from cdc_replication import ChangeStreamer
+    from schema_deferral import SchemaDeferral
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# AWS clients
-secrets_client = boto3.client('secretsmanager')
-s3_client = boto3.client('s3')
-sns_client = boto3.client('sns')
-rds_client = boto3.client('rds')
-
 # Environment variables
 PROJECT_NAME = os.environ.get('PROJECT_NAME', '${project_name}')
 ENVIRONMENT = os.environ.get('ENVIRONMENT', '${environment}')
@@ -40,29 +46,232 @@ TARGET_DB_SECRET_ARN = os.environ.get('TARGET_DB_SECRET_ARN')
 MIGRATION_BUCKET = os.environ.get('MIGRATION_BUCKET')
 KMS_KEY_ID = os.environ.get('KMS_KEY_ID')
 SNS_TOPIC_ARN = os.environ.get('SNS_TOPIC_ARN')
+COPY_FORMAT = os.environ.get('MIGRATION_COPY_FORMAT', 'binary')
+COPY_CHUNK_SIZE = int(os.environ.get('MIGRATION_COPY_CHUNK_SIZE', str(1024 * 1024)))
+COPY_BUFFER_CHUNKS = int(os.environ.get('MIGRATION_COPY_BUFFER_CHUNKS', '16'))
+STREAM_BATCH_SIZE = int(os.environ.get('MIGRATION_STREAM_BATCH_SIZE', '2000'))
+BACKUP_PART_SIZE = int(os.environ.get('MIGRATION_BACKUP_PART_SIZE', str(8 * 1024 * 1024)))
+BACKUP_FORMAT = os.environ.get('MIGRATION_BACKUP_FORMAT', 'copy-text')
+RESTORE_DEFER_SCHEMA = os.environ.get('MIGRATION_RESTORE_DEFER_SCHEMA', 'true').lower() == 'true'
+DEFER_SCHEMA = os.environ.get('MIGRATION_DEFER_SCHEMA', 'false').lower() == 'true'
+DEFERRED_SCHEMA_ARTIFACT = 'deferred_schema.json'
+MAINTENANCE_WORK_MEM = os.environ.get('MIGRATION_MAINTENANCE_WORK_MEM', '256MB')
+POOL_MAX_IDLE = int(os.environ.get('MIGRATION_POOL_MAX_IDLE', '8'))
+POOL_MAX_IDLE_SECONDS = int(os.environ.get('MIGRATION_POOL_MAX_IDLE_SECONDS', '240'))
+POOL_PROBE_IDLE_SECONDS = float(os.environ.get('MIGRATION_POOL_PROBE_IDLE_SECONDS', '1'))
+MIGRATION_MAX_WORKERS = int(os.environ.get('MIGRATION_MAX_WORKERS', '4'))
+VALIDATION_CONCURRENCY = int(os.environ.get('MIGRATION_VALIDATION_CONCURRENCY', '4'))
+CHECKSUM_VALIDATION = os.environ.get('MIGRATION_CHECKSUM_VALIDATION', 'false').lower() == 'true'
+CHECKSUM_CHUNK_ROWS = int(os.environ.get('MIGRATION_CHECKSUM_CHUNK_ROWS', '10000'))
+CHECKSUM_MAX_DIFFERENCES = int(os.environ.get('MIGRATION_CHECKSUM_MAX_DIFFERENCES', '100'))
+PARTITION_ROW_THRESHOLD = int(os.environ.get('MIGRATION_PARTITION_ROW_THRESHOLD', '0'))
+PARTITION_COUNT = int(os.environ.get('MIGRATION_PARTITION_COUNT', '4'))
+PARTITION_WORKERS = int(os.environ.get('MIGRATION_PARTITION_WORKERS', '4'))
+TIME_BUDGET_MARGIN_SECONDS = int(os.environ.get('MIGRATION_TIME_BUDGET_MARGIN_SECONDS', '120'))
+INCREMENTAL_OVERLAP_SECONDS = int(os.environ.get('MIGRATION_INCREMENTAL_OVERLAP_SECONDS', '300'))
+INCREMENTAL_STATE_ID = 'incremental_state'
+CDC_BATCH_SIZE = int(os.environ.get('MIGRATION_CDC_BATCH_SIZE', '1000'))
+CDC_MAX_SECONDS = int(os.environ.get('MIGRATION_CDC_MAX_SECONDS', '600'))
+CDC_IDLE_SECONDS = int(os.environ.get('MIGRATION_CDC_IDLE_SECONDS', '10'))
+CDC_STATE_ID = 'cdc_state'
+CDC_TABLES = [
+    'users', 'roles', 'user_roles', 'customers', 'contacts',
+    'teams', 'services', 'processes', 'documents', 'timeline'
+]
 
 class DataMigrationError(Exception):
     """Custom exception for data migration errors"""
     pass
 
+class WarmConnectionPool:
+    """
+    Idle connections kept between actions and across warm invocations, keyed by credential fingerprint.
+    
+    A connection idle for longer than probe_idle_seconds is checked with
+    SELECT 1 before it is reused, and one idle for longer than
+    max_idle_seconds is closed. Session state is reset when a connection is
+    returned, so a reused connection behaves like a new one. When the
+    credentials for a server and user change, as after a rotation, idle
+    connections opened with the old credentials are closed.
+    """
+    
+    def __init__(self, max_idle: int = 8, max_idle_seconds: float = 240, probe_idle_seconds: float = 1.0):
+        self.max_idle = max_idle
+        self.max_idle_seconds = max_idle_seconds
+        self.probe_idle_seconds = probe_idle_seconds
+        self.idle: Dict[str, List[tuple]] = {}
+        self.fingerprints: Dict[tuple, str] = {}
+        self.lock = threading.Lock()
+        self.counters = {
+            'hits': 0, 'misses': 0, 'probe_failures': 0, 'expired': 0, 'rotated': 0,
+            'connects': 0, 'connect_seconds': 0.0, 'max_connect_seconds': 0.0
+        }
+    
+    @staticmethod
+    def fingerprint(config: Dict[str, str]) -> str:
+        material = '\0'.join(str(config[field]) for field in ('host', 'port', 'dbname', 'username', 'password'))
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def identity(config: Dict[str, str]) -> tuple:
+        return (config['host'], str(config['port']), config['dbname'], config['username'])
+    
+    def acquire(self, config: Dict[str, str], connect: Callable[[], Any]):
+        """An idle connection for config that passes the liveness probe, or a new one from connect()"""
+        
+        fingerprint = self.fingerprint(config)
+        identity = self.identity(config)
+        stale = []
+        
+        with self.lock:
+            previous = self.fingerprints.get(identity)
+            if previous and previous != fingerprint:
+                stale = [conn for conn, _ in self.idle.pop(previous, [])]
+                self.counters['rotated'] += len(stale)
+            self.fingerprints[identity] = fingerprint
+        
+        for conn in stale:
+            self._close(conn)
+        
+        while True:
+            with self.lock:
+                idle = self.idle.get(fingerprint)
+                entry = idle.pop() if idle else None
+            if entry is None:
+                break
+            
+            conn, returned_at = entry
+            idle_seconds = time.monotonic() - returned_at
+            if idle_seconds > self.max_idle_seconds:
+                self._count('expired')
+                self._close(conn)
+            elif conn.closed or (idle_seconds > self.probe_idle_seconds and not self._alive(conn)):
+                self._count('probe_failures')
+                self._close(conn)
+            else:
+                self._count('hits')
+                return conn
+        
+        self._count('misses')
+        started = time.monotonic()
+        conn = connect()
+        seconds = time.monotonic() - started
+        
+        with self.lock:
+            self.counters['connects'] += 1
+            self.counters['connect_seconds'] += seconds
+            self.counters['max_connect_seconds'] = max(self.counters['max_connect_seconds'], seconds)
+        return conn
+    
+    def release(self, config: Dict[str, str], conn) -> None:
+        """Reset a connection's session and keep it for reuse, unless it is broken or not wanted"""
+        
+        if conn.closed:
+            return
+        
+        try:
+            # reset() only rolls back and restores the default session characteristics;
+            # DISCARD ALL drops temp tables, prepared statements, advisory locks and
+            # SET values, and cannot run inside a transaction block
+            conn.reset()
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute('DISCARD ALL')
+            conn.autocommit = False
+        except psycopg2.Error:
+            self._close(conn)
+            return
+        
+        fingerprint = self.fingerprint(config)
+        with self.lock:
+            idle = self.idle.setdefault(fingerprint, [])
+            if self.fingerprints.get(self.identity(config)) == fingerprint and len(idle) < self.max_idle:
+                idle.append((conn, time.monotonic()))
+                return
+        
+        self._close(conn)
+    
+    def discard(self, conn) -> None:
+        self._close(conn)
+    
+    def snapshot(self) -> Dict[str, float]:
+        with self.lock:
+            return dict(self.counters)
+    
+    def stats(self, since: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        """Counters, as differences from a snapshot if one is given, plus the current idle count"""
+        
+        with self.lock:
+            counters = dict(self.counters)
+            idle_connections = sum(len(idle) for idle in self.idle.values())
+        
+        if since:
+            for name, value in since.items():
+                if name != 'max_connect_seconds':
+                    counters[name] -= value
+        
+        checkouts = counters['hits'] + counters['misses']
+        counters['connect_seconds'] = round(counters['connect_seconds'], 3)
+        counters['max_connect_seconds'] = round(counters['max_connect_seconds'], 3)
+        counters['hit_ratio'] = round(counters['hits'] / checkouts, 3) if checkouts else None
+        counters['idle_connections'] = idle_connections
+        return counters
+    
+    def _count(self, name: str) -> None:
+        with self.lock:
+            self.counters[name] += 1
+    
+    @staticmethod
+    def _alive(conn) -> bool:
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+    
+    @staticmethod
+    def _close(conn) -> None:
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+# Survives between warm invocations of the same execution environment
+connection_pool = WarmConnectionPool(POOL_MAX_IDLE, POOL_MAX_IDLE_SECONDS, POOL_PROBE_IDLE_SECONDS)
+
 class DatabaseConnection:
-    """Database connection manager with proper cleanup"""
+    """Database connection manager with proper cleanup; connections come from and return to connection_pool"""
     
     def __init__(self, connection_config: Dict[str, str]):
         self.config = connection_config
         self.connection = None
         
+    def _connect(self):
+        return psycopg2.connect(
+            host=self.config['host'],
+            port=self.config['port'],
+            database=self.config['dbname'],
+            user=self.config['username'],
+            password=self.config['password'],
+            connect_timeout=30,
+            application_name=f"{PROJECT_NAME}-migration"
+        )
+        
     def __enter__(self):
         try:
-            self.connection = psycopg2.connect(
-                host=self.config['host'],
-                port=self.config['port'],
-                database=self.config['dbname'],
-                user=self.config['username'],
-                password=self.config['password'],
-                connect_timeout=30,
-                application_name=f"{PROJECT_NAME}-migration"
-            )
+            try:
+                self.connection = connection_pool.acquire(self.config, self._connect)
+            except psycopg2.OperationalError as e:
+                if not (is_authentication_failure(e) and self.config.get('secret_arn')):
+                    raise
+                # The cached secret may predate a rotation; fetch it again and retry once
+                logger.warning(f"Credentials from {self.config['secret_arn']} were rejected; refreshing them")
+                secret_cache.invalidate(self.config['secret_arn'])
+                self.config = get_database_credentials(self.config['secret_arn'])
+                self.connection = connection_pool.acquire(self.config, self._connect)
             self.connection.autocommit = False
             return self.connection
         except Exception as e:
@@ -71,12 +280,20 @@ class DatabaseConnection:
     
     def __exit__(self, exc_type, exc_val, exc_tb):
         if self.connection:
-            if exc_type is None:
-                self.connection.commit()
-            else:
-                self.connection.rollback()
-            self.connection.close()
+            try:
+                if exc_type is None:
+                    self.connection.commit()
+                else:
+                    self.connection.rollback()
+            except psycopg2.Error:
+                connection_pool.discard(self.connection)
+                # A failed rollback must not hide the error that caused it
+                if exc_type is None:
+                    raise
+                return
+            connection_pool.release(self.config, self.connection)
 
+@report_cold_start
 def handler(event, context):
     """
     Main Lambda handler for data migration operations.
@@ -84,19 +301,31 @@ def handler(event, context):
     Supports different actions:
     - validate_source: Validate source database connectivity and data
     - create_backup: Create backup of target database before migration
-    - execute_migration: Execute the actual data migration
-    - validate_migration: Validate migrated data integrity
+    - execute_migration: Execute the actual data migration (defer_schema: drop indexes and foreign keys during the load)
+    - resume_migration: Continue a checkpointed migration (requires migration_id)
+    - incremental_migration: Upsert rows changed since the last run and remove deleted rows
+    - cdc_start / cdc_apply / cdc_status / cdc_stop: Logical replication change streaming
+    - restore_backup: Restore a create_backup artifact into the target (requires backup_migration_id)
+    - restore_schema: Recreate the indexes and foreign keys deferred by a run (requires migration_id)
+    - validate_migration: Validate migrated data integrity (checksum_validation: compare full row content)
     """
     
-    migration_id = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
     action = event.get('action', 'execute_migration')
+    if action in ('resume_migration', 'restore_schema') and event.get('migration_id'):
+        migration_id = event['migration_id']
+    else:
+        migration_id = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
     
     logger.info(f"Starting migration action: {action} with ID: {migration_id}")
     
+    pool_snapshot = connection_pool.snapshot()
+    
     try:
+        prefetch_database_credentials()
+        
         # Initialize migration utilities
         utils = MigrationUtils(
-            s3_client=s3_client,
+            s3_client=get_client('s3'),
             bucket_name=MIGRATION_BUCKET,
             kms_key_id=KMS_KEY_ID,
             migration_id=migration_id
@@ -108,14 +337,43 @@ def handler(event, context):
         if action == 'validate_source':
             result = validate_source_database(utils, validators)
         elif action == 'create_backup':
-            result = create_database_backup(utils)
+            result = create_database_backup(
+                utils, backup_format=event.get('backup_format'), benchmark=event.get('benchmark', False)
+            )
         elif action == 'execute_migration':
-            result = execute_data_migration(utils, validators, migration_id)
+            result = execute_data_migration(
+                utils, validators, migration_id, context, defer_schema=event.get('defer_schema', DEFER_SCHEMA)
+            )
+        elif action == 'resume_migration':
+            if not event.get('migration_id'):
+                raise DataMigrationError("resume_migration requires the migration_id of the run to resume")
+            result = execute_data_migration(utils, validators, migration_id, context, resume=True)
+        elif action == 'incremental_migration':
+            result = execute_incremental_migration(utils, validators, migration_id)
+        elif action == 'cdc_start':
+            result = start_cdc(utils)
+        elif action == 'cdc_apply':
+            result = apply_cdc_changes(utils, context)
+        elif action == 'cdc_status':
+            result = get_cdc_status(utils)
+        elif action == 'cdc_stop':
+            result = stop_cdc(utils)
+        elif action == 'restore_backup':
+            result = restore_database_backup(utils, event)
+        elif action == 'restore_schema':
+            if not event.get('migration_id'):
+                raise DataMigrationError("restore_schema requires the migration_id of the run that deferred the schema")
+            result = restore_deferred_schema(utils)
         elif action == 'validate_migration':
-            result = validate_migration_results(utils, validators)
+            result = validate_migration_results(
+                utils, validators, checksum=event.get('checksum_validation', CHECKSUM_VALIDATION)
+            )
         else:
             raise DataMigrationError(f"Unknown action: {action}")
         
+        if isinstance(result, dict):
+            result['connection_pool'] = connection_pool.stats(since=pool_snapshot)
+        
         # Send success notification
         send_notification(
             f"Migration {action} completed successfully",
@@ -156,12 +414,24 @@ def handler(event, context):
             })
         }
 
+def prefetch_database_credentials() -> None:
+    """Fetch the source and target secrets in one call so that later lookups hit the cache"""
+    
+    from botocore.exceptions import ClientError
+    
+    try:
+        secret_cache.get_many([arn for arn in (SOURCE_DB_SECRET_ARN, TARGET_DB_SECRET_ARN) if arn])
+    except ClientError as e:
+        # Reported by the lookup of the secret the action actually needs
+        logger.warning(f"Could not prefetch database credentials: {e}")
+
 def get_database_credentials(secret_arn: str) -> Dict[str, str]:
-    """Retrieve database credentials from AWS Secrets Manager"""
+    """Retrieve database credentials from AWS Secrets Manager, cached across warm invocations"""
+    
+    from botocore.exceptions import ClientError
     
     try:
-        response = secrets_client.get_secret_value(SecretId=secret_arn)
-        credentials = json.loads(response['SecretString'])
+        credentials = json.loads(secret_cache.get(secret_arn))
         
         # Validate required fields
         required_fields = ['host', 'port', 'dbname', 'username', 'password']
@@ -169,6 +439,8 @@ def get_database_credentials(secret_arn: str) -> Dict[str, str]:
             if field not in credentials:
                 raise DataMigrationError(f"Missing required credential field: {field}")
         
+        # Lets a connection that is refused refresh the secret it came from
+        credentials['secret_arn'] = secret_arn
         return credentials
     
     except ClientError as e:
@@ -178,6 +450,8 @@ def get_database_credentials(secret_arn: str) -> Dict[str, str]:
 def validate_source_database(utils: MigrationUtils, validators: DataValidators) -> Dict[str, Any]:
     """Validate source database connectivity and data integrity"""
     
+    import psycopg2.extras
+    
     logger.info("Starting source database validation")
     
     source_creds = get_database_credentials(SOURCE_DB_SECRET_ARN)
@@ -205,18 +479,27 @@ def validate_source_database(utils: MigrationUtils, validators: DataValidators)
             'contacts', 'teams', 'users', 'user_roles', 'roles'
         ]
         
-        for table in tables_to_migrate:
-            try:
-                cursor.execute(f"SELECT COUNT(*) FROM {table}")
-                count = cursor.fetchone()[0]
-                validation_results['table_counts'][table] = count
-                logger.info(f"Table {table}: {count} records")
-            except psycopg2.Error as e:
-                logger.warning(f"Could not count table {table}: {e}")
-                validation_results['table_counts'][table] = -1
-        
-        # Data integrity checks
-        validation_results['data_integrity'] = validators.validate_source_data_integrity(cursor)
+        source_pool = create_validation_pool(source_creds)
+        try:
+            with ThreadPoolExecutor(max_workers=VALIDATION_CONCURRENCY + 1) as executor:
+                count_futures = {table: executor.submit(source_pool.count_rows, table) for table in tables_to_migrate}
+                integrity_future = executor.submit(
+                    validators.validate_data_integrity_concurrently, source_pool, VALIDATION_CONCURRENCY
+                )
+                
+                for table in tables_to_migrate:
+                    try:
+                        count = count_futures[table].result()
+                        validation_results['table_counts'][table] = count
+                        logger.info(f"Table {table}: {count} records")
+                    except psycopg2.Error as e:
+                        logger.warning(f"Could not count table {table}: {e}")
+                        validation_results['table_counts'][table] = -1
+                
+                # Data integrity checks
+                validation_results['data_integrity'] = integrity_future.result()
+        finally:
+            source_pool.closeall()
         
         # Check migration readiness
         total_records = sum(count for count in validation_results['table_counts'].values() if count > 0)
@@ -227,14 +510,18 @@ def validate_source_database(utils: MigrationUtils, validators: DataValidators)
             all(check['passed'] for check in validation_results['data_integrity'].values())
         )
     
+    validation_results['peak_memory_mb'] = MigrationUtils.get_peak_memory_mb()
+    
     # Store validation results in S3
     utils.store_migration_artifact('source_validation.json', validation_results)
     
     logger.info("Source database validation completed")
     return validation_results
 
-def create_database_backup(utils: MigrationUtils) -> Dict[str, Any]:
-    """Create backup of target database before migration"""
+def create_database_backup(utils: MigrationUtils, backup_format: str = None, benchmark: bool = False) -> Dict[str, Any]:
+    """Create backup of target database before migration (copy-text or typed arrow-ipc format)"""
+    
+    from columnar_backup import FORMAT as COLUMNAR_FORMAT
     
     logger.info("Starting database backup creation")
     
@@ -247,6 +534,13 @@ def create_database_backup(utils: MigrationUtils) -> Dict[str, Any]:
         'tables_backed_up': []
     }
     
+    backup_format = backup_format or BACKUP_FORMAT
+    if backup_format not in ('copy-text', COLUMNAR_FORMAT):
+        raise DataMigrationError(f"Unknown backup format: {backup_format}")
+    
+    timestamp = datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')
+    backup_key = f"database_backup_{timestamp}.copy.gz" if backup_format == 'copy-text' else f"database_backup_{timestamp}.arrow"
+    
     with DatabaseConnection(target_creds) as conn:
         cursor = conn.cursor()
         
@@ -261,39 +555,343 @@ def create_database_backup(utils: MigrationUtils) -> Dict[str, Any]:
         existing_tables = [row[0] for row in cursor.fetchall()]
         backup_results['tables_backed_up'] = existing_tables
         
-        # Create backup data for each table
-        backup_data = {}
-        for table in existing_tables:
+        if backup_format == COLUMNAR_FORMAT:
+            index = write_columnar_backup(utils, conn, existing_tables, backup_key, benchmark)
+        else:
+            index = write_copy_backup(utils, conn, existing_tables, backup_key)
+    
+    if index:
+        backup_results['backup_created'] = True
+        backup_results['backup_location'] = f"s3://{MIGRATION_BUCKET}/{utils.get_migration_prefix()}/{backup_key}"
+        backup_results['backup_index_location'] = f"{backup_results['backup_location']}.index.json"
+        backup_results['backup_size'] = index['size_bytes']
+        backup_results['backup_format'] = index['format']
+        backup_results['rows_streamed'] = sum(entry['rows'] for entry in index['tables'])
+        if 'json_comparison' in index:
+            backup_results['json_comparison'] = index['json_comparison']
+    
+    backup_results['peak_memory_mb'] = MigrationUtils.get_peak_memory_mb()
+    
+    logger.info("Database backup creation completed")
+    return backup_results
+
+def write_copy_backup(utils: MigrationUtils, conn, tables: List[str], backup_key: str) -> Optional[Dict[str, Any]]:
+    """Write tables as gzip-compressed COPY text into one streamed artifact; returns the index"""
+    
+    from transfer_engine import CopyTransferEngine
+    
+    engine = CopyTransferEngine()
+    cursor = conn.cursor()
+    
+    # COPY output is compressed and uploaded part by part; nothing holds a whole table in memory
+    writer = StreamingBackupWriter(utils, backup_key, part_size=BACKUP_PART_SIZE)
+    try:
+        for table in tables:
             try:
-                cursor.execute(f"SELECT * FROM {table}")
-                columns = [desc[0] for desc in cursor.description]
-                rows = cursor.fetchall()
-                
-                backup_data[table] = {
-                    'columns': columns,
-                    'data': [dict(zip(columns, row)) for row in rows]
-                }
-                
-                logger.info(f"Backed up table {table}: {len(rows)} records")
+                columns = engine.get_table_columns(cursor, table)
+                column_list = ', '.join(f'"{column}"' for column in columns)
+                writer.begin_table(table, columns)
+                cursor.copy_expert(f"COPY {table} ({column_list}) TO STDOUT", writer)
+                entry = writer.end_table(cursor.rowcount)
+                logger.info(f"Backed up table {table}: {entry['rows']} records")
                 
             except psycopg2.Error as e:
                 logger.warning(f"Could not backup table {table}: {e}")
+                writer.end_table(0, completed=False)
+                conn.rollback()
         
-        backup_results['backup_created'] = len(backup_data) > 0
+        if not writer.tables:
+            writer.abort()
+            return None
+        
+        return writer.close()
+    except Exception:
+        writer.abort()
+        raise
+
+def write_columnar_backup(utils: MigrationUtils, conn, tables: List[str], backup_key: str,
+                          benchmark: bool = False) -> Optional[Dict[str, Any]]:
+    """Write tables as typed Arrow IPC streams, one artifact per table; returns the index"""
     
-    # Store backup in S3
-    if backup_results['backup_created']:
-        backup_key = f"database_backup_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}.json"
-        utils.store_migration_artifact(backup_key, backup_data)
-        backup_results['backup_location'] = f"s3://{MIGRATION_BUCKET}/{utils.get_migration_prefix()}/{backup_key}"
+    from columnar_backup import ColumnarBackupWriter, ColumnarFormatError
     
-    logger.info("Database backup creation completed")
-    return backup_results
+    writer = ColumnarBackupWriter(
+        utils, backup_key,
+        batch_size=STREAM_BATCH_SIZE,
+        part_size=BACKUP_PART_SIZE,
+        benchmark=benchmark
+    )
+    
+    for table in tables:
+        try:
+            writer.backup_table(conn, table)
+        except (psycopg2.Error, ColumnarFormatError) as e:
+            logger.warning(f"Could not backup table {table}: {e}")
+            conn.rollback()
+    
+    return writer.close() if writer.tables else None
+
+def restore_database_backup(utils: MigrationUtils, event: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Restore a backup written by create_backup into the target database.
+    
+    Secondary indexes and foreign keys are dropped, every table is truncated
+    and reloaded with COPY in foreign-key order on MIGRATION_MAX_WORKERS
+    connections, then the schema is rebuilt in parallel and sequences are
+    moved past the restored ids. The measured timing is written into the
+    backup's rollback plan.
+    
+    Each table is truncated in the transaction that loads it, so a table
+    that fails to load keeps its previous rows. The truncate cascades to
+    referencing tables; with the schema not deferred, referencing tables
+    outside the backup are emptied too and listed in cascade_truncated.
+    """
+    
+    from botocore.exceptions import ClientError
+    from migration_scheduler import MigrationScheduler
+    
+    backup_migration_id = event.get('backup_migration_id')
+    if not backup_migration_id:
+        raise DataMigrationError("restore_backup requires the backup_migration_id of the create_backup run")
+    
+    backup_utils = MigrationUtils(
+        s3_client=get_client('s3'),
+        bucket_name=MIGRATION_BUCKET,
+        kms_key_id=KMS_KEY_ID,
+        migration_id=backup_migration_id
+    )
+    backup_key = event.get('backup_key') or find_latest_backup(backup_utils)
+    
+    try:
+        index = backup_utils.retrieve_migration_artifact(f"{backup_key}.index.json")
+    except ClientError:
+        raise DataMigrationError(f"No backup index found for {backup_key}; only indexed backups can be restored")
+    
+    logger.info(f"Starting restore of backup {backup_key} ({index['format']}, {len(index['tables'])} tables)")
+    
+    target_creds = get_database_credentials(TARGET_DB_SECRET_ARN)
+    entries = {entry['table']: entry for entry in index['tables']}
+    tables = list(entries)
+    
+    restore_results = {
+        'restore_started': datetime.now(timezone.utc).isoformat(),
+        'backup_location': f"s3://{MIGRATION_BUCKET}/{backup_utils.get_migration_prefix()}/{backup_key}",
+        'backup_format': index['format'],
+        'tables_restored': {},
+        'tables_skipped': [],
+        'total_rows_restored': 0,
+        'restore_completed': False,
+        'errors': []
+    }
+    
+    started = datetime.now(timezone.utc)
+    deferral = None
+    
+    def open_target():
+        return DatabaseConnection(target_creds)
+    
+    with open_target() as conn:
+        cursor = conn.cursor()
+        dependencies = MigrationScheduler.dependencies_from_catalog(cursor)
+        
+        if RESTORE_DEFER_SCHEMA:
+            deferral = defer_target_schema(utils, conn, tables)
+        
+        # Foreign keys left in place from tables the backup does not cover
+        cursor.execute("""
+            SELECT DISTINCT conrelid::regclass::text
+            FROM pg_constraint
+            WHERE contype = 'f'
+            AND confrelid = ANY(%s::regclass[])
+            AND NOT conrelid = ANY(%s::regclass[])
+            ORDER BY 1
+        """, (tables, tables))
+        restore_results['cascade_truncated'] = [row[0] for row in cursor.fetchall()]
+        if restore_results['cascade_truncated']:
+            logger.warning(f"Restore will empty referencing tables outside the backup: {restore_results['cascade_truncated']}")
+    
+    try:
+        scheduler = MigrationScheduler(tables, dependencies, max_workers=MIGRATION_MAX_WORKERS)
+        load_started = datetime.now(timezone.utc)
+        outcomes = scheduler.run(
+            lambda conn, table: restore_backup_table(backup_utils, conn, backup_key, entries[table]),
+            open_target
+        )
+        load_seconds = (datetime.now(timezone.utc) - load_started).total_seconds()
+    finally:
+        # Always put the schema back, even if loading failed part way
+        if deferral is not None:
+            restore_results['schema_rebuild'] = deferral.recreate(open_target)
+            restore_results['errors'].extend(restore_results['schema_rebuild']['errors'])
+    
+    for table in tables:
+        outcome = outcomes[table]
+        if outcome['skipped']:
+            restore_results['tables_skipped'].append(table)
+        if outcome['error']:
+            restore_results['errors'].append(f"Failed to restore table {table}: {outcome['error']}")
+            continue
+        
+        restore_results['tables_restored'][table] = outcome['result']
+        restore_results['total_rows_restored'] += outcome['result']
+    
+    with open_target() as conn:
+        restore_results['sequences_reset'] = reset_sequences(conn, tables)
+    
+    restore_seconds = (datetime.now(timezone.utc) - started).total_seconds()
+    restore_results['load_seconds'] = round(load_seconds, 3)
+    restore_results['restore_seconds'] = round(restore_seconds, 3)
+    restore_results['rows_per_second'] = (
+        round(restore_results['total_rows_restored'] / load_seconds, 1) if load_seconds > 0 else None
+    )
+    restore_results['estimated_rollback_time_minutes'] = round(restore_seconds / 60, 1)
+    restore_results['restore_completed'] = len(restore_results['errors']) == 0
+    restore_results['peak_memory_mb'] = MigrationUtils.get_peak_memory_mb()
+    
+    backup_utils.generate_rollback_plan(backup_key, restore_metrics={
+        'measured_at': restore_results['restore_started'],
+        'rows': restore_results['total_rows_restored'],
+        'rows_per_second': restore_results['rows_per_second'],
+        'restore_seconds': restore_results['restore_seconds'],
+        'estimated_rollback_time_minutes': restore_results['estimated_rollback_time_minutes']
+    })
+    utils.store_migration_artifact('restore_results.json', restore_results)
+    
+    logger.info(f"Restore completed: {restore_results['total_rows_restored']} rows in {restore_seconds:.1f}s")
+    return restore_results
+
+def defer_target_schema(utils: MigrationUtils, conn, tables: List[str]) -> 'SchemaDeferral':
+    """
+    Capture and drop the secondary indexes and foreign keys of tables on conn.
+    
+    The captured DDL is stored as an artifact before anything is dropped, so
+    restore_schema can always rebuild the schema of a run that died.
+    """
+    
+    from schema_deferral import SchemaDeferral
+    
+    deferral = SchemaDeferral(maintenance_work_mem=MAINTENANCE_WORK_MEM, max_workers=MIGRATION_MAX_WORKERS)
+    deferral.capture(conn.cursor(), tables)
+    utils.store_migration_artifact(DEFERRED_SCHEMA_ARTIFACT, deferral.statements)
+    deferral.drop(conn)
+    return deferral
+
+def load_deferred_schema(utils: MigrationUtils) -> 'SchemaDeferral':
+    """Deferral holding the statements captured by an earlier run of this migration"""
+    
+    from botocore.exceptions import ClientError
+    from schema_deferral import SchemaDeferral
+    
+    try:
+        statements = utils.retrieve_migration_artifact(DEFERRED_SCHEMA_ARTIFACT)
+    except ClientError:
+        raise DataMigrationError(f"No deferred schema found for migration {utils.migration_id}")
+    
+    deferral = SchemaDeferral(maintenance_work_mem=MAINTENANCE_WORK_MEM, max_workers=MIGRATION_MAX_WORKERS)
+    deferral.load(statements)
+    return deferral
+
+def restore_deferred_schema(utils: MigrationUtils) -> Dict[str, Any]:
+    """Recreate the indexes and foreign keys a migration or restore run dropped"""
+    
+    deferral = load_deferred_schema(utils)
+    target_creds = get_database_credentials(TARGET_DB_SECRET_ARN)
+    
+    logger.info(f"Recreating {len(deferral.statements)} deferred indexes and constraints")
+    rebuild = deferral.recreate(lambda: DatabaseConnection(target_creds))
+    
+    # Keep a later resume from loading the deferred artifact again
+    checkpoint = MigrationCheckpoint(utils)
+    if checkpoint.load() and checkpoint.manifest.get('schema_deferred'):
+        checkpoint.save_manifest(schema_deferred=bool(rebuild['errors']))
+    
+    utils.store_migration_artifact('schema_rebuild_results.json', rebuild)
+    return rebuild
 
-def execute_data_migration(utils: MigrationUtils, validators: DataValidators, migration_id: str) -> Dict[str, Any]:
-    """Execute the main data migration from source to target"""
+def find_latest_backup(backup_utils: MigrationUtils) -> str:
+    """Key of the newest indexed backup stored under a migration prefix"""
+    
+    prefix_length = len(f"{backup_utils.get_migration_prefix()}/")
+    suffix = '.index.json'
+    backups = sorted(
+        key[prefix_length:-len(suffix)]
+        for key in backup_utils.list_migration_artifacts('database_backup_')
+        if key.endswith(suffix)
+    )
     
-    logger.info("Starting data migration execution")
+    if not backups:
+        raise DataMigrationError(f"No indexed backup found for migration {backup_utils.migration_id}")
+    
+    return backups[-1]
+
+def restore_backup_table(backup_utils: MigrationUtils, conn, backup_key: str, entry: Dict[str, Any]) -> int:
+    """Truncate one table and load it from a backup with COPY in one transaction; returns the rows loaded"""
+    
+    from columnar_backup import FORMAT as COLUMNAR_FORMAT, restore_table as restore_columnar_table
+    
+    try:
+        conn.cursor().execute(f"TRUNCATE TABLE {entry['table']} CASCADE")
+        
+        if entry['format'] == COLUMNAR_FORMAT:
+            rows, _ = restore_columnar_table(backup_utils, conn, entry, part_size=BACKUP_PART_SIZE)
+        else:
+            column_list = ', '.join(f'"{column}"' for column in entry['columns'])
+            cursor = conn.cursor()
+            with BackupTableReader(backup_utils, backup_key, entry, part_size=BACKUP_PART_SIZE) as reader:
+                cursor.copy_expert(f"COPY {entry['table']} ({column_list}) FROM STDIN", reader)
+            rows = cursor.rowcount
+        
+        if rows != entry['rows']:
+            raise DataMigrationError(f"Restored {rows} rows into {entry['table']}, backup has {entry['rows']}")
+    except Exception:
+        # Keep the table's previous rows; the worker's connection is reused for other tables
+        conn.rollback()
+        raise
+    
+    conn.commit()
+    
+    logger.info(f"Restored table {entry['table']}: {rows} records")
+    return rows
+
+def reset_sequences(conn, tables: List[str]) -> Dict[str, int]:
+    """Move serial/identity sequences past the highest restored value"""
+    
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT table_name, column_name, pg_get_serial_sequence(format('public.%%I', table_name), column_name)
+        FROM information_schema.columns
+        WHERE table_schema = 'public'
+        AND table_name = ANY(%s)
+        AND pg_get_serial_sequence(format('public.%%I', table_name), column_name) IS NOT NULL
+    """, (tables,))
+    
+    reset = {}
+    for table, column, sequence in cursor.fetchall():
+        cursor.execute(f'SELECT setval(%s, COALESCE(MAX("{column}"), 0) + 1, false) FROM {table}', (sequence,))
+        reset[sequence] = cursor.fetchone()[0]
+    
+    conn.commit()
+    return reset
+
+def execute_data_migration(utils: MigrationUtils, validators: DataValidators, migration_id: str,
+                           context=None, resume: bool = False, defer_schema: bool = False) -> Dict[str, Any]:
+    """
+    Execute the main data migration from source to target.
+    
+    Progress is checkpointed per chunk under the migration prefix. Tables not
+    started before the Lambda time budget runs out are deferred; run
+    resume_migration with the same migration_id to continue.
+    
+    With defer_schema the target's secondary indexes and foreign keys are
+    dropped before loading and rebuilt in parallel once every table is
+    loaded. A run that stops for its time budget leaves them dropped until
+    the resumed run finishes; a run that fails rebuilds them immediately.
+    """
+    
+    from transfer_engine import CopyTransferEngine, RangePartitioner
+    from migration_scheduler import MigrationScheduler
+    
+    logger.info(f"Starting data migration execution (resume={resume})")
     
     source_creds = get_database_credentials(SOURCE_DB_SECRET_ARN)
     target_creds = get_database_credentials(TARGET_DB_SECRET_ARN)
@@ -301,12 +899,13 @@ def execute_data_migration(utils: MigrationUtils, validators: DataValidators, mi
     migration_results = {
         'migration_started': datetime.now(timezone.utc).isoformat(),
         'tables_migrated': {},
+        'tables_skipped': [],
         'total_records_migrated': 0,
         'migration_completed': False,
         'errors': []
     }
     
-    # Tables in migration order (respecting foreign key dependencies)
+    # Tables to migrate; dependency order is enforced by the scheduler
     migration_order = [
         'users',
         'roles', 
@@ -320,65 +919,136 @@ def execute_data_migration(utils: MigrationUtils, validators: DataValidators, mi
         'timeline'
     ]
     
+    engine = CopyTransferEngine(
+        copy_format=COPY_FORMAT,
+        chunk_size=COPY_CHUNK_SIZE,
+        max_buffered_chunks=COPY_BUFFER_CHUNKS
+    )
+    migration_results['copy_format'] = engine.copy_format
+    migration_results['table_transfer_stats'] = {}
+    migration_results['tables_deferred'] = []
+    
+    checkpoint = MigrationCheckpoint(utils)
+    should_stop = time_budget_exhausted(context)
+    deferral = None
+    
+    def open_target():
+        return DatabaseConnection(target_creds)
+    
     try:
-        with DatabaseConnection(source_creds) as source_conn, \
-             DatabaseConnection(target_creds) as target_conn:
+        if resume:
+            if not checkpoint.load():
+                raise DataMigrationError(f"No checkpoint manifest found for migration {migration_id}")
+            migration_order = checkpoint.manifest.get('migration_order', migration_order)
+            checkpoint.save_manifest(status='running', resumed_at=datetime.now(timezone.utc).isoformat())
             
-            source_cursor = source_conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-            target_cursor = target_conn.cursor()
+            if checkpoint.manifest.get('schema_deferred'):
+                deferral = load_deferred_schema(utils)
+        else:
+            checkpoint.save_manifest(
+                migration_id=migration_id,
+                status='running',
+                started_at=migration_results['migration_started'],
+                migration_order=migration_order,
+                copy_format=engine.copy_format
+            )
             
-            for table in migration_order:
-                try:
-                    logger.info(f"Migrating table: {table}")
-                    
-                    # Get source data
-                    source_cursor.execute(f"SELECT * FROM {table}")
-                    source_data = source_cursor.fetchall()
-                    
-                    if not source_data:
-                        logger.info(f"Table {table} is empty, skipping")
-                        migration_results['tables_migrated'][table] = 0
-                        continue
-                    
-                    # Get column names
-                    columns = [desc[0] for desc in source_cursor.description]
-                    
-                    # Clear target table
-                    target_cursor.execute(f"TRUNCATE TABLE {table} CASCADE")
-                    
-                    # Insert data
-                    insert_query = f"""
-                        INSERT INTO {table} ({', '.join(columns)}) 
-                        VALUES ({', '.join(['%s'] * len(columns))})
-                    """
-                    
-                    # Convert DictRow to tuple for insertion
-                    insert_data = [tuple(row[col] for col in columns) for row in source_data]
-                    
-                    target_cursor.executemany(insert_query, insert_data)
-                    
-                    records_migrated = len(insert_data)
-                    migration_results['tables_migrated'][table] = records_migrated
-                    migration_results['total_records_migrated'] += records_migrated
-                    
-                    logger.info(f"Successfully migrated {records_migrated} records from {table}")
-                    
-                except psycopg2.Error as e:
-                    error_msg = f"Failed to migrate table {table}: {str(e)}"
-                    logger.error(error_msg)
-                    migration_results['errors'].append(error_msg)
-                    # Continue with other tables
+            if defer_schema:
+                with open_target() as conn:
+                    deferral = defer_target_schema(utils, conn, migration_order)
+                checkpoint.save_manifest(schema_deferred=True)
+        
+        dependencies = load_table_dependencies(validators, source_creds)
+        scheduler = MigrationScheduler(migration_order, dependencies, max_workers=MIGRATION_MAX_WORKERS)
+        
+        # Intra-table range partitioning is opt-in via a row threshold
+        partitioner = None
+        if PARTITION_ROW_THRESHOLD > 0:
+            partitioner = RangePartitioner(engine, partitions=PARTITION_COUNT, max_workers=PARTITION_WORKERS)
+            migration_results['partition_row_threshold'] = PARTITION_ROW_THRESHOLD
+        
+        def open_connections():
+            return connection_pair(source_creds, target_creds)
+        
+        run_started = datetime.now(timezone.utc)
+        outcomes = scheduler.run(
+            lambda connections, table: migrate_table(
+                engine, connections[0], connections[1], table,
+                partitioner=partitioner, connection_factory=open_connections,
+                checkpoint=checkpoint, should_stop=should_stop
+            ),
+            open_connections
+        )
+        wall_seconds = (datetime.now(timezone.utc) - run_started).total_seconds()
+        
+        # Merge outcomes in migration order so the artifact is deterministic
+        for table in migration_order:
+            outcome = outcomes[table]
             
-            # Commit transaction
-            target_conn.commit()
-            migration_results['migration_completed'] = len(migration_results['errors']) == 0
-            migration_results['migration_finished'] = datetime.now(timezone.utc).isoformat()
+            # Tables waiting on a deferred table are resumed with it
+            failed = outcomes[outcome['failed_dependency']] if outcome['skipped'] else outcome
+            if failed['error_type'] == 'TransferDeferred':
+                migration_results['tables_deferred'].append(table)
+                continue
+            
+            if outcome['skipped']:
+                migration_results['tables_skipped'].append(table)
+            
+            if outcome['error']:
+                error_msg = f"Failed to migrate table {table}: {outcome['error']}"
+                migration_results['errors'].append(error_msg)
+                continue
+            
+            transfer_stats = outcome['result']
+            transfer_stats['wall_seconds'] = outcome['wall_seconds']
+            transfer_stats['started_offset_seconds'] = outcome['started_offset_seconds']
+            
+            migration_results['tables_migrated'][table] = transfer_stats['rows']
+            migration_results['total_records_migrated'] += transfer_stats['rows']
+            migration_results['table_transfer_stats'][table] = transfer_stats
+        
+        durations = {table: outcome['wall_seconds'] for table, outcome in outcomes.items()}
+        serial_seconds = sum(durations.values())
+        critical_path = scheduler.critical_path(durations)
+        
+        migration_results['schedule'] = {
+            'max_workers': scheduler.max_workers,
+            'dependencies': {table: sorted(parents) for table, parents in scheduler.dependencies.items()},
+            'wall_seconds': round(wall_seconds, 3),
+            'serial_seconds': round(serial_seconds, 3),
+            'critical_path': critical_path['tables'],
+            'critical_path_seconds': critical_path['seconds'],
+            'speedup': round(serial_seconds / wall_seconds, 2) if wall_seconds > 0 else None
+        }
+        
+        migration_results['resume_required'] = len(migration_results['tables_deferred']) > 0
+        
+        if deferral is not None and not migration_results['resume_required']:
+            rebuild_deferred_schema(deferral, open_target, checkpoint, migration_results)
+        
+        migration_results['migration_completed'] = (
+            len(migration_results['errors']) == 0 and not migration_results['resume_required']
+        )
+        migration_results['migration_finished'] = datetime.now(timezone.utc).isoformat()
+        
+        if migration_results['migration_completed']:
+            status = 'completed'
+        elif migration_results['errors']:
+            status = 'failed'
+        else:
+            status = 'incomplete'
+        checkpoint.save_manifest(status=status, tables_deferred=migration_results['tables_deferred'])
     
     except Exception as e:
         error_msg = f"Migration execution failed: {str(e)}"
         logger.error(error_msg)
         migration_results['errors'].append(error_msg)
         migration_results['migration_completed'] = False
+        
+        if deferral is not None and checkpoint.manifest.get('schema_deferred'):
+            rebuild_deferred_schema(deferral, open_target, checkpoint, migration_results)
+    
+    migration_results['peak_memory_mb'] = MigrationUtils.get_peak_memory_mb()
     
     # Store migration results in S3
     utils.store_migration_artifact('migration_results.json', migration_results)
@@ -386,8 +1056,456 @@ def execute_data_migration(utils: MigrationUtils, validators: DataValidators, mi
     logger.info("Data migration execution completed")
     return migration_results
 
-def validate_migration_results(utils: MigrationUtils, validators: DataValidators) -> Dict[str, Any]:
-    """Validate the migrated data integrity and completeness"""
+def rebuild_deferred_schema(deferral: 'SchemaDeferral', connection_factory, checkpoint: MigrationCheckpoint,
+                            migration_results: Dict[str, Any]) -> None:
+    """Recreate a migration's deferred schema and record the outcome in its results and manifest"""
+    
+    try:
+        rebuild = deferral.recreate(connection_factory)
+    except Exception as e:
+        # The stored artifact still allows restore_schema to retry
+        migration_results['errors'].append(f"Schema rebuild failed: {str(e)}")
+        return
+    
+    migration_results['schema_rebuild'] = rebuild
+    migration_results['errors'].extend(rebuild['errors'])
+    checkpoint.save_manifest(schema_deferred=bool(rebuild['errors']))
+
+def load_table_dependencies(validators: DataValidators, source_creds: Dict[str, str]) -> Dict[str, Any]:
+    """Build the foreign key dependency graph from validation rules and the source catalog"""
+    
+    from migration_scheduler import MigrationScheduler
+    
+    dependencies = MigrationScheduler.dependencies_from_rules(validators.validation_rules)
+    
+    with DatabaseConnection(source_creds) as source_conn:
+        try:
+            catalog_dependencies = MigrationScheduler.dependencies_from_catalog(source_conn.cursor())
+            dependencies = MigrationScheduler.merge_dependencies(dependencies, catalog_dependencies)
+        except psycopg2.Error as e:
+            logger.warning(f"Could not read foreign keys from pg_constraint, using validation rules only: {e}")
+            source_conn.rollback()
+    
+    return dependencies
+
+def execute_incremental_migration(utils: MigrationUtils, validators: DataValidators, migration_id: str) -> Dict[str, Any]:
+    """
+    Synchronize only rows changed since the previous run.
+    
+    Per-table watermarks are kept in a state artifact shared by all
+    incremental runs. Rows deleted at the source are removed first, in
+    reverse foreign key order, so upserts never collide with stale rows;
+    changed rows are then upserted in foreign key order. Tables tracked by
+    created_at or id only receive new rows and are listed in
+    tables_insert_only.
+    """
+    
+    from botocore.exceptions import ClientError
+    from transfer_engine import CopyTransferEngine, TransferError
+    from migration_scheduler import MigrationScheduler
+    from incremental_sync import IncrementalSync
+    
+    logger.info("Starting incremental data migration")
+    
+    source_creds = get_database_credentials(SOURCE_DB_SECRET_ARN)
+    target_creds = get_database_credentials(TARGET_DB_SECRET_ARN)
+    
+    state_utils = MigrationUtils(
+        s3_client=get_client('s3'),
+        bucket_name=MIGRATION_BUCKET,
+        kms_key_id=KMS_KEY_ID,
+        migration_id=INCREMENTAL_STATE_ID
+    )
+    
+    try:
+        watermarks = state_utils.retrieve_migration_artifact('watermarks.json')
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') not in ('NoSuchKey', '404'):
+            raise
+        logger.info("No incremental state found, first run copies every row")
+        watermarks = {}
+    
+    sync_results = {
+        'sync_started': datetime.now(timezone.utc).isoformat(),
+        'tables_synced': {},
+        'tables_migrated': {},
+        'tables_skipped': [],
+        'tables_insert_only': [],
+        'total_records_migrated': 0,
+        'total_records_deleted': 0,
+        'migration_completed': False,
+        'errors': []
+    }
+    
+    tables = [
+        'users', 'roles', 'user_roles', 'customers', 'contacts',
+        'teams', 'services', 'processes', 'documents', 'timeline'
+    ]
+    
+    engine = CopyTransferEngine(
+        copy_format=COPY_FORMAT,
+        chunk_size=COPY_CHUNK_SIZE,
+        max_buffered_chunks=COPY_BUFFER_CHUNKS
+    )
+    sync = IncrementalSync(engine, batch_size=STREAM_BATCH_SIZE, overlap_seconds=INCREMENTAL_OVERLAP_SECONDS)
+    
+    def upsert_table(connections, table: str) -> Dict[str, Any]:
+        source_conn, target_conn = connections
+        
+        watermark = sync.choose_watermark(source_conn.cursor(), table)
+        if watermark is None:
+            raise TransferError(f"Table {table} has no updated_at, created_at or integer id column to track")
+        
+        stored = watermarks.get(table)
+        if stored and stored.get('column') == watermark['column']:
+            watermark['value'] = stored.get('value')
+        
+        return sync.upsert_changes(source_conn, target_conn, table, watermark)
+    
+    def delete_table(connections, table: str) -> Dict[str, Any]:
+        source_conn, target_conn = connections
+        return sync.delete_missing(source_conn, target_conn, table)
+    
+    def open_connections():
+        return connection_pair(source_creds, target_creds)
+    
+    try:
+        dependencies = load_table_dependencies(validators, source_creds)
+        
+        # Children first for deletes, then parents first for upserts
+        deletes = MigrationScheduler(
+            tables, MigrationScheduler.reverse_dependencies(dependencies), max_workers=MIGRATION_MAX_WORKERS
+        ).run(delete_table, open_connections)
+        upserts = MigrationScheduler(tables, dependencies, max_workers=MIGRATION_MAX_WORKERS).run(upsert_table, open_connections)
+        
+        for table in tables:
+            table_result = {}
+            
+            upsert = upserts[table]
+            if upsert['skipped'] or deletes[table]['skipped']:
+                sync_results['tables_skipped'].append(table)
+            if upsert['error']:
+                sync_results['errors'].append(f"Failed to upsert changes for {table}: {upsert['error']}")
+            else:
+                table_result.update(upsert['result'])
+                if upsert['result']['watermark']['insert_only']:
+                    sync_results['tables_insert_only'].append(table)
+                watermarks[table] = dict(upsert['result']['watermark'], synced_at=datetime.now(timezone.utc).isoformat())
+                sync_results['tables_migrated'][table] = upsert['result']['rows_upserted']
+                sync_results['total_records_migrated'] += upsert['result']['rows_upserted']
+            
+            delete = deletes[table]
+            if delete['error']:
+                sync_results['errors'].append(f"Failed to remove deleted rows for {table}: {delete['error']}")
+            else:
+                table_result['rows_deleted'] = delete['result']['rows_deleted']
+                sync_results['total_records_deleted'] += delete['result']['rows_deleted']
+            
+            sync_results['tables_synced'][table] = table_result
+        
+        # Only advance watermarks of tables whose changes were applied
+        state_utils.store_migration_artifact('watermarks.json', watermarks)
+        
+        sync_results['migration_completed'] = len(sync_results['errors']) == 0
+        sync_results['sync_finished'] = datetime.now(timezone.utc).isoformat()
+    
+    except Exception as e:
+        error_msg = f"Incremental migration failed: {str(e)}"
+        logger.error(error_msg)
+        sync_results['errors'].append(error_msg)
+        sync_results['migration_completed'] = False
+    
+    sync_results['peak_memory_mb'] = MigrationUtils.get_peak_memory_mb()
+    
+    # Store sync results in S3
+    utils.store_migration_artifact('incremental_results.json', sync_results)
+    
+    logger.info("Incremental data migration completed")
+    return sync_results
+
+def get_change_streamer(source_creds: Dict[str, str]) -> 'ChangeStreamer':
+    """Build the change streamer for this project's replication slot"""
+    
+    from cdc_replication import ChangeStreamer
+    
+    return ChangeStreamer(
+        source_creds,
+        slot_name=f"{PROJECT_NAME}_{ENVIRONMENT}_migration_cdc",
+        tables=CDC_TABLES,
+        batch_size=CDC_BATCH_SIZE,
+        application_name=f"{PROJECT_NAME}-migration-cdc"
+    )
+
+def start_cdc(utils: MigrationUtils) -> Dict[str, Any]:
+    """Create the logical replication slot; run before the bulk copy so no change is missed"""
+    
+    logger.info("Starting change data capture")
+    
+    source_creds = get_database_credentials(SOURCE_DB_SECRET_ARN)
+    streamer = get_change_streamer(source_creds)
+    
+    with DatabaseConnection(source_creds) as conn:
+        slot = streamer.create_slot(conn)
+        cdc_results = {
+            'cdc_started': datetime.now(timezone.utc).isoformat(),
+            'slot': slot,
+            'slot_status': streamer.slot_status(conn)
+        }
+    
+    get_cdc_state_utils().store_migration_artifact('cdc_state.json', cdc_results)
+    return cdc_results
+
+def apply_cdc_changes(utils: MigrationUtils, context=None) -> Dict[str, Any]:
+    """Stream pending source changes into the target for at most one bounded invocation"""
+    
+    logger.info("Applying change data capture stream")
+    
+    source_creds = get_database_credentials(SOURCE_DB_SECRET_ARN)
+    target_creds = get_database_credentials(TARGET_DB_SECRET_ARN)
+    streamer = get_change_streamer(source_creds)
+    
+    max_seconds = CDC_MAX_SECONDS
+    if hasattr(context, 'get_remaining_time_in_millis'):
+        max_seconds = min(max_seconds, context.get_remaining_time_in_millis() / 1000 - TIME_BUDGET_MARGIN_SECONDS)
+    
+    with DatabaseConnection(target_creds) as target_conn:
+        stream_stats = streamer.stream_changes(target_conn, max_seconds=max(max_seconds, 1), idle_seconds=CDC_IDLE_SECONDS)
+    
+    with DatabaseConnection(source_creds) as source_conn:
+        slot_status = streamer.slot_status(source_conn)
+    
+    cdc_results = {
+        'applied_at': datetime.now(timezone.utc).isoformat(),
+        'stream': stream_stats,
+        'slot_status': slot_status,
+        'replication_lag_bytes': streamer.replication_lag_bytes(stream_stats, slot_status)
+    }
+    
+    get_cdc_state_utils().store_migration_artifact('cdc_last_apply.json', cdc_results)
+    utils.store_migration_artifact('cdc_apply_results.json', cdc_results)
+    return cdc_results
+
+def get_cdc_status(utils: MigrationUtils) -> Dict[str, Any]:
+    """Report slot position, WAL lag and the outcome of the last apply run"""
+    
+    from botocore.exceptions import ClientError
+    
+    source_creds = get_database_credentials(SOURCE_DB_SECRET_ARN)
+    streamer = get_change_streamer(source_creds)
+    
+    with DatabaseConnection(source_creds) as conn:
+        slot_status = streamer.slot_status(conn)
+    
+    try:
+        last_apply = get_cdc_state_utils().retrieve_migration_artifact('cdc_last_apply.json')
+    except ClientError:
+        last_apply = None
+    
+    return {
+        'slot_status': slot_status,
+        'replication_lag_bytes': slot_status.get('lag_bytes'),
+        'last_apply': last_apply
+    }
+
+def stop_cdc(utils: MigrationUtils) -> Dict[str, Any]:
+    """Drop the replication slot after cutover so the source stops retaining WAL"""
+    
+    logger.info("Stopping change data capture")
+    
+    source_creds = get_database_credentials(SOURCE_DB_SECRET_ARN)
+    streamer = get_change_streamer(source_creds)
+    
+    with DatabaseConnection(source_creds) as conn:
+        final_status = streamer.slot_status(conn)
+        dropped = streamer.drop_slot(conn)
+    
+    cdc_results = {
+        'cdc_stopped': datetime.now(timezone.utc).isoformat(),
+        'final_slot_status': final_status,
+        'slot_dropped': dropped
+    }
+    
+    get_cdc_state_utils().store_migration_artifact('cdc_state.json', cdc_results)
+    return cdc_results
+
+def get_cdc_state_utils() -> MigrationUtils:
+    """Artifact store for CDC state shared across invocations"""
+    
+    return MigrationUtils(
+        s3_client=get_client('s3'),
+        bucket_name=MIGRATION_BUCKET,
+        kms_key_id=KMS_KEY_ID,
+        migration_id=CDC_STATE_ID
+    )
+
+def compare_table_checksums(source_pool: ValidationConnectionPool, target_pool: ValidationConnectionPool,
+                            tables: List[str], validation_results: Dict[str, Any]) -> Dict[str, Any]:
+    """Compare full table content by hashed key ranges and record differing rows as discrepancies"""
+    
+    comparator = ChecksumComparator(
+        source_pool, target_pool,
+        chunk_rows=CHECKSUM_CHUNK_ROWS,
+        max_differences=CHECKSUM_MAX_DIFFERENCES,
+        max_workers=VALIDATION_CONCURRENCY
+    )
+    comparisons = {}
+    
+    for table in tables:
+        try:
+            comparison = comparator.compare_table(table)
+        except psycopg2.Error as e:
+            comparison = {'table': table, 'match': False, 'errors': [f"Checksum comparison failed: {str(e)}"]}
+        
+        comparisons[table] = comparison
+        if table in validation_results['table_comparisons']:
+            validation_results['table_comparisons'][table]['checksum_match'] = comparison['match']
+        
+        if comparison['errors']:
+            validation_results['discrepancies'].extend(f"Table {table}: {error}" for error in comparison['errors'])
+        elif not comparison['match']:
+            discrepancy = (
+                f"Table {table} content differs: {len(comparison['missing_in_target'])} missing, "
+                f"{len(comparison['extra_in_target'])} extra, {len(comparison['changed'])} changed rows"
+                f"{' (truncated)' if comparison['differences_truncated'] else ''}"
+            )
+            validation_results['discrepancies'].append(discrepancy)
+            logger.warning(discrepancy)
+        else:
+            logger.info(f"Table {table}: content matches ({comparison['rows_compared']} rows, {comparison['seconds']}s)")
+    
+    return comparisons
+
+def create_validation_pool(connection_config: Dict[str, str]) -> ValidationConnectionPool:
+    """Connection pool for validation queries, capped at VALIDATION_CONCURRENCY connections"""
+    
+    return ValidationConnectionPool(
+        VALIDATION_CONCURRENCY,
+        host=connection_config['host'],
+        port=connection_config['port'],
+        database=connection_config['dbname'],
+        user=connection_config['username'],
+        password=connection_config['password'],
+        connect_timeout=30,
+        application_name=f"{PROJECT_NAME}-migration-validation"
+    )
+
+@contextmanager
+def connection_pair(source_creds: Dict[str, str], target_creds: Dict[str, str]):
+    """Open a source and target connection for one migration worker"""
+    
+    with DatabaseConnection(source_creds) as source_conn, \
+         DatabaseConnection(target_creds) as target_conn:
+        yield source_conn, target_conn
+
+def migrate_table(engine: 'CopyTransferEngine', source_conn, target_conn, table: str,
+                  partitioner: Optional['RangePartitioner'] = None,
+                  connection_factory=None,
+                  checkpoint: Optional[MigrationCheckpoint] = None,
+                  should_stop: Optional[Callable[[], bool]] = None) -> Dict[str, Any]:
+    """
+    Replace the contents of one target table with the source rows and commit.
+    
+    Progress is recorded per chunk in the checkpoint manifest. Tables whose
+    chunks are all committed are skipped, and a key-range plan with some
+    committed chunks continues with the remaining ranges only; any other
+    partially copied table is reloaded from scratch.
+    """
+    
+    from transfer_engine import RangePartitioner, TransferError, TransferDeferred
+    
+    if checkpoint and checkpoint.is_table_complete(table):
+        completed = checkpoint.completed_chunks(table)
+        logger.info(f"Table {table} already migrated according to checkpoint, skipping")
+        return {
+            'table': table,
+            'rows': sum(chunk['rows'] for chunk in completed.values()),
+            'bytes': 0,
+            'seconds': 0.0,
+            'format': engine.copy_format,
+            'resumed_chunks': len(completed)
+        }
+    
+    if should_stop and should_stop():
+        raise TransferDeferred(f"Table {table} deferred to the next invocation")
+    
+    logger.info(f"Migrating table: {table}")
+    
+    def record_chunk(chunk: Dict[str, Any], stats: Dict[str, Any]):
+        if checkpoint:
+            checkpoint.record_chunk(table, chunk['chunk_id'], stats['rows'], stats.get('checksum'), stats.get('range'))
+    
+    try:
+        source_cursor = source_conn.cursor()
+        
+        plan = checkpoint.get_plan(table) if checkpoint else None
+        completed = checkpoint.completed_chunks(table) if checkpoint else {}
+        resume_ranges = bool(plan) and plan[0]['method'] == 'key' and bool(completed)
+        
+        if not resume_ranges:
+            completed = {}
+            
+            if not engine.table_has_rows(source_cursor, table):
+                logger.info(f"Table {table} is empty, skipping")
+                source_conn.rollback()
+                stats = {'table': table, 'rows': 0, 'bytes': 0, 'seconds': 0.0, 'format': engine.copy_format}
+                if checkpoint:
+                    checkpoint.save_plan(table, [RangePartitioner.whole_table()])
+                record_chunk(RangePartitioner.whole_table(), stats)
+                return stats
+            
+            if partitioner and partitioner.estimate_row_count(source_cursor, table) >= PARTITION_ROW_THRESHOLD:
+                plan = partitioner.plan_ranges(source_cursor, table)
+            else:
+                plan = [RangePartitioner.whole_table()]
+            
+            if checkpoint:
+                checkpoint.save_plan(table, plan)
+            
+            # Clear target table
+            target_conn.cursor().execute(f"TRUNCATE TABLE {table} CASCADE")
+        
+        if plan[0]['method'] == 'none':
+            # Stream rows via COPY from source to target
+            transfer_stats = engine.transfer_table(source_conn, target_conn, table)
+            
+            # Commit per table so dependent tables on other workers can see the rows
+            target_conn.commit()
+            source_conn.rollback()
+            record_chunk(plan[0], transfer_stats)
+        else:
+            # Range workers use their own connections, so the truncate must be visible to them
+            target_conn.commit()
+            transfer_stats = (partitioner or RangePartitioner(engine, partitions=len(plan))).transfer_ranges(
+                source_conn, table, plan, connection_factory,
+                skip_chunks=set(completed),
+                replace_existing=resume_ranges,
+                on_range_committed=record_chunk,
+                should_stop=should_stop
+            )
+            transfer_stats['rows'] += sum(chunk['rows'] for chunk in completed.values())
+            transfer_stats['resumed_chunks'] = len(completed)
+        
+        logger.info(f"Successfully migrated {transfer_stats['rows']} records from {table}")
+        return transfer_stats
+    
+    except (psycopg2.Error, TransferError) as e:
+        logger.error(f"Failed to migrate table {table}: {str(e)}")
+        target_conn.rollback()
+        source_conn.rollback()
+        raise
+
+def time_budget_exhausted(context) -> Callable[[], bool]:
+    """Build a check that turns true when the Lambda is close to its timeout"""
+    
+    def should_stop() -> bool:
+        if not hasattr(context, 'get_remaining_time_in_millis'):
+            return False
+        return context.get_remaining_time_in_millis() < TIME_BUDGET_MARGIN_SECONDS * 1000
+    
+    return should_stop
+
+def validate_migration_results(utils: MigrationUtils, validators: DataValidators, checksum: bool = False) -> Dict[str, Any]:
+    """Validate the migrated data integrity and completeness, optionally down to row content"""
     
     logger.info("Starting migration validation")
     
@@ -399,47 +1517,64 @@ def validate_migration_results(utils: MigrationUtils, validators: DataValidators
         'table_comparisons': {},
         'data_integrity_checks': {},
         'validation_passed': False,
-        'discrepancies': []
+        'discrepancies': [],
+        'validation_mode': 'checksum' if checksum else 'count'
     }
     
-    with DatabaseConnection(source_creds) as source_conn, \
-         DatabaseConnection(target_creds) as target_conn:
-        
-        source_cursor = source_conn.cursor()
-        target_cursor = target_conn.cursor()
-        
+    # Source and target counts plus target integrity checks all run at once;
+    # each database sees at most VALIDATION_CONCURRENCY connections
+    source_pool = create_validation_pool(source_creds)
+    target_pool = create_validation_pool(target_creds)
+    
+    try:
         # Compare record counts
         tables_to_validate = [
             'customers', 'processes', 'services', 'documents', 
             'timeline', 'contacts', 'teams', 'users', 'user_roles', 'roles'
         ]
         
-        for table in tables_to_validate:
-            try:
-                source_cursor.execute(f"SELECT COUNT(*) FROM {table}")
-                source_count = source_cursor.fetchone()[0]
-                
-                target_cursor.execute(f"SELECT COUNT(*) FROM {table}")
-                target_count = target_cursor.fetchone()[0]
-                
-                validation_results['table_comparisons'][table] = {
-                    'source_count': source_count,
-                    'target_count': target_count,
-                    'match': source_count == target_count
-                }
-                
-                if source_count != target_count:
-                    discrepancy = f"Table {table}: source={source_count}, target={target_count}"
-                    validation_results['discrepancies'].append(discrepancy)
-                    logger.warning(discrepancy)
-                
-            except psycopg2.Error as e:
-                error_msg = f"Could not validate table {table}: {str(e)}"
-                logger.error(error_msg)
-                validation_results['discrepancies'].append(error_msg)
+        with ThreadPoolExecutor(max_workers=2 * VALIDATION_CONCURRENCY + 1) as executor:
+            integrity_future = executor.submit(
+                validators.validate_data_integrity_concurrently, target_pool, VALIDATION_CONCURRENCY
+            )
+            count_futures = {
+                table: (executor.submit(source_pool.count_rows, table), executor.submit(target_pool.count_rows, table))
+                for table in tables_to_validate
+            }
+            
+            # Merge in table order so results do not depend on completion order
+            for table in tables_to_validate:
+                source_future, target_future = count_futures[table]
+                try:
+                    source_count = source_future.result()
+                    target_count = target_future.result()
+                    
+                    validation_results['table_comparisons'][table] = {
+                        'source_count': source_count,
+                        'target_count': target_count,
+                        'match': source_count == target_count
+                    }
+                    
+                    if source_count != target_count:
+                        discrepancy = f"Table {table}: source={source_count}, target={target_count}"
+                        validation_results['discrepancies'].append(discrepancy)
+                        logger.warning(discrepancy)
+                    
+                except psycopg2.Error as e:
+                    error_msg = f"Could not validate table {table}: {str(e)}"
+                    logger.error(error_msg)
+                    validation_results['discrepancies'].append(error_msg)
+            
+            # Data integrity checks on target
+            validation_results['data_integrity_checks'] = integrity_future.result()
         
-        # Data integrity checks on target
-        validation_results['data_integrity_checks'] = validators.validate_target_data_integrity(target_cursor)
+        if checksum:
+            validation_results['checksum_comparisons'] = compare_table_checksums(
+                source_pool, target_pool, tables_to_validate, validation_results
+            )
+    finally:
+        source_pool.closeall()
+        target_pool.closeall()
     
     # Overall validation result
     validation_results['validation_passed'] = (
@@ -448,6 +1583,7 @@ def validate_migration_results(utils: MigrationUtils, validators: DataValidators
     )
     
     validation_results['validation_finished'] = datetime.now(timezone.utc).isoformat()
+    validation_results['peak_memory_mb'] = MigrationUtils.get_peak_memory_mb()
     
     # Store validation results in S3
     utils.store_migration_artifact('validation_results.json', validation_results)
@@ -469,7 +1605,7 @@ Timestamp: {datetime.now(timezone.utc).isoformat()}
 {message}
 """
             
-            sns_client.publish(
+            get_client('sns').publish(
                 TopicArn=SNS_TOPIC_ARN,
                 Subject=f"[{PROJECT_NAME}] {subject}",
                 Message=enhanced_message
@@ -8,12 +8,399 @@ during migration from Supabase to AWS RDS PostgreSQL.
 """
 
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from typing import Dict, Any, List, Tuple, Optional
 import psycopg2
-import psycopg2.extras
 
 logger = logging.getLogger(__name__)
 
+EMAIL_PATTERN = r'^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}$'
+VALID_PROCESS_STATUSES = ['not_started', 'in_progress', 'completed', 'on_hold', 'cancelled']
+
+# Data check type -> row condition (NULLs are never counted), severity and message
+DATA_CHECKS = {
+    'email_format': {
+        'condition': lambda column: f"{column} !~ '{EMAIL_PATTERN}'",
+        'severity': 'error',
+        'message': "{count} invalid email formats in {column}"
+    },
+    'email_format_optional': {
+        'condition': lambda column: f"{column} != '' AND {column} !~ '{EMAIL_PATTERN}'",
+        'severity': 'warning',
+        'message': "{count} invalid email formats in optional {column}"
+    },
+    'non_empty_string': {
+        'condition': lambda column: f"TRIM({column}) = ''",
+        'severity': 'error',
+        'message': "{count} empty strings in {column}"
+    },
+    'valid_timestamp': {
+        'condition': lambda column: f"{column} > NOW() + INTERVAL '1 day'",
+        'severity': 'warning',
+        'message': "{count} future timestamps in {column}"
+    },
+    'positive_number_optional': {
+        'condition': lambda column: f"{column} < 0",
+        'severity': 'warning',
+        'message': "{count} negative values in {column}"
+    },
+    'valid_process_status': {
+        'condition': lambda column: f"{column} NOT IN ({', '.join(repr(status) for status in VALID_PROCESS_STATUSES)})",
+        'severity': 'error',
+        'message': "{count} invalid status values in {column}"
+    }
+}
+
+class ValidationQueryPlan:
+    """Validation rules of one table compiled into a single aggregate scan plus one anti-join per foreign key"""
+    
+    def __init__(self, table_name: str, rules: Dict[str, Any], existing_columns: List[str]):
+        self.table_name = table_name
+        self.checks: List[Dict[str, Any]] = []
+        
+        for column in rules.get('not_null_columns', []):
+            if column in existing_columns:
+                self._add('not_null', column, f"count(*) FILTER (WHERE {column} IS NULL)")
+        
+        # Only detects duplicates; the group count for the error message is fetched when there are any
+        for column in rules.get('unique_columns', []):
+            if column in existing_columns:
+                self._add('unique', column, f"count({column}) - count(DISTINCT {column})")
+        
+        for fk in rules.get('foreign_keys', []):
+            if fk['column'] in existing_columns:
+                self._add('foreign_key', fk['column'], None, references=fk['references'])
+        
+        for data_check in rules.get('data_checks', []):
+            column = data_check['column']
+            definition = DATA_CHECKS.get(data_check['check'])
+            if column in existing_columns and definition:
+                condition = definition['condition'](column)
+                self._add('data_check', column, f"count(*) FILTER (WHERE {column} IS NOT NULL AND {condition})",
+                          check_type=data_check['check'])
+    
+    def _add(self, kind: str, column: str, expression: Optional[str], **extra):
+        self.checks.append(dict(extra, id=f"check_{len(self.checks)}", kind=kind, column=column, expression=expression))
+    
+    @property
+    def aggregate_checks(self) -> List[Dict[str, Any]]:
+        return [check for check in self.checks if check['expression'] is not None]
+    
+    def aggregate_query(self) -> str:
+        """One scan of the table returning the row count followed by every aggregate check"""
+        
+        expressions = ['count(*)'] + [check['expression'] for check in self.aggregate_checks]
+        return f"SELECT {', '.join(expressions)} FROM {self.table_name}"
+    
+    def orphan_query(self, check: Dict[str, Any]) -> str:
+        """Anti-join counting non-NULL foreign key values without a referenced row"""
+        
+        column = check['column']
+        ref_table, ref_column = check['references'].split('.')
+        return f"""
+            SELECT COUNT(*)
+            FROM {self.table_name} t1
+            WHERE t1.{column} IS NOT NULL
+            AND NOT EXISTS (
+                SELECT 1 FROM {ref_table} t2 WHERE t2.{ref_column} = t1.{column}
+            )
+        """
+    
+    def duplicate_groups_query(self, check: Dict[str, Any]) -> str:
+        column = check['column']
+        return f"""
+            SELECT COUNT(*) FROM (
+                SELECT {column}
+                FROM {self.table_name}
+                WHERE {column} IS NOT NULL
+                GROUP BY {column}
+                HAVING COUNT(*) > 1
+            ) duplicates
+        """
+
+class ValidationConnectionPool:
+    """ThreadedConnectionPool whose checkout blocks instead of failing once max_connections are in use"""
+    
+    def __init__(self, max_connections: int, **connect_kwargs):
+        import psycopg2.pool
+        
+        self.max_connections = max(1, max_connections)
+        self.pool = psycopg2.pool.ThreadedConnectionPool(0, self.max_connections, **connect_kwargs)
+        self.slots = threading.BoundedSemaphore(self.max_connections)
+    
+    @contextmanager
+    def connection(self):
+        """Check out a connection; its read transaction is rolled back on return"""
+        
+        self.slots.acquire()
+        conn = None
+        try:
+            conn = self.pool.getconn()
+            yield conn
+        finally:
+            if conn is not None:
+                try:
+                    conn.rollback()
+                    self.pool.putconn(conn)
+                except psycopg2.Error:
+                    self.pool.putconn(conn, close=True)
+            self.slots.release()
+    
+    def count_rows(self, table_name: str) -> int:
+        """Exact row count of a table on a pooled connection"""
+        
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
+            return cursor.fetchone()[0]
+    
+    def closeall(self):
+        self.pool.closeall()
+
+class ChecksumComparator:
+    """
+    Content comparison of one table on two databases by hashed primary-key ranges.
+    
+    The source key space is cut into ranges of about chunk_rows rows; each
+    range is reduced to a row count and an ordered md5 digest on both sides
+    in parallel. Only ranges whose digests differ are split further, down to
+    leaf_rows, where per-row hashes identify the exact differing keys.
+    
+    Keys are ranged and ordered in their columns' own collations, so the
+    primary key index serves every range scan. That needs both sides to
+    order keys the same way; tables whose key collations differ between
+    source and target are reported instead of compared.
+    """
+    
+    def __init__(self, source_pool: ValidationConnectionPool, target_pool: ValidationConnectionPool,
+                 chunk_rows: int = 10000, fanout: int = 16, leaf_rows: int = 200,
+                 max_differences: int = 100, max_workers: int = 4):
+        self.pools = {'source': source_pool, 'target': target_pool}
+        self.chunk_rows = max(1, chunk_rows)
+        self.fanout = max(2, fanout)
+        self.leaf_rows = max(1, leaf_rows)
+        self.max_differences = max_differences
+        self.max_workers = max(1, max_workers)
+    
+    def _query(self, side: str, sql: str, params: Optional[List[Any]] = None) -> List[tuple]:
+        with self.pools[side].connection() as conn:
+            cursor = conn.cursor()
+            # Row text must render identically on both servers
+            cursor.execute("SET LOCAL TimeZone = 'UTC'")
+            cursor.execute("SET LOCAL DateStyle = 'ISO, YMD'")
+            cursor.execute("SET LOCAL extra_float_digits = 3")
+            cursor.execute(sql, params or [])
+            return cursor.fetchall()
+    
+    def _describe(self, table_name: str) -> Tuple[List[Tuple[str, str]], List[str]]:
+        """Primary key (column, type) pairs and all columns of the source table"""
+        
+        primary_key = [(row[0], row[1]) for row in self._query('source', """
+            SELECT a.attname, format_type(a.atttypid, a.atttypmod)
+            FROM pg_index i
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+            WHERE i.indrelid = %s::regclass
+            AND i.indisprimary
+            ORDER BY array_position(i.indkey::int2[], a.attnum)
+        """, [table_name])]
+        
+        columns = [row[0] for row in self._query('source', """
+            SELECT column_name
+            FROM information_schema.columns
+            WHERE table_schema = 'public'
+            AND table_name = %s
+            ORDER BY column_name
+        """, [table_name])]
+        
+        return primary_key, columns
+    
+    def _key_collations(self, side: str, table_name: str) -> List[Optional[str]]:
+        """Collation of each primary key column, with the database default resolved"""
+        
+        return [row[0] for row in self._query(side, """
+            SELECT CASE
+                WHEN a.attcollation = 0 THEN NULL
+                WHEN c.collname = 'default' THEN (SELECT datcollate FROM pg_database WHERE datname = current_database())
+                ELSE c.collname
+            END
+            FROM pg_index i
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+            LEFT JOIN pg_collation c ON c.oid = a.attcollation
+            WHERE i.indrelid = %s::regclass
+            AND i.indisprimary
+            ORDER BY array_position(i.indkey::int2[], a.attnum)
+        """, [table_name])]
+    
+    def compare_table(self, table_name: str) -> Dict[str, Any]:
+        """Compare the full content of a table; differing keys are reported as text"""
+        
+        started = time.monotonic()
+        result = {
+            'table': table_name,
+            'match': False,
+            'rows_compared': 0,
+            'ranges_compared': 0,
+            'ranges_mismatched': 0,
+            'missing_in_target': [],
+            'extra_in_target': [],
+            'changed': [],
+            'differences_truncated': False,
+            'errors': []
+        }
+        
+        primary_key, columns = self._describe(table_name)
+        if not primary_key:
+            result['errors'].append(f"Table {table_name} has no primary key; checksum comparison is not possible")
+            return result
+        
+        collations = self._parallel(lambda side: self._key_collations(side, table_name), ['source', 'target'])
+        if collations[0] != collations[1]:
+            result['errors'].append(
+                f"Table {table_name} key collations differ (source {collations[0]}, target {collations[1]}); "
+                f"key ranges would not line up"
+            )
+            return result
+        
+        column_list = ', '.join(f'"{column}"' for column in columns)
+        spec = {
+            'table': table_name,
+            'key_types': [data_type for _, data_type in primary_key],
+            'keys': [f'"{column}"' for column, _ in primary_key],
+            'row_hash': f"md5(ROW({column_list})::text)"
+        }
+        
+        pending = self._ranges(self._boundaries(spec, 'source', (None, None), self.chunk_rows))
+        
+        while pending:
+            digests = self._parallel(
+                lambda task: self._digest(spec, *task),
+                [(side, key_range) for key_range in pending for side in ('source', 'target')]
+            )
+            
+            refine = []
+            for i, key_range in enumerate(pending):
+                source_digest, target_digest = digests[2 * i], digests[2 * i + 1]
+                result['ranges_compared'] += 1
+                
+                if source_digest == target_digest:
+                    result['rows_compared'] += source_digest[0]
+                    continue
+                
+                result['ranges_mismatched'] += 1
+                refine.append((key_range, source_digest[0], target_digest[0]))
+            
+            pending = []
+            for key_range, source_count, target_count in refine:
+                largest = max(source_count, target_count)
+                side = 'source' if source_count >= target_count else 'target'
+                step = -(-largest // self.fanout)
+                sub_ranges = []
+                if largest > self.leaf_rows:
+                    sub_ranges = self._ranges(self._boundaries(spec, side, key_range, max(step, 1)), key_range)
+                
+                if len(sub_ranges) > 1:
+                    pending.extend(sub_ranges)
+                else:
+                    result['rows_compared'] += source_count
+                    self._diff_rows(spec, key_range, result)
+        
+        result['match'] = not (result['missing_in_target'] or result['extra_in_target'] or result['changed'])
+        result['seconds'] = round(time.monotonic() - started, 3)
+        return result
+    
+    def _parallel(self, function, tasks: List[Any]) -> List[Any]:
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(function, tasks))
+    
+    def _range_filter(self, spec: Dict[str, Any], key_range: Tuple[Any, Any]) -> Tuple[str, List[Any]]:
+        """WHERE clause for a half-open key range [low, high); None means unbounded"""
+        
+        low, high = key_range
+        key_row = f"({', '.join(spec['keys'])})"
+        placeholders = f"({', '.join(f'%s::{data_type}' for data_type in spec['key_types'])})"
+        conditions, params = [], []
+        
+        if low is not None:
+            conditions.append(f"{key_row} >= {placeholders}")
+            params.extend(low)
+        if high is not None:
+            conditions.append(f"{key_row} < {placeholders}")
+            params.extend(high)
+        
+        return (' AND '.join(conditions) or 'TRUE'), params
+    
+    def _boundaries(self, spec: Dict[str, Any], side: str, key_range: Tuple[Any, Any], step: int) -> List[tuple]:
+        """Every step-th key inside the range, in key order"""
+        
+        where, params = self._range_filter(spec, key_range)
+        key_list = ', '.join(f'k{i}' for i in range(len(spec['keys'])))
+        aliased = ', '.join(f'{key} AS k{i}' for i, key in enumerate(spec['keys']))
+        
+        rows = self._query(side, f"""
+            SELECT {key_list} FROM (
+                SELECT {aliased}, row_number() OVER (ORDER BY {', '.join(spec['keys'])}) AS rn
+                FROM {spec['table']}
+                WHERE {where}
+            ) keys
+            WHERE mod(rn, {int(step)}) = 0
+            ORDER BY rn
+        """, params)
+        
+        return [tuple(row) for row in rows]
+    
+    @staticmethod
+    def _ranges(boundaries: List[tuple], outer: Tuple[Any, Any] = (None, None)) -> List[Tuple[Any, Any]]:
+        points = [outer[0]] + boundaries + [outer[1]]
+        return [(points[i], points[i + 1]) for i in range(len(points) - 1) if points[i] != points[i + 1] or points[i] is None]
+    
+    def _digest(self, spec: Dict[str, Any], side: str, key_range: Tuple[Any, Any]) -> Tuple[int, str]:
+        """Row count and ordered digest of a key range"""
+        
+        where, params = self._range_filter(spec, key_range)
+        rows = self._query(side, f"""
+            SELECT count(*), md5(coalesce(string_agg({spec['row_hash']}, '' ORDER BY {', '.join(spec['keys'])}), ''))
+            FROM {spec['table']}
+            WHERE {where}
+        """, params)
+        
+        return rows[0][0], rows[0][1]
+    
+    def _diff_rows(self, spec: Dict[str, Any], key_range: Tuple[Any, Any], result: Dict[str, Any]):
+        """Compare per-row hashes of a small range and record the differing keys"""
+        
+        where, params = self._range_filter(spec, key_range)
+        key_text = ', '.join(f'{key}::text' for key in spec['keys'])
+        sql = f"SELECT {key_text}, {spec['row_hash']} FROM {spec['table']} WHERE {where}"
+        
+        source_rows, target_rows = self._parallel(lambda side: self._query(side, sql, params), ['source', 'target'])
+        source_hashes = {tuple(row[:-1]): row[-1] for row in source_rows}
+        target_hashes = {tuple(row[:-1]): row[-1] for row in target_rows}
+        
+        differences = (
+            [('missing_in_target', key) for key in source_hashes if key not in target_hashes] +
+            [('extra_in_target', key) for key in target_hashes if key not in source_hashes] +
+            [('changed', key) for key, digest in source_hashes.items()
+             if key in target_hashes and target_hashes[key] != digest]
+        )
+        
+        for kind, key in sorted(differences, key=lambda difference: difference[1]):
+            if sum(len(result[name]) for name in ('missing_in_target', 'extra_in_target', 'changed')) >= self.max_differences:
+                result['differences_truncated'] = True
+                return
+            result[kind].append(list(key) if len(key) > 1 else key[0])
+
+@contextmanager
+def _single_cursor(cursor):
+    yield cursor
+
+@contextmanager
+def _pooled_cursor(pool: ValidationConnectionPool):
+    with pool.connection() as conn:
+        yield conn.cursor()
+
 class DataValidators:
     """Data validation utilities for migration integrity checks"""
     
@@ -140,29 +527,57 @@ class DataValidators:
         validation_results = {}
         
         for table_name, rules in self.validation_rules.items():
-            logger.info(f"Validating table: {table_name}")
-            
-            try:
-                table_results = self._validate_table(cursor, table_name, rules)
-                validation_results[table_name] = table_results
-                
-                if table_results['passed']:
-                    logger.info(f"✓ Table {table_name} passed validation")
-                else:
-                    logger.warning(f"✗ Table {table_name} failed validation: {table_results['errors']}")
-                    
-            except psycopg2.Error as e:
-                error_msg = f"Could not validate table {table_name}: {str(e)}"
-                logger.error(error_msg)
-                validation_results[table_name] = {
-                    'passed': False,
-                    'errors': [error_msg],
-                    'warnings': [],
-                    'record_count': 0
-                }
+            validation_results[table_name] = self._validate_table_logged(lambda: _single_cursor(cursor), table_name, rules)
         
         return validation_results
     
+    def validate_data_integrity_concurrently(self, pool: ValidationConnectionPool, max_workers: int) -> Dict[str, Any]:
+        """
+        Validate all tables in parallel, each on its own pooled connection.
+        
+        Concurrency is bounded by both max_workers and the pool size; results
+        are returned in validation rule order, exactly as the serial variant.
+        """
+        
+        logger.info(f"Starting concurrent data integrity validation ({max_workers} workers)")
+        
+        def pooled_cursor():
+            return _pooled_cursor(pool)
+        
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = {
+                table_name: executor.submit(self._validate_table_logged, pooled_cursor, table_name, rules)
+                for table_name, rules in self.validation_rules.items()
+            }
+        
+        return {table_name: futures[table_name].result() for table_name in self.validation_rules}
+    
+    def _validate_table_logged(self, cursor_factory, table_name: str, rules: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate one table, turning database errors into a failed result"""
+        
+        logger.info(f"Validating table: {table_name}")
+        
+        try:
+            with cursor_factory() as cursor:
+                table_results = self._validate_table(cursor, table_name, rules)
+            
+            if table_results['passed']:
+                logger.info(f"✓ Table {table_name} passed validation")
+            else:
+                logger.warning(f"✗ Table {table_name} failed validation: {table_results['errors']}")
+            
+            return table_results
+                
+        except psycopg2.Error as e:
+            error_msg = f"Could not validate table {table_name}: {str(e)}"
+            logger.error(error_msg)
+            return {
+                'passed': False,
+                'errors': [error_msg],
+                'warnings': [],
+                'record_count': 0
+            }
+    
     def validate_target_data_integrity(self, cursor) -> Dict[str, Any]:
         """Validate target database data integrity after migration"""
         
@@ -193,15 +608,6 @@ class DataValidators:
             result['passed'] = False
             return result
         
-        # Get table record count
-        cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-        result['record_count'] = cursor.fetchone()[0]
-        
-        if result['record_count'] == 0:
-            result['warnings'].append(f"Table {table_name} is empty")
-            return result
-        
-        # Check required columns exist
         cursor.execute("""
             SELECT column_name 
             FROM information_schema.columns 
@@ -211,167 +617,101 @@ class DataValidators:
         
         existing_columns = [row[0] for row in cursor.fetchall()]
         
+        # Record count, not-null, uniqueness and data checks in one table scan
+        plan = ValidationQueryPlan(table_name, rules, existing_columns)
+        aggregates = self._run_aggregate_pass(cursor, plan)
+        result['record_count'] = aggregates['record_count']
+        
+        if result['record_count'] == 0:
+            result['warnings'].append(f"Table {table_name} is empty")
+            return result
+        
+        # Check required columns exist
         for required_col in rules.get('required_columns', []):
             if required_col not in existing_columns:
                 result['errors'].append(f"Required column {required_col} missing from {table_name}")
                 result['passed'] = False
         
-        # Validate not null constraints
-        for not_null_col in rules.get('not_null_columns', []):
-            if not_null_col in existing_columns:
-                cursor.execute(f"SELECT COUNT(*) FROM {table_name} WHERE {not_null_col} IS NULL")
-                null_count = cursor.fetchone()[0]
-                
-                if null_count > 0:
-                    result['errors'].append(f"Column {not_null_col} has {null_count} NULL values")
-                    result['passed'] = False
-        
-        # Validate unique constraints
-        for unique_col in rules.get('unique_columns', []):
-            if unique_col in existing_columns:
-                cursor.execute(f"""
-                    SELECT {unique_col}, COUNT(*) 
-                    FROM {table_name} 
-                    WHERE {unique_col} IS NOT NULL 
-                    GROUP BY {unique_col} 
-                    HAVING COUNT(*) > 1
-                """)
-                
-                duplicates = cursor.fetchall()
-                if duplicates:
-                    result['errors'].append(f"Column {unique_col} has duplicate values: {len(duplicates)} groups")
-                    result['passed'] = False
-        
-        # Validate foreign key relationships (referential integrity)
-        for fk in rules.get('foreign_keys', []):
-            column = fk['column']
-            reference = fk['references']
-            ref_table, ref_column = reference.split('.')
+        for check in plan.checks:
+            column = check['column']
             
-            if column in existing_columns:
-                cursor.execute(f"""
-                    SELECT COUNT(*) 
-                    FROM {table_name} t1 
-                    LEFT JOIN {ref_table} t2 ON t1.{column} = t2.{ref_column}
-                    WHERE t1.{column} IS NOT NULL 
-                    AND t2.{ref_column} IS NULL
-                """)
-                
+            if check['kind'] == 'foreign_key':
+                cursor.execute(plan.orphan_query(check))
                 orphaned_count = cursor.fetchone()[0]
                 if orphaned_count > 0:
                     result['errors'].append(f"Foreign key {column} has {orphaned_count} orphaned references")
                     result['passed'] = False
-        
-        # Validate data checks
-        for data_check in rules.get('data_checks', []):
-            column = data_check['column']
-            check_type = data_check['check']
+                continue
             
-            if column in existing_columns:
-                check_result = self._perform_data_check(cursor, table_name, column, check_type)
-                
-                if not check_result['passed']:
-                    result['errors'].extend(check_result['errors'])
+            count = aggregates[check['id']]
+            if isinstance(count, psycopg2.Error):
+                if check['kind'] != 'data_check':
+                    raise count
+                result['errors'].append(f"Data check {check['check_type']} failed: {str(count)}")
+                result['passed'] = False
+                continue
+            
+            if check['kind'] == 'not_null':
+                if count > 0:
+                    result['errors'].append(f"Column {column} has {count} NULL values")
                     result['passed'] = False
-                
-                if check_result['warnings']:
-                    result['warnings'].extend(check_result['warnings'])
+            
+            elif check['kind'] == 'unique':
+                if count > 0:
+                    cursor.execute(plan.duplicate_groups_query(check))
+                    result['errors'].append(f"Column {column} has duplicate values: {cursor.fetchone()[0]} groups")
+                    result['passed'] = False
+            
+            elif count > 0:
+                definition = DATA_CHECKS[check['check_type']]
+                message = definition['message'].format(count=count, column=column)
+                if definition['severity'] == 'error':
+                    result['errors'].append(message)
+                    result['passed'] = False
+                else:
+                    result['warnings'].append(message)
         
         return result
     
-    def _perform_data_check(self, cursor, table_name: str, column: str, check_type: str) -> Dict[str, Any]:
-        """Perform specific data validation checks"""
+    def _run_aggregate_pass(self, cursor, plan: ValidationQueryPlan) -> Dict[str, Any]:
+        """
+        Evaluate all aggregate checks of a table in a single scan.
         
-        result = {
-            'passed': True,
-            'errors': [],
-            'warnings': []
-        }
+        If the combined query fails (e.g. a regex check on a non-text column),
+        the checks are re-run one by one so only the broken check is reported;
+        its value is then the psycopg2 error instead of a count.
+        """
         
+        checks = plan.aggregate_checks
+        
+        cursor.execute("SAVEPOINT validation_pass")
         try:
-            if check_type == 'email_format':
-                cursor.execute(f"""
-                    SELECT COUNT(*) 
-                    FROM {table_name} 
-                    WHERE {column} IS NOT NULL 
-                    AND {column} !~ '^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{{2,}}$'
-                """)
-                
-                invalid_count = cursor.fetchone()[0]
-                if invalid_count > 0:
-                    result['errors'].append(f"{invalid_count} invalid email formats in {column}")
-                    result['passed'] = False
-            
-            elif check_type == 'email_format_optional':
-                cursor.execute(f"""
-                    SELECT COUNT(*) 
-                    FROM {table_name} 
-                    WHERE {column} IS NOT NULL 
-                    AND {column} != ''
-                    AND {column} !~ '^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{{2,}}$'
-                """)
-                
-                invalid_count = cursor.fetchone()[0]
-                if invalid_count > 0:
-                    result['warnings'].append(f"{invalid_count} invalid email formats in optional {column}")
-            
-            elif check_type == 'non_empty_string':
-                cursor.execute(f"""
-                    SELECT COUNT(*) 
-                    FROM {table_name} 
-                    WHERE {column} IS NOT NULL 
-                    AND TRIM({column}) = ''
-                """)
-                
-                empty_count = cursor.fetchone()[0]
-                if empty_count > 0:
-                    result['errors'].append(f"{empty_count} empty strings in {column}")
-                    result['passed'] = False
-            
-            elif check_type == 'valid_timestamp':
-                cursor.execute(f"""
-                    SELECT COUNT(*) 
-                    FROM {table_name} 
-                    WHERE {column} IS NOT NULL 
-                    AND {column} > NOW() + INTERVAL '1 day'
-                """)
-                
-                future_count = cursor.fetchone()[0]
-                if future_count > 0:
-                    result['warnings'].append(f"{future_count} future timestamps in {column}")
-            
-            elif check_type == 'positive_number_optional':
-                cursor.execute(f"""
-                    SELECT COUNT(*) 
-                    FROM {table_name} 
-                    WHERE {column} IS NOT NULL 
-                    AND {column} < 0
-                """)
-                
-                negative_count = cursor.fetchone()[0]
-                if negative_count > 0:
-                    result['warnings'].append(f"{negative_count} negative values in {column}")
-            
-            elif check_type == 'valid_process_status':
-                valid_statuses = ['not_started', 'in_progress', 'completed', 'on_hold', 'cancelled']
-                
-                cursor.execute(f"""
-                    SELECT COUNT(*) 
-                    FROM {table_name} 
-                    WHERE {column} IS NOT NULL 
-                    AND {column} NOT IN %s
-                """, (tuple(valid_statuses),))
-                
-                invalid_status_count = cursor.fetchone()[0]
-                if invalid_status_count > 0:
-                    result['errors'].append(f"{invalid_status_count} invalid status values in {column}")
-                    result['passed'] = False
+            cursor.execute(plan.aggregate_query())
+            row = cursor.fetchone()
+            cursor.execute("RELEASE SAVEPOINT validation_pass")
             
+            values = {'record_count': row[0]}
+            values.update((check['id'], value) for check, value in zip(checks, row[1:]))
+            return values
+        
         except psycopg2.Error as e:
-            result['errors'].append(f"Data check {check_type} failed: {str(e)}")
-            result['passed'] = False
+            cursor.execute("ROLLBACK TO SAVEPOINT validation_pass")
+            logger.warning(f"Aggregate validation of {plan.table_name} failed, checking individually: {str(e)}")
         
-        return result
+        cursor.execute(f"SELECT COUNT(*) FROM {plan.table_name}")
+        values = {'record_count': cursor.fetchone()[0]}
+        
+        for check in checks:
+            cursor.execute("SAVEPOINT validation_check")
+            try:
+                cursor.execute(f"SELECT {check['expression']} FROM {plan.table_name}")
+                values[check['id']] = cursor.fetchone()[0]
+                cursor.execute("RELEASE SAVEPOINT validation_check")
+            except psycopg2.Error as e:
+                cursor.execute("ROLLBACK TO SAVEPOINT validation_check")
+                values[check['id']] = e
+        
+        return values
     
     def compare_table_schemas(self, source_cursor, target_cursor, table_name: str) -> Dict[str, Any]:
         """Compare schema between source and target tables"""
@@ -1,11 +1,24 @@
+# Imported first so that its import timer sees the rest of init
+from lambda_runtime import get_client, report_cold_start, secret_cache, is_authentication_failure
+
 import json
 import os
-import boto3
+import hashlib
 import logging
+import re
+import shutil
 import subprocess
 import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from botocore.exceptions import ClientError
+from logical_dump import LogicalDumper, table_checksums, iter_decompressed
+
+try:
+    import psycopg2
+except ImportError:  # optional; provided by a Lambda layer
+    psycopg2 = None
 
 # Configure logging
 logging.basicConfig(
@@ -14,6 +27,26 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Streaming upload settings; S3 multipart parts must be at least 5 MB
+STREAM_PART_SIZE = max(5, int(os.environ.get('BACKUP_PART_SIZE_MB', '16'))) * 1024 * 1024
+UPLOAD_CONCURRENCY = int(os.environ.get('BACKUP_UPLOAD_CONCURRENCY', '4'))
+
+# Passed to pg_dump --compress: a level (9) or, with pg_dump 16+, method[:level] such as lz4 or zstd:3
+DUMP_COMPRESSION = os.environ.get('BACKUP_COMPRESSION', '9')
+DUMP_JOBS = int(os.environ.get('BACKUP_DUMP_JOBS', '4'))
+
+# Differential backups: daily runs dump only tables changed since the last full (base) backup
+DIFFERENTIAL_STATE_KEY = 'differential/state.json'
+
+# Restore verification into a scratch database (defaults to the backed up instance)
+VERIFY_JOBS = int(os.environ.get('BACKUP_VERIFY_JOBS', str(DUMP_JOBS)))
+BACKUP_PREFIXES = ('daily/', 'weekly/', 'monthly/')
+
+# pg_dump --verbose progress lines used to time and upload directory-format table files
+DUMPING_TABLE_PATTERN = re.compile(r'dumping contents of table "(?P<table>[^"]+)"')
+FINISHED_ITEM_PATTERN = re.compile(r'finished item (?P<dump_id>\d+) TABLE DATA (?P<table>\S+)')
+
+@report_cold_start
 def handler(event, context):
     """
     Lambda function to create database backups and store them in S3.
@@ -24,6 +57,21 @@ def handler(event, context):
     3. Uploads to S3 with appropriate lifecycle tags
     4. Creates RDS snapshot as additional backup
     5. Sends notifications on success/failure
+    
+    By default the dump is streamed straight into a multipart upload while
+    pg_dump runs (BACKUP_STREAMING, or "streaming" in the event). Set it to
+    false to dump into /tmp first and upload the finished file.
+    
+    BACKUP_DUMP_FORMAT=directory (or "dump_format" in the event) runs a
+    parallel directory-format dump instead and uploads each table file as
+    soon as pg_dump finishes it, followed by a manifest.
+    
+    BACKUP_MODE=differential (or "backup_mode" in the event) makes daily
+    runs dump only the tables changed since the last weekly/monthly base.
+    An event with "action": "restore_differential" and "target_db_name"
+    restores a base plus its latest (or the given) differential instead,
+    and "action": "verify_backup" restores the latest (or the given)
+    backup into a scratch database and checks it against dump-time checksums.
     """
     
     # Environment variables
@@ -32,49 +80,113 @@ def handler(event, context):
     db_name = os.environ['DB_NAME']
     project_name = os.environ['PROJECT_NAME']
     environment = os.environ['ENVIRONMENT']
+    streaming = event.get('streaming', os.environ.get('BACKUP_STREAMING', 'true').lower() == 'true')
+    dump_format = event.get('dump_format', os.environ.get('BACKUP_DUMP_FORMAT', 'custom'))
+    backup_mode = event.get('backup_mode', os.environ.get('BACKUP_MODE', 'full'))
     
-    # AWS clients
-    s3_client = boto3.client('s3')
-    rds_client = boto3.client('rds')
-    sns_client = boto3.client('sns')
-    secretsmanager_client = boto3.client('secretsmanager')
+    # AWS clients, cached across warm invocations
+    s3_client = get_client('s3')
+    rds_client = get_client('rds')
+    sns_client = get_client('sns')
+    secretsmanager_client = get_client('secretsmanager')
     
     timestamp = datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')
     backup_filename = f"{project_name}_{environment}_{timestamp}.sql.gz"
     
+    if event.get('action') == 'restore_differential':
+        return handle_differential_restore(event, s3_client, sns_client, secretsmanager_client,
+                                           s3_bucket, db_endpoint, project_name, environment, timestamp)
+    
+    if event.get('action') == 'verify_backup':
+        return handle_backup_verification(event, s3_client, sns_client, secretsmanager_client,
+                                          s3_bucket, db_name, project_name, environment, timestamp)
+    
     try:
         logger.info(f"Starting database backup for {project_name} {environment}")
         
         # Get database credentials from Secrets Manager
         db_credentials = get_db_credentials(secretsmanager_client, project_name, environment)
         
-        # Create database dump
-        dump_file_path = create_database_dump(
-            db_endpoint, 
-            db_name, 
-            db_credentials['username'],
-            db_credentials['password'],
-            backup_filename
-        )
+        if backup_mode == 'differential':
+            # Full base on weekly/monthly runs, changed tables only on daily runs
+            upload = create_differential_backup(
+                s3_client,
+                s3_bucket,
+                db_endpoint,
+                db_name,
+                db_credentials['username'],
+                db_credentials['password'],
+                backup_filename,
+                timestamp
+            )
+            dump_format = 'custom'
+        elif dump_format == 'directory':
+            # One file per table, dumped by parallel workers and uploaded as each completes
+            upload = create_directory_dump(
+                s3_client,
+                s3_bucket,
+                db_endpoint,
+                db_name,
+                db_credentials['username'],
+                db_credentials['password'],
+                backup_filename,
+                timestamp
+            )
+        elif streaming:
+            # Dump and upload overlap; nothing is written to /tmp
+            upload = stream_database_dump(
+                s3_client,
+                s3_bucket,
+                db_endpoint,
+                db_name,
+                db_credentials['username'],
+                db_credentials['password'],
+                backup_filename,
+                timestamp
+            )
+        else:
+            # Create database dump
+            dump_file_path = create_database_dump(
+                db_endpoint, 
+                db_name, 
+                db_credentials['username'],
+                db_credentials['password'],
+                backup_filename
+            )
+            
+            # Upload to S3 (the Python fallback may have picked a different extension)
+            upload = upload_to_s3(s3_client, s3_bucket, dump_file_path, os.path.basename(dump_file_path), timestamp)
+            
+            # Cleanup temporary file
+            os.remove(dump_file_path)
         
-        # Upload to S3
-        s3_key = upload_to_s3(s3_client, s3_bucket, dump_file_path, backup_filename, timestamp)
+        s3_key = upload['s3_key']
         
         # Create RDS snapshot
         snapshot_id = create_rds_snapshot(rds_client, project_name, environment, timestamp)
         
-        # Cleanup temporary file
-        os.remove(dump_file_path)
-        
         # Send success notification
         success_message = {
             'status': 'SUCCESS',
             'backup_file': s3_key,
             'snapshot_id': snapshot_id,
             'timestamp': timestamp,
-            'size_mb': get_file_size_mb(s3_client, s3_bucket, s3_key)
+            'size_mb': get_file_size_mb(upload['size_bytes']),
+            'sha256': upload['sha256'],
+            'dump_format': dump_format,
+            'dumper': upload.get('dumper', 'pg_dump'),
+            'streamed': upload.get('streamed', False),
+            'backup_seconds': upload.get('seconds'),
+            'throughput_mb_per_second': upload.get('throughput_mb_per_second')
         }
         
+        if 'tables' in upload:
+            success_message['tables'] = upload['tables']
+        
+        if 'differential' in upload:
+            success_message['backup_mode'] = backup_mode
+            success_message['differential'] = upload['differential']
+        
         send_notification(sns_client, 'Backup Successful', success_message)
         
         logger.info(f"Backup completed successfully: {s3_key}")
@@ -86,6 +198,7 @@ def handler(event, context):
         
     except Exception as e:
         logger.error(f"Backup failed: {str(e)}")
+        forget_rejected_credentials(e, project_name, environment)
         
         # Send failure notification
         failure_message = {
@@ -102,12 +215,14 @@ def handler(event, context):
         }
 
 def get_db_credentials(secretsmanager_client, project_name, environment):
-    """Retrieve database credentials from AWS Secrets Manager."""
+    """Retrieve database credentials from AWS Secrets Manager, cached across warm invocations."""
+    
+    from botocore.exceptions import ClientError
+    
     try:
         secret_name = f"{project_name}/{environment}/database"
         
-        response = secretsmanager_client.get_secret_value(SecretId=secret_name)
-        credentials = json.loads(response['SecretString'])
+        credentials = json.loads(secret_cache.get(secret_name, client=secretsmanager_client))
         
         return {
             'username': credentials['username'],
@@ -121,6 +236,12 @@ def get_db_credentials(secretsmanager_client, project_name, environment):
             'password': os.environ.get('DB_PASSWORD', '')
         }
 
+def forget_rejected_credentials(error, project_name, environment):
+    """Drop cached credentials the database rejected, so the next run fetches the rotated secret."""
+    if is_authentication_failure(error):
+        logger.warning("Database rejected the cached credentials; invalidating them")
+        secret_cache.invalidate(f"{project_name}/{environment}/database")
+
 def create_database_dump(db_endpoint, db_name, username, password, backup_filename):
     """Create a compressed PostgreSQL database dump."""
     
@@ -132,22 +253,10 @@ def create_database_dump(db_endpoint, db_name, username, password, backup_filena
     # This is a simplified approach - in production, you'd use a Lambda layer
     try:
         # Set PGPASSWORD environment variable for pg_dump
-        env = os.environ.copy()
-        env['PGPASSWORD'] = password
+        env = pg_environment(password)
         
         # pg_dump command
-        pg_dump_command = [
-            'pg_dump',
-            f'--host={db_endpoint}',
-            f'--username={username}',
-            f'--dbname={db_name}',
-            '--verbose',
-            '--clean',
-            '--no-owner',
-            '--no-privileges',
-            '--format=custom',
-            '--compress=9'
-        ]
+        pg_dump_command = build_pg_dump_command(db_endpoint, db_name, username)
         
         logger.info(f"Creating database dump: {backup_filename}")
         
@@ -168,47 +277,1219 @@ def create_database_dump(db_endpoint, db_name, username, password, backup_filena
         logger.error(f"pg_dump failed: {e.stderr.decode()}")
         raise Exception(f"Database dump failed: {e.stderr.decode()}")
     except FileNotFoundError:
-        # Fallback: Create a simple backup using psql
-        logger.warning("pg_dump not found, using psql fallback")
-        return create_simple_backup(db_endpoint, db_name, username, password, dump_file_path, env)
-
-def create_simple_backup(db_endpoint, db_name, username, password, dump_file_path, env):
-    """Create a simple SQL backup using psql (fallback method)."""
-    
-    # Create a simple schema dump
-    psql_command = [
-        'psql',
-        f'postgresql://{username}:{password}@{db_endpoint}/{db_name}',
-        '-c', '\\d+',  # List all tables with details
+        # Fallback: dump with psycopg2 instead of pg_dump
+        logger.warning("pg_dump not found, using the Python dumper")
+        return create_python_backup(db_endpoint, db_name, username, password, dump_file_path)
+
+def pg_environment(password):
+    """Process environment for PostgreSQL client tools."""
+    env = os.environ.copy()
+    env['PGPASSWORD'] = password
+    return env
+
+def build_pg_dump_command(db_endpoint, db_name, username, dump_format='custom', compression=None,
+                          jobs=None, output_dir=None, tables=None, snapshot=None):
+    """
+    pg_dump arguments for a compressed custom- or directory-format dump.
+    
+    With tables, only the data of those tables is dumped (no schema, no
+    --clean), as used for differential backups. With snapshot, pg_dump
+    reads the exported snapshot that the verification reference uses.
+    """
+    command = [
+        'pg_dump',
+        *pg_connection_args(db_endpoint, db_name, username),
+        '--verbose',
+        '--data-only' if tables else '--clean',
+        '--no-owner',
+        '--no-privileges',
+        f'--format={dump_format}',
+        f'--compress={compression or DUMP_COMPRESSION}'
+    ]
+    
+    if dump_format == 'directory':
+        command.extend([f'--jobs={jobs or DUMP_JOBS}', f'--file={output_dir}'])
+    
+    for table in tables or []:
+        command.append(f'--table={table}')
+    
+    if snapshot:
+        command.append(f'--snapshot={snapshot}')
+    
+    return command
+
+class DumpReference:
+    """
+    Row counts and checksums of every table, read in the snapshot pg_dump dumps.
+    
+    start() exports a snapshot for pg_dump --snapshot and computes the
+    checksums on that connection while the dump runs; store() writes them
+    next to the backup for verify_backup. The exporting transaction stays
+    open until store(), which pg_dump needs until it has imported it.
+    Without psycopg2 no reference is captured and the dump is unaffected.
+    """
+    
+    def __init__(self, db_endpoint, db_name, username, password):
+        self.connect_kwargs = connection_kwargs(db_endpoint, db_name, username, password)
+        self.conn = None
+        self.snapshot_id = None
+        self.executor = None
+        self.future = None
+    
+    def start(self):
+        """Export the snapshot and start checksumming; returns the snapshot id or None."""
+        if psycopg2 is None:
+            logger.warning("psycopg2 not available; backup will have no verification reference")
+            return None
+        
+        try:
+            self.conn = psycopg2.connect(**self.connect_kwargs)
+            self.conn.set_session(isolation_level='REPEATABLE READ', readonly=True)
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT pg_export_snapshot()")
+            self.snapshot_id = cursor.fetchone()[0]
+        except Exception as e:
+            logger.warning(f"Could not export a snapshot for the verification reference: {e}")
+            self.close()
+            return None
+        
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.future = self.executor.submit(table_checksums, self.conn.cursor())
+        return self.snapshot_id
+    
+    def store(self, s3_client, bucket, backup_key, **details):
+        """Write <backup_key>.verify.json; returns the reference or None."""
+        if self.future is None:
+            return None
+        
+        try:
+            reference = {
+                'backup_key': backup_key,
+                'snapshot_id': self.snapshot_id,
+                'captured_at': datetime.now(timezone.utc).isoformat(),
+                'tables': self.future.result(),
+                **details
+            }
+        except Exception as e:
+            logger.warning(f"Verification reference failed: {e}")
+            return None
+        finally:
+            self.close()
+        
+        store_verification_reference(s3_client, bucket, backup_key, reference)
+        return reference
+    
+    def close(self):
+        if self.executor:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        if self.conn:
+            try:
+                self.conn.rollback()
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
+
+def connection_kwargs(db_endpoint, db_name, username, password):
+    """psycopg2 connection arguments for an RDS host:port endpoint."""
+    host, _, port = db_endpoint.partition(':')
+    return {
+        'host': host,
+        'port': int(port or 5432),
+        'dbname': db_name,
+        'user': username,
+        'password': password,
+        'connect_timeout': 30,
+        'application_name': 'lambda-backup'
+    }
+
+def pg_connection_args(db_endpoint, db_name, username):
+    """pg_dump, pg_restore and psql connection options for an RDS host:port endpoint."""
+    kwargs = connection_kwargs(db_endpoint, db_name, username, None)
+    return [
+        f"--host={kwargs['host']}",
+        f"--port={kwargs['port']}",
+        f"--username={username}",
+        f"--dbname={db_name}"
     ]
+
+def store_verification_reference(s3_client, bucket, backup_key, reference):
+    """Store dump-time counts and checksums next to a backup."""
+    s3_client.put_object(
+        Bucket=bucket,
+        Key=f"{backup_key}.verify.json",
+        Body=json.dumps(reference, indent=2).encode('utf-8'),
+        ContentType='application/json',
+        ServerSideEncryption='AES256'
+    )
+
+def start_stderr_drain(process):
+    """Read a process's stderr in a thread so it never blocks on a full pipe."""
+    chunks = []
+    thread = threading.Thread(target=lambda: chunks.append(process.stderr.read()), daemon=True)
+    thread.start()
+    return thread, chunks
+
+def stream_database_dump(s3_client, bucket, db_endpoint, db_name, username, password, filename, timestamp,
+                         tables=None):
+    """
+    Pipe pg_dump output straight into an S3 multipart upload.
+    
+    Parts are uploaded in parallel while pg_dump keeps writing, so the dump
+    and the upload overlap and the backup size is not limited by /tmp.
+    Falls back to the Python dumper when pg_dump is missing.
+    """
+    
+    backup_type = determine_backup_type(timestamp)
+    s3_key = f"{backup_type}/{filename}"
+    env = pg_environment(password)
+    started = time.monotonic()
+    
+    # Full dumps get a verification reference from the same snapshot
+    reference = DumpReference(db_endpoint, db_name, username, password)
+    snapshot_id = reference.start() if not tables else None
+    
+    try:
+        process = subprocess.Popen(
+            build_pg_dump_command(db_endpoint, db_name, username, tables=tables, snapshot=snapshot_id),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=env
+        )
+    except FileNotFoundError:
+        reference.close()
+        if tables:
+            raise Exception("Differential backups require pg_dump")
+        logger.warning("pg_dump not found, using the Python dumper")
+        return stream_python_dump(s3_client, bucket, db_endpoint, db_name, username, password, filename, timestamp)
+    
+    # --verbose writes a lot to stderr
+    stderr_thread, stderr_chunks = start_stderr_drain(process)
+    
+    def check_dump():
+        # Runs before the upload is completed, so a failed dump never becomes a visible object
+        return_code = process.wait()
+        stderr_thread.join()
+        if return_code != 0:
+            stderr = b''.join(stderr_chunks).decode(errors='replace')
+            logger.error(f"pg_dump failed: {stderr}")
+            raise Exception(f"Database dump failed: {stderr}")
+    
+    logger.info(f"Streaming database dump to S3: {bucket}/{s3_key}")
+    
+    try:
+        upload = upload_stream_to_s3(
+            s3_client, bucket, s3_key, process.stdout, backup_metadata(backup_type, timestamp),
+            before_complete=check_dump
+        )
+    except Exception:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        reference.close()
+        raise
+    finally:
+        process.stdout.close()
+    
+    tag_backup_object(s3_client, bucket, s3_key, backup_type, timestamp, upload['sha256'])
+    verification = reference.store(s3_client, bucket, s3_key, dumper='pg_dump', format='custom')
+    
+    seconds = time.monotonic() - started
+    upload.update({
+        's3_key': s3_key,
+        'dumper': 'pg_dump',
+        'verification_reference': verification is not None,
+        'streamed': True,
+        'seconds': round(seconds, 3),
+        'throughput_mb_per_second': round(upload['size_bytes'] / 1024 / 1024 / seconds, 2) if seconds > 0 else None
+    })
+    
+    logger.info(f"Streamed backup completed: {s3_key} ({upload['size_bytes']} bytes in {upload['parts']} parts)")
+    return upload
+
+def run_psql_query(db_endpoint, db_name, username, password, sql):
+    """Run a query with psql and return the rows as lists of strings."""
+    result = subprocess.run(
+        [
+            'psql',
+            *pg_connection_args(db_endpoint, db_name, username),
+            '--no-align',
+            '--tuples-only',
+            '--field-separator=|',
+            '--set=ON_ERROR_STOP=1',
+            f'--command={sql}'
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        env=pg_environment(password),
+        text=True
+    )
+    
+    if result.returncode != 0:
+        raise Exception(f"psql query failed: {result.stderr}")
+    
+    return [line.split('|') for line in result.stdout.splitlines() if line]
+
+def get_table_change_counters(db_endpoint, db_name, username, password):
+    """
+    Change fingerprint of every user table from pg_stat_user_tables.
+    
+    Row insert/update/delete counters catch DML; the relation filenode
+    catches TRUNCATE, which those counters do not see. A statistics reset
+    changes every fingerprint, which only makes the next differential larger.
+    The last field hashes the table's column names and types, which catches
+    column DDL that keeps the filenode, such as ADD COLUMN without a rewrite.
+    """
+    rows = run_psql_query(db_endpoint, db_name, username, password, """
+        SELECT quote_ident(s.schemaname) || '.' || quote_ident(s.relname),
+               s.n_tup_ins, s.n_tup_upd, s.n_tup_del, pg_relation_filenode(s.relid),
+               (
+                   SELECT md5(string_agg(a.attname || ' ' || format_type(a.atttypid, a.atttypmod), ',' ORDER BY a.attnum))
+                   FROM pg_attribute a
+                   WHERE a.attrelid = s.relid AND a.attnum > 0 AND NOT a.attisdropped
+               )
+        FROM pg_stat_user_tables s
+        ORDER BY 1
+    """)
+    return {row[0]: ':'.join(row[1:]) for row in rows}
+
+def schema_fingerprint(fingerprint):
+    """Column part of a change fingerprint; None for fingerprints saved before it was added."""
+    fields = fingerprint.split(':')
+    return fields[4] if len(fields) > 4 else None
+
+def load_differential_state(s3_client, bucket):
+    """Base backup and differential history, or None before the first base."""
+    
+    from botocore.exceptions import ClientError
+    
+    try:
+        response = s3_client.get_object(Bucket=bucket, Key=DIFFERENTIAL_STATE_KEY)
+        return json.loads(response['Body'].read())
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+            return None
+        raise
+
+def save_differential_state(s3_client, bucket, state):
+    """Store the differential backup state next to the backups."""
+    s3_client.put_object(
+        Bucket=bucket,
+        Key=DIFFERENTIAL_STATE_KEY,
+        Body=json.dumps(state, indent=2).encode('utf-8'),
+        ContentType='application/json',
+        ServerSideEncryption='AES256'
+    )
+
+def create_differential_backup(s3_client, bucket, db_endpoint, db_name, username, password, filename, timestamp):
+    """
+    Dump the full database as a new base, or only the tables changed since the base.
+    
+    Weekly and monthly runs, the first run, and runs where tables were
+    added, dropped or had their columns changed since the base write a full
+    base; a data-only differential cannot carry schema changes. Daily runs
+    dump the data of tables whose change fingerprint differs from the base,
+    so the latest differential alone is enough to bring a restored base up
+    to date.
+    Fingerprints are read before dumping; changes made during the dump
+    show up in the next differential.
+    """
+    
+    backup_type = determine_backup_type(timestamp)
+    counters = get_table_change_counters(db_endpoint, db_name, username, password)
+    state = load_differential_state(s3_client, bucket)
+    
+    full = (
+        state is None
+        or backup_type != 'daily'
+        or set(counters) != set(state['base']['tables'])
+        or any(
+            schema_fingerprint(fingerprint) != schema_fingerprint(state['base']['tables'][table])
+            for table, fingerprint in counters.items()
+        )
+    )
+    
+    if full:
+        upload = stream_database_dump(s3_client, bucket, db_endpoint, db_name, username, password, filename, timestamp)
+        
+        # A Python dumper script cannot be combined with pg_restore differentials
+        if upload.get('dumper') == 'pg_dump':
+            save_differential_state(s3_client, bucket, {
+                'base': {'key': upload['s3_key'], 'timestamp': timestamp, 'tables': counters},
+                'differentials': []
+            })
+        
+        upload['differential'] = {'type': 'base', 'tables_changed': len(counters), 'tables_unchanged': 0}
+        return upload
+    
+    base = state['base']
+    changed = sorted(table for table, fingerprint in counters.items() if base['tables'][table] != fingerprint)
+    summary = {
+        'type': 'differential',
+        'base_backup': base['key'],
+        'tables_changed': len(changed),
+        'tables_unchanged': len(counters) - len(changed),
+        'changed': changed
+    }
+    
+    if not changed:
+        logger.info(f"No tables changed since base {base['key']}; skipping dump")
+        upload = {'s3_key': base['key'], 'size_bytes': 0, 'sha256': None, 'streamed': False}
+    else:
+        logger.info(f"Dumping {len(changed)} of {len(counters)} tables changed since base {base['key']}")
+        diff_filename = filename.replace('.sql.gz', '_diff.sql.gz')
+        upload = stream_database_dump(s3_client, bucket, db_endpoint, db_name, username, password,
+                                      diff_filename, timestamp, tables=changed)
+    
+    state['differentials'].append({
+        'key': upload['s3_key'] if changed else None,
+        'timestamp': timestamp,
+        'tables': changed
+    })
+    save_differential_state(s3_client, bucket, state)
+    
+    upload['differential'] = summary
+    return upload
+
+def pipe_s3_object(s3_client, bucket, key, stdin, transform=None, progress=None):
+    """
+    Copy an S3 object into a process's stdin from a background thread.
+    
+    transform maps the iterator of downloaded chunks (e.g. to decompress
+    them); progress['bytes'] counts the bytes downloaded.
+    """
+    
+    errors = []
+    
+    def download():
+        body = s3_client.get_object(Bucket=bucket, Key=key)['Body']
+        for chunk in body.iter_chunks(chunk_size=1024 * 1024):
+            if progress is not None:
+                progress['bytes'] = progress.get('bytes', 0) + len(chunk)
+            yield chunk
+    
+    def copy():
+        try:
+            chunks = download()
+            for chunk in transform(chunks) if transform else chunks:
+                stdin.write(chunk)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            try:
+                stdin.close()
+            except OSError:
+                pass
+    
+    thread = threading.Thread(target=copy, daemon=True)
+    thread.start()
+    return thread, errors
+
+def restore_differential_backup(s3_client, bucket, db_endpoint, target_db, username, password, differential_key=None):
+    """
+    Restore the base backup, then apply a differential on top of it.
+    
+    The base is streamed from S3 into pg_restore --clean. The differential's
+    tables are emptied and reloaded in one psql transaction, with
+    session_replication_role=replica so foreign keys from tables that did
+    not change are not checked or cascaded while they are reloaded.
+    """
+    
+    state = load_differential_state(s3_client, bucket)
+    if state is None:
+        raise Exception("No differential backup state found")
+    
+    differentials = [entry for entry in state['differentials'] if entry['key']]
+    if differential_key:
+        differentials = [entry for entry in differentials if entry['key'] == differential_key]
+        if not differentials:
+            raise Exception(f"{differential_key} is not a differential of base {state['base']['key']}")
+    differential = differentials[-1] if differentials else None
+    
+    env = pg_environment(password)
+    connection = pg_connection_args(db_endpoint, target_db, username)
+    started = time.monotonic()
+    
+    logger.info(f"Restoring base backup {state['base']['key']} into {target_db}")
+    pg_restore = subprocess.Popen(
+        ['pg_restore', *connection, '--clean', '--if-exists', '--no-owner', '--no-privileges', '--exit-on-error'],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        env=env
+    )
+    copy_thread, copy_errors = pipe_s3_object(s3_client, bucket, state['base']['key'], pg_restore.stdin)
+    stderr_thread, stderr_chunks = start_stderr_drain(pg_restore)
+    return_code = pg_restore.wait()
+    copy_thread.join()
+    stderr_thread.join()
+    
+    if copy_errors or return_code != 0:
+        stderr = b''.join(stderr_chunks).decode(errors='replace')
+        raise Exception(f"Base restore failed: {copy_errors[0] if copy_errors else stderr}")
+    
+    base_seconds = time.monotonic() - started
+    result = {
+        'base_backup': state['base']['key'],
+        'differential_backup': differential['key'] if differential else None,
+        'target_db': target_db,
+        'base_restore_seconds': round(base_seconds, 3)
+    }
+    
+    if differential:
+        logger.info(f"Applying differential {differential['key']} ({len(differential['tables'])} tables)")
+        psql = subprocess.Popen(
+            ['psql', *connection, '--single-transaction', '--quiet', '--set=ON_ERROR_STOP=1'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            env=env
+        )
+        psql_stderr_thread, psql_stderr = start_stderr_drain(psql)
+        
+        prefix = "SET session_replication_role = replica;\n" + ''.join(
+            f"DELETE FROM {table};\n" for table in differential['tables']
+        )
+        psql.stdin.write(prefix.encode('utf-8'))
+        psql.stdin.flush()
+        
+        # pg_restore writes the data as a SQL script to stdout (--file=-), which psql applies
+        pg_restore = subprocess.Popen(
+            ['pg_restore', '--data-only', '--no-owner', '--no-privileges', '--file=-'],
+            stdin=subprocess.PIPE,
+            stdout=psql.stdin,
+            stderr=subprocess.PIPE,
+            env=env
+        )
+        copy_thread, copy_errors = pipe_s3_object(s3_client, bucket, differential['key'], pg_restore.stdin)
+        stderr_thread, stderr_chunks = start_stderr_drain(pg_restore)
+        restore_code = pg_restore.wait()
+        copy_thread.join()
+        stderr_thread.join()
+        
+        if copy_errors or restore_code != 0:
+            # Abort the psql transaction instead of committing a partial differential
+            psql.kill()
+            psql.wait()
+            stderr = b''.join(stderr_chunks).decode(errors='replace')
+            raise Exception(f"Differential restore failed: {copy_errors[0] if copy_errors else stderr}")
+        
+        psql.stdin.close()
+        psql_code = psql.wait()
+        psql_stderr_thread.join()
+        
+        if psql_code != 0:
+            raise Exception(f"Differential restore failed: {b''.join(psql_stderr).decode(errors='replace')}")
+        
+        result['differential_tables'] = differential['tables']
+        result['differential_restore_seconds'] = round(time.monotonic() - started - base_seconds, 3)
+    
+    result['restore_seconds'] = round(time.monotonic() - started, 3)
+    logger.info(f"Restore completed in {result['restore_seconds']}s")
+    return result
+
+def handle_differential_restore(event, s3_client, sns_client, secretsmanager_client,
+                                s3_bucket, db_endpoint, project_name, environment, timestamp):
+    """Handler branch for restore_differential events."""
+    
+    try:
+        target_db = event.get('target_db_name')
+        if not target_db:
+            raise Exception("restore_differential requires target_db_name")
+        
+        db_credentials = get_db_credentials(secretsmanager_client, project_name, environment)
+        result = restore_differential_backup(
+            s3_client,
+            s3_bucket,
+            db_endpoint,
+            target_db,
+            db_credentials['username'],
+            db_credentials['password'],
+            event.get('differential_key')
+        )
+        
+        message = dict(result, status='SUCCESS', timestamp=timestamp)
+        send_notification(sns_client, 'Restore Successful', message)
+        return {
+            'statusCode': 200,
+            'body': json.dumps(message)
+        }
+    
+    except Exception as e:
+        logger.error(f"Restore failed: {str(e)}")
+        forget_rejected_credentials(e, project_name, environment)
+        
+        failure_message = {
+            'status': 'FAILED',
+            'error': str(e),
+            'timestamp': timestamp
+        }
+        
+        send_notification(sns_client, 'Restore Failed', failure_message)
+        
+        return {
+            'statusCode': 500,
+            'body': json.dumps(failure_message)
+        }
+
+def find_latest_backup(s3_client, bucket):
+    """Key of the newest full backup: a custom or Python dump, or a directory manifest."""
+    candidates = []
+    paginator = s3_client.get_paginator('list_objects_v2')
+    
+    for prefix in BACKUP_PREFIXES:
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                key = obj['Key']
+                if key.endswith('/manifest.json') or (key.endswith(('.sql.gz', '.sql.zst')) and '_diff' not in key):
+                    candidates.append((obj['LastModified'], key))
+    
+    if not candidates:
+        raise Exception(f"No backups found in {bucket}")
+    
+    return max(candidates)[1]
+
+def detect_backup_format(s3_client, bucket, key):
+    """custom (pg_dump), directory (manifest), or gzip/zstd (Python dumper), from the key and magic bytes."""
+    if key.endswith('/manifest.json'):
+        return 'directory'
+    
+    head = s3_client.get_object(Bucket=bucket, Key=key, Range='bytes=0-4')['Body'].read()
+    if head.startswith(b'PGDMP'):
+        return 'custom'
+    if head.startswith(b'\x1f\x8b'):
+        return 'gzip'
+    if head.startswith(b'\x28\xb5\x2f\xfd'):
+        return 'zstd'
     
+    raise Exception(f"Unrecognised backup format for {key}")
+
+def recreate_scratch_database(endpoint, username, password, scratch_db, create=True):
+    """Drop the scratch database and, unless create is False, create it empty."""
+    conn = psycopg2.connect(**connection_kwargs(endpoint, 'postgres', username, password))
+    conn.autocommit = True
     try:
-        with open(dump_file_path, 'w') as dump_file:
-            dump_file.write(f"-- Database backup for {db_name}\n")
-            dump_file.write(f"-- Created at: {datetime.now(timezone.utc).isoformat()}\n\n")
+        cursor = conn.cursor()
+        cursor.execute(f'DROP DATABASE IF EXISTS "{scratch_db}"')
+        if create:
+            cursor.execute(f'CREATE DATABASE "{scratch_db}"')
+    finally:
+        conn.close()
+
+def restore_to_scratch(s3_client, bucket, backup_key, backup_format, endpoint, scratch_db, username, password, jobs):
+    """
+    Restore a backup into the scratch database; returns download and restore timings.
+    
+    Python dumps are decompressed on the fly into psql. Custom dumps are
+    streamed into pg_restore when jobs is 1; otherwise they are downloaded
+    with parallel ranged GETs, as are directory dumps, so that
+    pg_restore --jobs can seek in them.
+    """
+    
+    env = pg_environment(password)
+    connection = pg_connection_args(endpoint, scratch_db, username)
+    restore_options = ['--no-owner', '--no-privileges', '--exit-on-error']
+    progress = {'bytes': 0}
+    timings = {'download_seconds': 0.0}
+    
+    if backup_format in ('gzip', 'zstd') or (backup_format == 'custom' and jobs <= 1):
+        if backup_format == 'custom':
+            command = ['pg_restore', *connection, *restore_options]
+            transform = None
+        else:
+            command = ['psql', *connection, '--single-transaction', '--quiet', '--set=ON_ERROR_STOP=1']
+            transform = lambda chunks: iter_decompressed(chunks, backup_format)
+        
+        started = time.monotonic()
+        process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.PIPE, env=env)
+        copy_thread, copy_errors = pipe_s3_object(s3_client, bucket, backup_key, process.stdin, transform, progress)
+        stderr_thread, stderr_chunks = start_stderr_drain(process)
+        return_code = process.wait()
+        copy_thread.join()
+        stderr_thread.join()
+        
+        if copy_errors or return_code != 0:
+            stderr = b''.join(stderr_chunks).decode(errors='replace')
+            raise Exception(f"Restore into {scratch_db} failed: {copy_errors[0] if copy_errors else stderr}")
+        
+        timings['restore_seconds'] = time.monotonic() - started
+        timings['streamed'] = True
+    else:
+        work_dir = tempfile.mkdtemp(prefix='verify_')
+        try:
+            started = time.monotonic()
+            if backup_format == 'directory':
+                manifest = json.loads(s3_client.get_object(Bucket=bucket, Key=backup_key)['Body'].read())
+                prefix = backup_key.rsplit('/', 1)[0]
+                restore_path = work_dir
+                
+                def download(entry):
+                    s3_client.download_file(bucket, f"{prefix}/{entry['file']}", os.path.join(work_dir, entry['file']))
+                
+                with ThreadPoolExecutor(max_workers=max(1, UPLOAD_CONCURRENCY)) as executor:
+                    list(executor.map(download, manifest['files']))
+            else:
+                restore_path = os.path.join(work_dir, 'backup.dump')
+                s3_client.download_file(bucket, backup_key, restore_path)
+            
+            progress['bytes'] = sum(
+                os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(work_dir) for name in names
+            )
+            timings['download_seconds'] = time.monotonic() - started
             
-            # Get table list and create basic backup
+            started = time.monotonic()
             result = subprocess.run(
-                psql_command,
-                stdout=subprocess.PIPE,
+                ['pg_restore', *connection, *restore_options, f'--jobs={jobs}', restore_path],
+                stdout=subprocess.DEVNULL,
                 stderr=subprocess.PIPE,
-                env=env,
+                env=env
+            )
+            if result.returncode != 0:
+                raise Exception(f"Restore into {scratch_db} failed: {result.stderr.decode(errors='replace')}")
+            timings['restore_seconds'] = time.monotonic() - started
+            timings['streamed'] = False
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    timings['bytes'] = progress['bytes']
+    return timings
+
+def verify_backup(s3_client, bucket, endpoint, scratch_db, username, password, backup_key=None, jobs=None,
+                  keep_scratch=False):
+    """
+    Restore a backup into a scratch database and compare it with its dump-time reference.
+    
+    Every table in the reference must exist in the restored copy with the
+    same row count and content checksum. Backups without a reference are
+    restored and checksummed but reported as unverified.
+    """
+    
+    from botocore.exceptions import ClientError
+    
+    if psycopg2 is None:
+        raise Exception("verify_backup requires the psycopg2 package")
+    
+    started = time.monotonic()
+    backup_key = backup_key or find_latest_backup(s3_client, bucket)
+    backup_format = detect_backup_format(s3_client, bucket, backup_key)
+    jobs = jobs or VERIFY_JOBS
+    
+    try:
+        response = s3_client.get_object(Bucket=bucket, Key=f"{backup_key}.verify.json")
+        reference = json.loads(response['Body'].read())
+    except ClientError:
+        reference = None
+    
+    logger.info(f"Verifying {backup_format} backup {backup_key} in scratch database {scratch_db}")
+    
+    recreate_scratch_database(endpoint, username, password, scratch_db)
+    try:
+        timings = restore_to_scratch(s3_client, bucket, backup_key, backup_format, endpoint, scratch_db,
+                                     username, password, jobs)
+        
+        checksum_started = time.monotonic()
+        conn = psycopg2.connect(**connection_kwargs(endpoint, scratch_db, username, password))
+        try:
+            conn.set_session(readonly=True)
+            restored_tables = list(reference['tables']) if reference and reference.get('tables') else None
+            if restored_tables:
+                # Tables missing from the restore are reported below, not as query errors
+                cursor = conn.cursor()
+                cursor.execute("SELECT to_regclass(t) IS NOT NULL FROM unnest(%s::text[]) t", (restored_tables,))
+                present = [table for table, exists in zip(restored_tables, cursor.fetchall()) if exists[0]]
+            else:
+                present = None
+            restored = table_checksums(conn.cursor(), present)
+        finally:
+            conn.close()
+        checksum_seconds = time.monotonic() - checksum_started
+    finally:
+        if not keep_scratch:
+            recreate_scratch_database(endpoint, username, password, scratch_db, create=False)
+    
+    mismatches = []
+    if reference and reference.get('tables'):
+        for table, expected in reference['tables'].items():
+            actual = restored.get(table)
+            if actual is None:
+                mismatches.append({'table': table, 'problem': 'missing'})
+            elif actual['rows'] != expected['rows']:
+                mismatches.append({'table': table, 'problem': 'row_count',
+                                   'expected': expected['rows'], 'actual': actual['rows']})
+            elif actual['checksum'] != expected['checksum']:
+                mismatches.append({'table': table, 'problem': 'checksum'})
+    
+    total_seconds = time.monotonic() - started
+    restore_seconds = timings['restore_seconds']
+    
+    return {
+        'backup_key': backup_key,
+        'backup_format': backup_format,
+        'scratch_database': scratch_db,
+        'reference_available': bool(reference and reference.get('tables')),
+        'verified': bool(reference and reference.get('tables')) and not mismatches,
+        'tables_verified': len(restored),
+        'rows_verified': sum(stats['rows'] for stats in restored.values()),
+        'mismatches': mismatches,
+        'size_mb': get_file_size_mb(timings['bytes']),
+        'streamed': timings['streamed'],
+        'restore_jobs': 1 if timings['streamed'] else jobs,
+        'timings': {
+            'download_seconds': round(timings['download_seconds'], 3),
+            'restore_seconds': round(restore_seconds, 3),
+            'checksum_seconds': round(checksum_seconds, 3),
+            'total_seconds': round(total_seconds, 3),
+            'restore_mb_per_second': (
+                round(timings['bytes'] / 1024 / 1024 / restore_seconds, 2) if restore_seconds > 0 else None
+            )
+        }
+    }
+
+def same_instance(endpoint, other_endpoint):
+    """Whether two host[:port] endpoints name the same server; hosts compare case-insensitively."""
+    if not endpoint or not other_endpoint:
+        return False
+    
+    first = connection_kwargs(endpoint, None, None, None)
+    second = connection_kwargs(other_endpoint, None, None, None)
+    return (first['host'].lower().rstrip('.'), first['port']) == (second['host'].lower().rstrip('.'), second['port'])
+
+def handle_backup_verification(event, s3_client, sns_client, secretsmanager_client,
+                               s3_bucket, db_name, project_name, environment, timestamp):
+    """Handler branch for verify_backup events."""
+    
+    try:
+        # Verification drops and recreates the scratch database, so it only runs
+        # against an explicitly configured scratch instance, never the production one
+        endpoint = event.get('verify_endpoint') or os.environ.get('BACKUP_VERIFY_ENDPOINT')
+        if not endpoint:
+            raise Exception("BACKUP_VERIFY_ENDPOINT is not configured; refusing to restore into the production instance")
+        if same_instance(endpoint, os.environ.get('DB_ENDPOINT')):
+            raise Exception("The verification endpoint must not be the backed up instance")
+        
+        scratch_db = event.get('scratch_db_name') or os.environ.get('BACKUP_VERIFY_DATABASE') or f"{db_name}_verify"
+        if scratch_db in (db_name, os.environ.get('DB_NAME'), 'postgres'):
+            raise Exception(f"Refusing to use {scratch_db} as the scratch database; it is dropped and recreated")
+        
+        db_credentials = get_db_credentials(secretsmanager_client, project_name, environment)
+        result = verify_backup(
+            s3_client,
+            s3_bucket,
+            endpoint,
+            scratch_db,
+            db_credentials['username'],
+            db_credentials['password'],
+            backup_key=event.get('backup_key'),
+            jobs=event.get('jobs'),
+            keep_scratch=event.get('keep_scratch', False)
+        )
+        
+        if result['verified']:
+            status, subject = 'SUCCESS', 'Backup Verification Passed'
+        elif result['reference_available']:
+            status, subject = 'FAILED', 'Backup Verification Failed'
+        else:
+            status, subject = 'UNVERIFIED', 'Backup Restored Without Reference'
+        
+        message = dict(result, status=status, timestamp=timestamp)
+        send_notification(sns_client, subject, message)
+        return {
+            'statusCode': 500 if status == 'FAILED' else 200,
+            'body': json.dumps(message)
+        }
+    
+    except Exception as e:
+        logger.error(f"Backup verification failed: {str(e)}")
+        forget_rejected_credentials(e, project_name, environment)
+        
+        failure_message = {
+            'status': 'FAILED',
+            'error': str(e),
+            'timestamp': timestamp
+        }
+        
+        send_notification(sns_client, 'Backup Verification Failed', failure_message)
+        
+        return {
+            'statusCode': 500,
+            'body': json.dumps(failure_message)
+        }
+
+def create_directory_dump(s3_client, bucket, db_endpoint, db_name, username, password, filename, timestamp,
+                          jobs=None, compression=None):
+    """
+    Run a parallel directory-format dump and upload its files concurrently.
+    
+    Each table's data file is uploaded, then deleted locally, as soon as
+    pg_dump reports it finished, so uploads overlap the rest of the dump and
+    /tmp only holds files still being written. The table of contents is
+    uploaded last, followed by a manifest with per-table timings.
+    """
+    
+    backup_type = determine_backup_type(timestamp)
+    base_name = filename.split('.')[0]
+    s3_prefix = f"{backup_type}/{base_name}"
+    output_dir = os.path.join(tempfile.gettempdir(), base_name)
+    jobs = jobs or DUMP_JOBS
+    compression = compression or DUMP_COMPRESSION
+    metadata = backup_metadata(backup_type, timestamp)
+    
+    # pg_dump refuses to write into an existing directory
+    shutil.rmtree(output_dir, ignore_errors=True)
+    
+    reference = DumpReference(db_endpoint, db_name, username, password)
+    snapshot_id = reference.start()
+    command = build_pg_dump_command(db_endpoint, db_name, username, 'directory', compression, jobs, output_dir,
+                                    snapshot=snapshot_id)
+    started = time.monotonic()
+    table_started = {}
+    uploads = {}
+    stderr_lines = []
+    
+    logger.info(f"Creating directory-format dump with {jobs} jobs (compress={compression}): {s3_prefix}/")
+    
+    def upload_file(name, table=None, dump_seconds=None):
+        path = os.path.join(output_dir, name)
+        size_bytes = os.path.getsize(path)
+        sha256 = file_sha256(path)
+        
+        upload_started = time.monotonic()
+        s3_client.upload_file(
+            path,
+            bucket,
+            f"{s3_prefix}/{name}",
+            ExtraArgs={'Metadata': metadata, 'ServerSideEncryption': 'AES256'}
+        )
+        upload_seconds = time.monotonic() - upload_started
+        os.remove(path)
+        
+        entry = {
+            'file': name,
+            'table': table,
+            'size_bytes': size_bytes,
+            'sha256': sha256,
+            'dump_seconds': round(dump_seconds, 3) if dump_seconds is not None else None,
+            'upload_seconds': round(upload_seconds, 3)
+        }
+        if dump_seconds:
+            entry['dump_mb_per_second'] = round(size_bytes / 1024 / 1024 / dump_seconds, 2)
+        if upload_seconds > 0:
+            entry['upload_mb_per_second'] = round(size_bytes / 1024 / 1024 / upload_seconds, 2)
+        return entry
+    
+    with ThreadPoolExecutor(max_workers=max(1, UPLOAD_CONCURRENCY)) as executor:
+        try:
+            process = subprocess.Popen(
+                command,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                env=pg_environment(password),
                 text=True
             )
+        except FileNotFoundError:
+            reference.close()
+            raise Exception("Directory-format dumps require pg_dump")
+        
+        for line in process.stderr:
+            stderr_lines.append(line)
+            
+            dumping = DUMPING_TABLE_PATTERN.search(line)
+            if dumping:
+                table_started[dumping.group('table')] = time.monotonic()
+                continue
+            
+            finished = FINISHED_ITEM_PATTERN.search(line)
+            if finished:
+                table = finished.group('table')
+                data_files = [
+                    name for name in os.listdir(output_dir)
+                    if name.split('.')[0] == finished.group('dump_id') and name not in uploads
+                ]
+                started_at = next(
+                    (value for key, value in table_started.items() if key == table or key.endswith(f".{table}")),
+                    None
+                )
+                dump_seconds = time.monotonic() - started_at if started_at is not None else None
+                for name in data_files:
+                    uploads[name] = executor.submit(upload_file, name, table, dump_seconds)
+        
+        return_code = process.wait()
+        if return_code != 0:
+            stderr = ''.join(stderr_lines[-50:])
+            logger.error(f"pg_dump failed: {stderr}")
+            shutil.rmtree(output_dir, ignore_errors=True)
+            reference.close()
+            raise Exception(f"Database dump failed: {stderr}")
+        
+        # Whatever is left: toc.dat, and table files when pg_dump ran without parallel workers
+        remaining = sorted(name for name in os.listdir(output_dir) if name not in uploads and name != 'toc.dat')
+        for name in remaining:
+            uploads[name] = executor.submit(upload_file, name)
+        
+        files = [uploads[name].result() for name in sorted(uploads)]
+    
+    # The table of contents goes last, so a directory without toc.dat is recognisably incomplete
+    files.append(upload_file('toc.dat'))
+    shutil.rmtree(output_dir, ignore_errors=True)
+    
+    seconds = time.monotonic() - started
+    size_bytes = sum(entry['size_bytes'] for entry in files)
+    manifest = {
+        'format': 'directory',
+        'prefix': s3_prefix,
+        'timestamp': timestamp,
+        'jobs': jobs,
+        'compression': compression,
+        'size_bytes': size_bytes,
+        'seconds': round(seconds, 3),
+        'files': files
+    }
+    manifest_body = json.dumps(manifest, indent=2).encode('utf-8')
+    manifest_key = f"{s3_prefix}/manifest.json"
+    manifest_sha256 = hashlib.sha256(manifest_body).hexdigest()
+    
+    s3_client.put_object(
+        Bucket=bucket,
+        Key=manifest_key,
+        Body=manifest_body,
+        ContentType='application/json',
+        Metadata=metadata,
+        ServerSideEncryption='AES256'
+    )
+    tag_backup_object(s3_client, bucket, manifest_key, backup_type, timestamp, manifest_sha256)
+    reference.store(s3_client, bucket, manifest_key, dumper='pg_dump', format='directory')
+    
+    logger.info(f"Directory dump completed: {len(files)} files, {size_bytes} bytes in {seconds:.1f}s")
+    
+    return {
+        's3_key': manifest_key,
+        'size_bytes': size_bytes,
+        'sha256': manifest_sha256,
+        'seconds': round(seconds, 3),
+        'throughput_mb_per_second': round(size_bytes / 1024 / 1024 / seconds, 2) if seconds > 0 else None,
+        'tables': {
+            entry['table']: {
+                'size_bytes': entry['size_bytes'],
+                'dump_seconds': entry['dump_seconds'],
+                'upload_seconds': entry['upload_seconds'],
+                'dump_mb_per_second': entry.get('dump_mb_per_second'),
+                'upload_mb_per_second': entry.get('upload_mb_per_second')
+            }
+            for entry in files if entry['table']
+        }
+    }
+
+def upload_stream_to_s3(s3_client, bucket, key, stream, metadata, part_size=None, max_concurrency=None,
+                        before_complete=None):
+    """
+    Upload a binary stream as an S3 multipart object, computing size and SHA-256 as it goes.
+    
+    At most max_concurrency parts are in flight, which bounds memory to
+    roughly (max_concurrency + 1) * part_size. before_complete is called
+    once every part is uploaded; if it raises, or anything else fails, the
+    upload is aborted and no object is created.
+    """
+    
+    part_size = part_size or STREAM_PART_SIZE
+    max_concurrency = max(1, max_concurrency or UPLOAD_CONCURRENCY)
+    
+    upload_id = s3_client.create_multipart_upload(
+        Bucket=bucket,
+        Key=key,
+        Metadata=metadata,
+        ServerSideEncryption='AES256'
+    )['UploadId']
+    
+    checksum = hashlib.sha256()
+    size_bytes = 0
+    in_flight = threading.Semaphore(max_concurrency)
+    
+    def upload_part(part_number, body):
+        try:
+            response = s3_client.upload_part(
+                Bucket=bucket,
+                Key=key,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                Body=body
+            )
+            return {'PartNumber': part_number, 'ETag': response['ETag']}
+        finally:
+            in_flight.release()
+    
+    try:
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            futures = []
+            part_number = 0
             
-            dump_file.write(result.stdout)
-            if result.stderr:
-                dump_file.write(f"\n-- Errors:\n{result.stderr}")
+            while True:
+                chunk = stream.read(part_size)
+                
+                # A multipart upload needs at least one part, even if it is empty
+                if not chunk and part_number > 0:
+                    break
+                
+                checksum.update(chunk)
+                size_bytes += len(chunk)
+                part_number += 1
+                
+                in_flight.acquire()
+                futures.append(executor.submit(upload_part, part_number, chunk))
+                
+                if not chunk:
+                    break
+            
+            parts = [future.result() for future in futures]
+        
+        if before_complete:
+            before_complete()
+        
+        s3_client.complete_multipart_upload(
+            Bucket=bucket,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': parts}
+        )
         
+    except Exception:
+        logger.error(f"Multipart upload of {key} failed, aborting")
+        s3_client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        raise
+    
+    return {
+        'size_bytes': size_bytes,
+        'sha256': checksum.hexdigest(),
+        'parts': len(parts)
+    }
+
+def backup_metadata(backup_type, timestamp):
+    """S3 object metadata for a backup."""
+    return {
+        'backup-type': backup_type,
+        'timestamp': timestamp,
+        'source': 'lambda-backup'
+    }
+
+def tag_backup_object(s3_client, bucket, s3_key, backup_type, timestamp, sha256):
+    """Apply the lifecycle and checksum tags to a backup object."""
+    s3_client.put_object_tagging(
+        Bucket=bucket,
+        Key=s3_key,
+        Tagging={
+            'TagSet': [
+                {'Key': 'BackupType', 'Value': backup_type},
+                {'Key': 'CreatedBy', 'Value': 'lambda-backup'},
+                {'Key': 'Timestamp', 'Value': timestamp},
+                {'Key': 'SHA256', 'Value': sha256}
+            ]
+        }
+    )
+
+def file_sha256(file_path):
+    """SHA-256 of a local file, read in 1 MB blocks."""
+    checksum = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            checksum.update(block)
+    return checksum.hexdigest()
+
+def parse_compression(spec):
+    """Python dumper compression from a pg_dump --compress value: 9, gzip:6, zstd:3, ..."""
+    method, _, level = str(spec).partition(':')
+    if method.isdigit():
+        return 'gzip', max(1, int(method))
+    if method == 'zstd':
+        return 'zstd', int(level or 3)
+    # lz4 and none have no Python equivalent here; gzip keeps the archive compressed
+    return 'gzip', int(level or 6)
+
+def python_dumper(db_endpoint, db_name, username, password, checksums=False):
+    """LogicalDumper for the backup database, compressed like pg_dump would be."""
+    compression, level = parse_compression(DUMP_COMPRESSION)
+    return LogicalDumper(
+        connection_kwargs(db_endpoint, db_name, username, password),
+        compression=compression,
+        compression_level=level,
+        max_workers=DUMP_JOBS,
+        checksums=checksums
+    )
+
+def python_dump_filename(filename, compression):
+    """Backup file name with the extension matching the Python dumper's compression."""
+    base = filename.split('.')[0]
+    return f"{base}.sql.zst" if compression == 'zstd' else f"{base}.sql.gz"
+
+def create_python_backup(db_endpoint, db_name, username, password, dump_file_path):
+    """
+    Write a restorable compressed SQL dump with the Python dumper (fallback method).
+    
+    Restore with: gunzip -c <file> | psql --set ON_ERROR_STOP=1 --single-transaction
+    """
+    
+    try:
+        dumper = python_dumper(db_endpoint, db_name, username, password)
+        dump_file_path = os.path.join(
+            os.path.dirname(dump_file_path),
+            python_dump_filename(os.path.basename(dump_file_path), dumper.compression)
+        )
+        
+        with open(dump_file_path, 'wb') as dump_file:
+            for member in dumper.iter_archive():
+                dump_file.write(member)
+        
+        logger.info(f"Python dump created: {dump_file_path} ({dumper.summary()['rows']} rows)")
         return dump_file_path
         
     except Exception as e:
-        logger.error(f"Simple backup failed: {str(e)}")
+        logger.error(f"Python backup failed: {str(e)}")
         raise Exception(f"Backup creation failed: {str(e)}")
 
+def stream_python_dump(s3_client, bucket, db_endpoint, db_name, username, password, filename, timestamp):
+    """Stream a Python dumper archive into an S3 multipart upload (fallback method)."""
+    
+    backup_type = determine_backup_type(timestamp)
+    dumper = python_dumper(db_endpoint, db_name, username, password, checksums=True)
+    s3_key = f"{backup_type}/{python_dump_filename(filename, dumper.compression)}"
+    started = time.monotonic()
+    
+    logger.info(f"Streaming Python dump to S3: {bucket}/{s3_key}")
+    
+    stream = dumper.open_stream()
+    try:
+        upload = upload_stream_to_s3(s3_client, bucket, s3_key, stream, backup_metadata(backup_type, timestamp))
+    finally:
+        stream.close()
+    
+    tag_backup_object(s3_client, bucket, s3_key, backup_type, timestamp, upload['sha256'])
+    store_verification_reference(s3_client, bucket, s3_key, {
+        'backup_key': s3_key,
+        'captured_at': datetime.now(timezone.utc).isoformat(),
+        'dumper': 'python',
+        'format': dumper.compression,
+        'tables': dumper.reference
+    })
+    
+    seconds = time.monotonic() - started
+    summary = dumper.summary()
+    upload.update({
+        's3_key': s3_key,
+        'dumper': 'python',
+        'streamed': True,
+        'seconds': round(seconds, 3),
+        'throughput_mb_per_second': round(summary['raw_bytes'] / 1024 / 1024 / seconds, 2) if seconds > 0 else None,
+        'tables': summary['tables']
+    })
+    
+    logger.info(f"Python dump completed: {s3_key} ({summary['rows']} rows, {upload['size_bytes']} bytes)")
+    return upload
+
 def upload_to_s3(s3_client, bucket, file_path, filename, timestamp):
     """Upload backup file to S3 with appropriate metadata and tags."""
     
+    from botocore.exceptions import ClientError
+    
     # Determine backup type based on schedule
     backup_type = determine_backup_type(timestamp)
     s3_key = f"{backup_type}/{filename}"
@@ -221,30 +1502,23 @@ def upload_to_s3(s3_client, bucket, file_path, filename, timestamp):
             bucket,
             s3_key,
             ExtraArgs={
-                'Metadata': {
-                    'backup-type': backup_type,
-                    'timestamp': timestamp,
-                    'source': 'lambda-backup'
-                },
+                'Metadata': backup_metadata(backup_type, timestamp),
                 'ServerSideEncryption': 'AES256'
             }
         )
         
+        # Size and checksum come from the local file, so no head_object is needed afterwards
+        sha256 = file_sha256(file_path)
+        
         # Add tags
-        s3_client.put_object_tagging(
-            Bucket=bucket,
-            Key=s3_key,
-            Tagging={
-                'TagSet': [
-                    {'Key': 'BackupType', 'Value': backup_type},
-                    {'Key': 'CreatedBy', 'Value': 'lambda-backup'},
-                    {'Key': 'Timestamp', 'Value': timestamp}
-                ]
-            }
-        )
+        tag_backup_object(s3_client, bucket, s3_key, backup_type, timestamp, sha256)
         
         logger.info(f"Upload completed: {s3_key}")
-        return s3_key
+        return {
+            's3_key': s3_key,
+            'size_bytes': os.path.getsize(file_path),
+            'sha256': sha256
+        }
         
     except ClientError as e:
         logger.error(f"S3 upload failed: {e}")
@@ -267,6 +1541,8 @@ def determine_backup_type(timestamp):
 def create_rds_snapshot(rds_client, project_name, environment, timestamp):
     """Create an RDS snapshot as additional backup."""
     
+    from botocore.exceptions import ClientError
+    
     db_instance_identifier = f"{project_name}-db-{environment}"
     snapshot_identifier = f"{project_name}-snapshot-{environment}-{timestamp}"
     
@@ -292,15 +1568,11 @@ def create_rds_snapshot(rds_client, project_name, environment, timestamp):
         # Don't fail the entire backup if snapshot fails
         return f"FAILED: {str(e)}"
 
-def get_file_size_mb(s3_client, bucket, key):
-    """Get file size in MB from S3."""
-    try:
-        response = s3_client.head_object(Bucket=bucket, Key=key)
-        size_bytes = response['ContentLength']
-        size_mb = round(size_bytes / 1024 / 1024, 2)
-        return size_mb
-    except:
+def get_file_size_mb(size_bytes):
+    """Convert a byte count measured during upload to MB."""
+    if size_bytes is None:
         return "Unknown"
+    return round(size_bytes / 1024 / 1024, 2)
 
 def send_notification(sns_client, subject, message):
     """Send notification via SNS."""
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Incremental Sync Module
+DM_CRM Sales Dashboard - Delta Data Migration
+
+Watermark-based delta synchronization from source to target. Rows changed
+since the last run (by updated_at/created_at or id) are copied into a
+staging table and upserted with INSERT ... ON CONFLICT DO UPDATE in
+batches; rows deleted at the source are found by looking up each batch of
+target keys at the source.
+
+Only an updated_at watermark sees rows updated in place. Tables that fall
+back to created_at or id only pick up new rows; their watermark is marked
+insert_only and a warning is logged on every run.
+"""
+
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, List, Tuple
+
+from transfer_engine import CopyTransferEngine, TableStreamReader, TransferError
+
+logger = logging.getLogger(__name__)
+
+# Preferred watermark columns, most precise first; only the first one tracks updates
+WATERMARK_COLUMNS = ['updated_at', 'created_at', 'id']
+UPDATE_WATERMARK_COLUMN = 'updated_at'
+TIMESTAMP_TYPES = ('timestamp with time zone', 'timestamp without time zone', 'date')
+INTEGER_TYPES = ('smallint', 'integer', 'bigint')
+
+class IncrementalSync:
+    """Delta synchronization of a table using watermarks and key-set diffing"""
+
+    def __init__(self, engine: CopyTransferEngine, batch_size: int = 2000, overlap_seconds: int = 300):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.overlap_seconds = overlap_seconds
+
+    def get_primary_key(self, cursor, table_name: str) -> List[Tuple[str, str]]:
+        """Get the primary key columns of a table as (column, type) pairs"""
+
+        cursor.execute("""
+            SELECT a.attname, format_type(a.atttypid, a.atttypmod)
+            FROM pg_index i
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+            WHERE i.indrelid = %s::regclass
+            AND i.indisprimary
+            ORDER BY array_position(i.indkey::int2[], a.attnum)
+        """, (table_name,))
+
+        return [(row[0], row[1]) for row in cursor.fetchall()]
+
+    def choose_watermark(self, cursor, table_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Pick the watermark column for a table, or None if it has no usable column.
+
+        A created_at or id watermark misses rows updated in place, so it is
+        returned with insert_only set and the fallback is logged.
+        """
+
+        cursor.execute("""
+            SELECT column_name, data_type
+            FROM information_schema.columns
+            WHERE table_schema = 'public'
+            AND table_name = %s
+        """, (table_name,))
+        column_types = dict(cursor.fetchall())
+
+        for column in WATERMARK_COLUMNS:
+            data_type = column_types.get(column)
+            if data_type in TIMESTAMP_TYPES:
+                watermark = {'column': column, 'type': 'timestamp'}
+            elif data_type in INTEGER_TYPES:
+                watermark = {'column': column, 'type': 'integer'}
+            else:
+                continue
+
+            watermark['insert_only'] = column != UPDATE_WATERMARK_COLUMN
+            if watermark['insert_only']:
+                logger.warning(
+                    f"Table {table_name} has no {UPDATE_WATERMARK_COLUMN} column; syncing on {column} "
+                    f"only picks up new rows, updates to existing rows are not synced"
+                )
+            return watermark
+
+        return None
+
+    def _watermark_filter(self, cursor, watermark: Dict[str, Any]) -> Optional[str]:
+        """Build the WHERE clause selecting rows changed since the stored watermark"""
+
+        value = watermark.get('value')
+        if value is None:
+            return None
+
+        column = f'"{watermark["column"]}"'
+        if watermark['type'] == 'timestamp':
+            # Re-read a small overlap window to catch rows committed late with older timestamps
+            since = datetime.fromisoformat(value) - timedelta(seconds=self.overlap_seconds)
+            return cursor.mogrify(f"{column} >= %s", (since,)).decode('utf-8')
+
+        return cursor.mogrify(f"{column} > %s", (int(value),)).decode('utf-8')
+
+    def upsert_changes(self, source_conn, target_conn, table_name: str,
+                       watermark: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Copy rows changed since the watermark into a staging table and upsert them.
+
+        The new watermark is read in the same REPEATABLE READ snapshot as the
+        copied rows. Staged rows are upserted batch_size at a time, each batch
+        in its own target transaction, so a large delta does not hold row
+        locks and WAL in one transaction. A run that fails part way is safe
+        to repeat: the watermark only advances once every batch is applied.
+        Returns the stats together with the advanced watermark.
+        """
+
+        source_conn.rollback()
+        source_cursor = source_conn.cursor()
+        target_cursor = target_conn.cursor()
+
+        primary_key = self.get_primary_key(target_cursor, table_name)
+        if not primary_key:
+            raise TransferError(f"Table {table_name} has no primary key; incremental sync is not possible")
+
+        source_cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        source_cursor.execute(f'SELECT MAX("{watermark["column"]}") FROM {table_name}')
+        new_value = source_cursor.fetchone()[0]
+
+        where = self._watermark_filter(source_cursor, watermark)
+        columns = self.engine.get_table_columns(source_cursor, table_name)
+        staging_table = f"_incremental_{table_name}"
+
+        # Staging outlives the per-batch commits; _sync_row numbers the rows for batching
+        target_cursor.execute(f"DROP TABLE IF EXISTS {staging_table}")
+        target_cursor.execute(f"CREATE TEMP TABLE {staging_table} (LIKE {table_name} INCLUDING DEFAULTS)")
+        target_cursor.execute(f"ALTER TABLE {staging_table} ADD COLUMN _sync_row bigserial")
+
+        copy_stats = self.engine.transfer_table(
+            source_conn, target_conn, table_name, columns=columns, where=where, target_table=staging_table
+        )
+        source_conn.rollback()
+        target_cursor.execute(f"CREATE INDEX ON {staging_table} (_sync_row)")
+        target_conn.commit()
+
+        key_columns = [column for column, _ in primary_key]
+        column_list = ', '.join(f'"{column}"' for column in columns)
+        key_list = ', '.join(f'"{column}"' for column in key_columns)
+        updates = [f'"{column}" = EXCLUDED."{column}"' for column in columns if column not in key_columns]
+        conflict_action = f"DO UPDATE SET {', '.join(updates)}" if updates else "DO NOTHING"
+
+        upsert_query = f"""
+            INSERT INTO {table_name} ({column_list})
+            SELECT {column_list} FROM {staging_table}
+            WHERE _sync_row > %s AND _sync_row <= %s
+            ON CONFLICT ({key_list}) {conflict_action}
+        """
+
+        started = time.monotonic()
+        rows_upserted = 0
+        batches = 0
+        try:
+            for low in range(0, copy_stats['rows'], self.batch_size):
+                target_cursor.execute(upsert_query, (low, low + self.batch_size))
+                rows_upserted += target_cursor.rowcount
+                target_conn.commit()
+                batches += 1
+        finally:
+            target_conn.rollback()
+            target_cursor.execute(f"DROP TABLE IF EXISTS {staging_table}")
+            target_conn.commit()
+        upsert_seconds = time.monotonic() - started
+
+        if new_value is None:
+            new_value = watermark.get('value')
+        elif hasattr(new_value, 'isoformat'):
+            new_value = new_value.isoformat()
+
+        logger.info(f"Upserted {rows_upserted} changed rows into {table_name} (watermark {watermark['column']} -> {new_value})")
+
+        return {
+            'table': table_name,
+            'rows_changed': copy_stats['rows'],
+            'rows_upserted': rows_upserted,
+            'upsert_batches': batches,
+            'copy_seconds': copy_stats['seconds'],
+            'upsert_seconds': round(upsert_seconds, 3),
+            'full_scan': where is None,
+            'watermark': dict(watermark, value=new_value)
+        }
+
+    def delete_missing(self, source_conn, target_conn, table_name: str) -> Dict[str, Any]:
+        """
+        Delete target rows whose primary key no longer exists at the source.
+
+        Target keys are streamed through a server-side cursor; each batch is
+        anti-joined against the source primary key index, so memory is
+        bounded by one batch of keys and no side has to sort its keys.
+        Keys are only compared for equality, in the columns' own types and
+        collations, so the two servers never need to agree on an ordering.
+        """
+
+        import psycopg2.extras
+
+        primary_key = self.get_primary_key(target_conn.cursor(), table_name)
+        if not primary_key:
+            raise TransferError(f"Table {table_name} has no primary key; deletions cannot be detected")
+
+        key_list = ', '.join(f'"{column}"' for column, _ in primary_key)
+        template = '(' + ', '.join(f"%s::{data_type}" for _, data_type in primary_key) + ')'
+        missing_query = f"""
+            SELECT {key_list} FROM (VALUES %s) AS keys ({key_list})
+            WHERE NOT EXISTS (
+                SELECT 1 FROM {table_name} source
+                WHERE ({', '.join(f'source."{column}"' for column, _ in primary_key)})
+                    = ({', '.join(f'keys."{column}"' for column, _ in primary_key)})
+            )
+        """
+        delete_query = f"DELETE FROM {table_name} WHERE ({key_list}) IN (VALUES %s)"
+
+        source_conn.rollback()
+        source_cursor = source_conn.cursor()
+        source_cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+
+        started = time.monotonic()
+        rows_deleted = 0
+        delete_cursor = target_conn.cursor()
+        reader = TableStreamReader(batch_size=self.batch_size)
+
+        for target_keys in reader.iter_batches(target_conn, f"SELECT {key_list} FROM {table_name}"):
+            missing = psycopg2.extras.execute_values(
+                source_cursor, missing_query, [tuple(key) for key in target_keys],
+                template=template, page_size=self.batch_size, fetch=True
+            )
+            if missing:
+                psycopg2.extras.execute_values(delete_cursor, delete_query, missing, template=template, page_size=self.batch_size)
+                rows_deleted += len(missing)
+
+        target_conn.commit()
+        source_conn.rollback()
+
+        logger.info(f"Deleted {rows_deleted} rows from {table_name} that no longer exist at the source")
+
+        return {
+            'table': table_name,
+            'rows_deleted': rows_deleted,
+            'seconds': round(time.monotonic() - started, 3)
+        }
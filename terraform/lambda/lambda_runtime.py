@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Lambda Runtime Module
+DM_CRM Sales Dashboard - Cold Start Support
+
+Shared by the migration, backup and rotation Lambdas. AWS clients are
+created on first use and cached for the life of the execution environment,
+so warm invocations reuse them and an action never pays for a client it
+does not call. boto3 itself is only imported when the first client is
+built. Secret values are cached the same way for a limited time.
+
+Importing this module starts an import timer that records, in the manner
+of python -X importtime, how long each module took to load. Handlers
+wrapped with report_cold_start log the breakdown once per execution
+environment, split into init and first invocation, together with the time
+spent building clients.
+"""
+
+import functools
+import importlib.abc
+import importlib.machinery
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Dict, Any, List, Callable, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+INIT_STARTED = time.perf_counter()
+IMPORT_TIMER_ENABLED = os.environ.get('LAMBDA_IMPORT_TIMER', 'true').lower() == 'true'
+REPORT_TOP_IMPORTS = int(os.environ.get('LAMBDA_REPORT_TOP_IMPORTS', '15'))
+SECRET_CACHE_TTL_SECONDS = int(os.environ.get('SECRET_CACHE_TTL_SECONDS', '300'))
+
+_clients: Dict[tuple, Any] = {}
+_client_seconds: Dict[str, float] = {}
+_clients_lock = threading.Lock()
+
+def get_client(service_name: str, **kwargs):
+    """boto3 client for service_name, created on first use and cached per service and arguments"""
+
+    key = (service_name, tuple(sorted(kwargs.items())))
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    # boto3's default session is not safe for concurrent client creation
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            started = time.perf_counter()
+            import boto3
+            client = boto3.client(service_name, **kwargs)
+            _client_seconds[service_name] = _client_seconds.get(service_name, 0.0) + time.perf_counter() - started
+            _clients[key] = client
+
+    return client
+
+class SecretCache:
+    """
+    SecretString values keyed by secret id and version stage, kept for ttl_seconds.
+
+    AWSCURRENT values that are not cached are fetched together with
+    batch_get_secret_value, falling back to one get_secret_value per secret
+    when the batch call is unavailable or does not return a secret. Other
+    stages, such as AWSPENDING during rotation, are always fetched one by
+    one. Callers that see a secret rejected (e.g. a failed database login)
+    invalidate it so the next lookup goes back to Secrets Manager.
+    """
+
+    BATCH_LIMIT = 20
+
+    def __init__(self, ttl_seconds: int = SECRET_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[Tuple[str, str], Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'api_calls': 0, 'invalidations': 0}
+
+    def get(self, secret_id: str, version_stage: str = 'AWSCURRENT', client=None) -> str:
+        """SecretString of a secret; raises ClientError like get_secret_value"""
+
+        return self.get_many([secret_id], version_stage, client)[secret_id]
+
+    def get_many(self, secret_ids: Iterable[str], version_stage: str = 'AWSCURRENT',
+                 client=None) -> Dict[str, str]:
+        """SecretStrings of several secrets, fetching the ones not cached in as few calls as possible"""
+
+        values: Dict[str, str] = {}
+        now = time.monotonic()
+
+        with self._lock:
+            for secret_id in dict.fromkeys(secret_ids):
+                entry = self._entries.get((secret_id, version_stage))
+                if entry and entry[0] > now:
+                    values[secret_id] = entry[1]
+                    self.stats['hits'] += 1
+                else:
+                    self.stats['misses'] += 1
+
+        missing = [secret_id for secret_id in dict.fromkeys(secret_ids) if secret_id not in values]
+        if not missing:
+            return values
+
+        client = client or get_client('secretsmanager')
+        fetched: Dict[str, str] = {}
+
+        if version_stage == 'AWSCURRENT' and len(missing) > 1:
+            fetched.update(self._fetch_batch(client, missing))
+
+        for secret_id in missing:
+            if secret_id not in fetched:
+                self.stats['api_calls'] += 1
+                response = client.get_secret_value(SecretId=secret_id, VersionStage=version_stage)
+                fetched[secret_id] = response['SecretString']
+
+        expires = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            for secret_id, value in fetched.items():
+                self._entries[(secret_id, version_stage)] = (expires, value)
+
+        values.update(fetched)
+        return values
+
+    def _fetch_batch(self, client, secret_ids: List[str]) -> Dict[str, str]:
+        if not hasattr(client, 'batch_get_secret_value'):
+            return {}
+
+        from botocore.exceptions import ClientError
+
+        fetched: Dict[str, str] = {}
+        for start in range(0, len(secret_ids), self.BATCH_LIMIT):
+            chunk = secret_ids[start:start + self.BATCH_LIMIT]
+            try:
+                self.stats['api_calls'] += 1
+                response = client.batch_get_secret_value(SecretIdList=chunk)
+            except ClientError as e:
+                # Missing BatchGetSecretValue permission and the like: fetch one by one
+                logger.warning(f"batch_get_secret_value failed, fetching secrets individually: {e}")
+                return fetched
+
+            for secret in response.get('SecretValues', []):
+                for secret_id in chunk:
+                    # Secrets are requested by name, full ARN or ARN without the random suffix
+                    if secret_id in (secret['Name'], secret['ARN']) or secret['ARN'].startswith(f"{secret_id}-"):
+                        fetched[secret_id] = secret['SecretString']
+
+        return fetched
+
+    def invalidate(self, secret_id: Optional[str] = None) -> None:
+        """Forget every cached stage of a secret, or of all secrets"""
+
+        with self._lock:
+            for key in [key for key in self._entries if secret_id is None or key[0] == secret_id]:
+                del self._entries[key]
+            self.stats['invalidations'] += 1
+
+secret_cache = SecretCache()
+
+def is_authentication_failure(error: Exception) -> bool:
+    """Whether a database error means the credentials were rejected, e.g. after a rotation"""
+
+    return 'authentication failed' in str(error)
+
+class ImportTimer(importlib.abc.MetaPathFinder):
+    """
+    Time module loading by wrapping the loaders of source and extension modules.
+
+    Like -X importtime, each module gets a cumulative time and a self time
+    that excludes the modules it imported. Built-in and frozen modules are
+    not timed; they load in microseconds.
+    """
+
+    TIMED_LOADERS = (
+        importlib.machinery.SourceFileLoader,
+        importlib.machinery.SourcelessFileLoader,
+        importlib.machinery.ExtensionFileLoader
+    )
+
+    def __init__(self):
+        self.phase = 'init'
+        self.timings: Dict[str, Dict[str, Any]] = {}
+        self._local = threading.local()
+
+    def install(self) -> None:
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+
+    def uninstall(self) -> None:
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if isinstance(spec.loader, self.TIMED_LOADERS):
+                    # Extension modules do their work in create_module, source modules in exec_module
+                    spec.loader.create_module = self._timed(fullname, spec.loader.create_module)
+                    spec.loader.exec_module = self._timed(fullname, spec.loader.exec_module)
+                return spec
+
+        return None
+
+    def _timed(self, fullname: str, load: Callable) -> Callable:
+        def timed(module):
+            stack = self._local.__dict__.setdefault('stack', [])
+            stack.append(0.0)
+            started = time.perf_counter()
+            try:
+                return load(module)
+            finally:
+                elapsed = time.perf_counter() - started
+                children = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                entry = self.timings.setdefault(fullname, {'phase': self.phase, 'cumulative': 0.0, 'self': 0.0})
+                entry['cumulative'] += elapsed
+                entry['self'] += elapsed - children
+
+        return timed
+
+    def total_seconds(self, phase: str) -> float:
+        """Time spent importing in a phase; self times do not overlap, so they add up"""
+
+        return sum(entry['self'] for entry in self.timings.values() if entry['phase'] == phase)
+
+    def slowest(self, limit: int) -> List[Dict[str, Any]]:
+        ranked = sorted(self.timings.items(), key=lambda item: item[1]['cumulative'], reverse=True)
+        return [
+            {
+                'module': name,
+                'phase': entry['phase'],
+                'cumulative_ms': round(entry['cumulative'] * 1000, 1),
+                'self_ms': round(entry['self'] * 1000, 1)
+            }
+            for name, entry in ranked[:limit]
+        ]
+
+_import_timer = ImportTimer()
+if IMPORT_TIMER_ENABLED:
+    _import_timer.install()
+
+_cold_start = True
+
+def report_cold_start(handler: Callable) -> Callable:
+    """
+    Log an init and import report after the first invocation of a handler.
+
+    Later invocations of a warm environment run the handler unchanged.
+    """
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        global _cold_start
+
+        if not _cold_start:
+            return handler(event, context)
+
+        _cold_start = False
+        init_seconds = time.perf_counter() - INIT_STARTED
+        _import_timer.phase = 'invocation'
+        started = time.perf_counter()
+
+        try:
+            return handler(event, context)
+        finally:
+            _import_timer.uninstall()
+            logger.info(f"Cold start report: {json.dumps(cold_start_report(init_seconds, time.perf_counter() - started))}")
+
+    return wrapper
+
+def cold_start_report(init_seconds: float, invocation_seconds: float) -> Dict[str, Any]:
+    """Init and first invocation timings with the import and client creation costs inside them"""
+
+    return {
+        'init_seconds': round(init_seconds, 3),
+        'init_import_seconds': round(_import_timer.total_seconds('init'), 3),
+        'first_invocation_seconds': round(invocation_seconds, 3),
+        'deferred_import_seconds': round(_import_timer.total_seconds('invocation'), 3),
+        'client_seconds': {service: round(seconds, 3) for service, seconds in _client_seconds.items()},
+        'modules_timed': len(_import_timer.timings),
+        'slowest_imports': _import_timer.slowest(REPORT_TOP_IMPORTS)
+    }
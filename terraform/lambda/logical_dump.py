@@ -0,0 +1,681 @@
+#!/usr/bin/env python3
+"""
+Logical Dump Module
+DM_CRM Sales Dashboard - Database Backups Without pg_dump
+
+Pure-Python logical dumper used when pg_dump is not available. Schema DDL
+is rebuilt from the system catalogs and table data is read with COPY ...
+TO STDOUT on parallel connections sharing one exported snapshot, so the
+dump is consistent like pg_dump --jobs. Row-level security, policies,
+grants and comments are restored after the data, so a table's policies
+do not get in the way of loading it. Grants name roles as they are on the
+source; those roles must exist where the dump is restored.
+
+The archive is a plain SQL script compressed as a sequence of gzip members
+(or zstd frames). Every data block is a complete COPY statement in its own
+member, which lets blocks of different tables interleave in one stream
+while still decompressing to a valid script:
+
+    gunzip -c backup.sql.gz | psql --set ON_ERROR_STOP=1 --single-transaction
+
+psycopg2 is optional here: the backup Lambda only has it when provided by
+a layer. zstandard is likewise optional and only needed for zstd output.
+"""
+
+import gzip
+import logging
+import queue
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Iterator, Optional
+
+try:
+    import psycopg2
+except ImportError:  # optional; provided by a Lambda layer
+    psycopg2 = None
+
+try:
+    import zstandard
+except ImportError:  # optional; only needed for zstd archives
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_METHODS = ('gzip', 'zstd')
+
+# Fixed output settings so row text, and therefore checksums, match across servers and sessions
+CHECKSUM_SETTINGS = (
+    "SET LOCAL TimeZone = 'UTC'",
+    "SET LOCAL DateStyle = 'ISO, MDY'",
+    "SET LOCAL IntervalStyle = 'postgres'",
+    "SET LOCAL extra_float_digits = 3",
+    "SET LOCAL bytea_output = 'hex'"
+)
+
+class LogicalDumpError(Exception):
+    """Custom exception for logical dump errors"""
+    pass
+
+def table_checksums(cursor, tables: Optional[List[str]] = None, schema: str = 'public') -> Dict[str, Dict[str, Any]]:
+    """
+    Row count and order-independent content checksum of each table.
+
+    The checksum is the sum of the first 64 bits of each row's MD5, so it
+    does not depend on physical row order and a restored copy of a table
+    yields the same value. Runs in the cursor's current transaction.
+    """
+
+    for statement in CHECKSUM_SETTINGS:
+        cursor.execute(statement)
+
+    if tables is None:
+        cursor.execute("""
+            SELECT format('%%I.%%I', schemaname, tablename)
+            FROM pg_tables
+            WHERE schemaname = %s
+            ORDER BY tablename
+        """, (schema,))
+        tables = [row[0] for row in cursor.fetchall()]
+
+    checksums = {}
+    for table in tables:
+        cursor.execute(f"""
+            SELECT count(*), COALESCE(sum(('x' || substr(md5(t::text), 1, 16))::bit(64)::bigint::numeric), 0)::text
+            FROM {table} t
+        """)
+        rows, checksum = cursor.fetchone()
+        checksums[table] = {'rows': rows, 'checksum': checksum}
+
+    return checksums
+
+def iter_decompressed(chunks: Iterator[bytes], compression: str = 'gzip') -> Iterator[bytes]:
+    """Decompress an archive made of concatenated gzip members or zstd frames"""
+
+    if compression == 'zstd':
+        if zstandard is None:
+            raise LogicalDumpError("zstd archives require the zstandard package")
+        decompressor = zstandard.ZstdDecompressor().decompressobj()
+        for chunk in chunks:
+            while chunk:
+                data = decompressor.decompress(chunk)
+                if data:
+                    yield data
+                # A decompressobj handles one frame; continue with a new one on the rest
+                chunk = decompressor.unused_data if decompressor.eof else b''
+                if decompressor.eof:
+                    decompressor = zstandard.ZstdDecompressor().decompressobj()
+        return
+
+    decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        while chunk:
+            data = decompressor.decompress(chunk)
+            if data:
+                yield data
+            if decompressor.eof:
+                chunk = decompressor.unused_data
+                decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+            else:
+                chunk = b''
+
+class _CopyBlockWriter:
+    """COPY TO STDOUT sink that hands row-aligned blocks of at least block_size bytes to emit"""
+
+    def __init__(self, block_size: int, emit):
+        self.block_size = block_size
+        self.emit = emit
+        self.rows = 0
+        self.raw_bytes = 0
+        self._pending = bytearray()
+
+    def write(self, data) -> int:
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+
+        self._pending += data
+        if len(self._pending) >= self.block_size:
+            # Text COPY escapes embedded newlines, so every newline ends a row
+            cut = self._pending.rfind(b'\n') + 1
+            if cut:
+                self._emit(bytes(self._pending[:cut]))
+                del self._pending[:cut]
+
+        return len(data)
+
+    def flush(self) -> None:
+        if self._pending:
+            self._emit(bytes(self._pending))
+            self._pending = bytearray()
+
+    def _emit(self, block: bytes) -> None:
+        self.rows += block.count(b'\n')
+        self.raw_bytes += len(block)
+        self.emit(block)
+
+class _ArchiveReader:
+    """Readable file object over the archive members, for multipart uploads"""
+
+    def __init__(self, members: Iterator[bytes]):
+        self._members = members
+        self._buffer = bytearray()
+        self._finished = False
+
+    def read(self, size: int = -1) -> bytes:
+        """Return exactly size bytes unless the archive ends first"""
+
+        while not self._finished and (size is None or size < 0 or len(self._buffer) < size):
+            member = next(self._members, None)
+            if member is None:
+                self._finished = True
+            else:
+                self._buffer += member
+
+        if size is None or size < 0:
+            size = len(self._buffer)
+
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def close(self) -> None:
+        self._members.close()
+
+class LogicalDumper:
+    """Dump the schema and data of one database schema as a compressed SQL script"""
+
+    _DONE = object()
+
+    # pg_policy.polcmd -> CREATE POLICY ... FOR
+    POLICY_COMMANDS = {'r': 'SELECT', 'a': 'INSERT', 'w': 'UPDATE', 'd': 'DELETE', '*': 'ALL'}
+
+    # pg_identify_object type -> COMMENT ON object kind
+    COMMENT_KEYWORDS = {
+        'table': 'TABLE', 'table column': 'COLUMN', 'view': 'VIEW', 'view column': 'COLUMN',
+        'sequence': 'SEQUENCE', 'index': 'INDEX', 'type': 'TYPE', 'function': 'FUNCTION',
+        'procedure': 'PROCEDURE', 'table constraint': 'CONSTRAINT', 'trigger': 'TRIGGER', 'policy': 'POLICY'
+    }
+
+    def __init__(self, connect_kwargs: Dict[str, Any], schema: str = 'public', compression: str = 'gzip',
+                 compression_level: int = 6, max_workers: int = 4, block_size: int = 8 * 1024 * 1024,
+                 max_buffered_blocks: int = 16, checksums: bool = False):
+        if psycopg2 is None:
+            raise LogicalDumpError("The Python dumper requires the psycopg2 package")
+        if compression not in COMPRESSION_METHODS:
+            raise LogicalDumpError(f"Unsupported compression {compression}; use one of {COMPRESSION_METHODS}")
+        if compression == 'zstd' and zstandard is None:
+            raise LogicalDumpError("zstd compression requires the zstandard package")
+
+        self.connect_kwargs = connect_kwargs
+        self.schema = schema
+        self.compression = compression
+        self.compression_level = compression_level
+        self.max_workers = max(1, max_workers)
+        self.block_size = block_size
+        self.max_buffered_blocks = max_buffered_blocks
+        self.checksums = checksums
+        self.reference: Optional[Dict[str, Dict[str, Any]]] = None
+        self.tables: Dict[str, Dict[str, Any]] = {}
+        self.compressed_bytes = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = psycopg2.connect(**self.connect_kwargs)
+        conn.set_session(isolation_level='REPEATABLE READ', readonly=True)
+        return conn
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.compression == 'zstd':
+            member = zstandard.ZstdCompressor(level=self.compression_level).compress(data)
+        else:
+            member = gzip.compress(data, compresslevel=self.compression_level, mtime=0)
+
+        with self._lock:
+            self.compressed_bytes += len(member)
+        return member
+
+    def open_stream(self) -> _ArchiveReader:
+        """File-like view of the archive; read() returns full-size blocks"""
+        return _ArchiveReader(self.iter_archive())
+
+    def iter_archive(self) -> Iterator[bytes]:
+        """
+        Yield the compressed archive: pre-data DDL, table data, post-data DDL.
+
+        Tables are copied by max_workers threads into a bounded queue, so
+        memory stays near max_buffered_blocks compressed blocks however
+        large the tables are. With checksums, table_checksums() of the same
+        snapshot is stored in self.reference once the data is dumped.
+        """
+
+        conn = self._connect()
+        stop = threading.Event()
+        blocks: queue.Queue = queue.Queue(maxsize=self.max_buffered_blocks)
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT pg_export_snapshot()")
+            snapshot_id = cursor.fetchone()[0]
+
+            catalog = self.read_catalog(cursor)
+            yield self._compress(self._pre_data(catalog).encode('utf-8'))
+
+            logger.info(f"Dumping {len(catalog['tables'])} tables with {self.max_workers} workers (snapshot {snapshot_id})")
+
+            def put(item):
+                # Block while the queue is full; give up once the consumer has gone away
+                while not stop.is_set():
+                    try:
+                        blocks.put(item, timeout=1)
+                        return
+                    except queue.Full:
+                        continue
+                raise LogicalDumpError("Dump aborted")
+
+            def dump_table(table: Dict[str, Any]) -> None:
+                self.tables[table['name']] = self._dump_table(snapshot_id, table, put)
+
+            def run_workers():
+                try:
+                    with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='dump') as executor:
+                        for future in [executor.submit(dump_table, table) for table in catalog['tables']]:
+                            future.result()
+                    if self.checksums:
+                        # The main thread only waits on the queue, so the snapshot connection is free
+                        self.reference = table_checksums(conn.cursor(), [table['name'] for table in catalog['tables']])
+                    put(self._DONE)
+                except BaseException as e:
+                    if not stop.is_set():
+                        put(e)
+
+            feeder = threading.Thread(target=run_workers, daemon=True)
+            feeder.start()
+
+            while True:
+                item = blocks.get()
+                if item is self._DONE:
+                    break
+                if isinstance(item, BaseException):
+                    raise LogicalDumpError(f"Table dump failed: {item}") from item
+                yield item
+
+            feeder.join()
+            yield self._compress(self._post_data(catalog).encode('utf-8'))
+
+        finally:
+            stop.set()
+            # Ending the exporting transaction releases the snapshot
+            conn.rollback()
+            conn.close()
+
+    def _dump_table(self, snapshot_id: str, table: Dict[str, Any], put) -> Dict[str, Any]:
+        started = time.monotonic()
+        column_list = ', '.join(column['name'] for column in table['columns'] if not column['generated'])
+        header = f"COPY {table['name']} ({column_list}) FROM stdin;\n".encode('utf-8')
+
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SET TRANSACTION SNAPSHOT %s", (snapshot_id,))
+
+            # Each block is a complete COPY statement so blocks of different tables can interleave
+            writer = _CopyBlockWriter(self.block_size, lambda block: put(self._compress(header + block + b"\\.\n")))
+            cursor.copy_expert(f"COPY {table['name']} ({column_list}) TO STDOUT", writer, size=1024 * 1024)
+            writer.flush()
+        finally:
+            conn.rollback()
+            conn.close()
+
+        seconds = time.monotonic() - started
+        logger.info(f"Dumped table {table['name']}: {writer.rows} rows in {seconds:.1f}s")
+
+        return {
+            'rows': writer.rows,
+            'raw_bytes': writer.raw_bytes,
+            'seconds': round(seconds, 3),
+            'mb_per_second': round(writer.raw_bytes / 1024 / 1024 / seconds, 2) if seconds > 0 else None
+        }
+
+    def read_catalog(self, cursor) -> Dict[str, Any]:
+        """Read everything needed to recreate the schema from the system catalogs"""
+
+        schema = self.schema
+        catalog: Dict[str, Any] = {}
+
+        cursor.execute("SELECT quote_ident(extname) FROM pg_extension WHERE extname <> 'plpgsql' ORDER BY extname")
+        catalog['extensions'] = [row[0] for row in cursor.fetchall()]
+
+        cursor.execute("""
+            SELECT format('%%I.%%I', n.nspname, t.typname),
+                   array_agg(quote_literal(e.enumlabel) ORDER BY e.enumsortorder)
+            FROM pg_type t
+            JOIN pg_namespace n ON n.oid = t.typnamespace
+            JOIN pg_enum e ON e.enumtypid = t.oid
+            WHERE n.nspname = %s
+            GROUP BY 1
+            ORDER BY 1
+        """, (schema,))
+        catalog['enums'] = cursor.fetchall()
+
+        # Identity sequences are created by their tables and only need their position restored
+        cursor.execute("""
+            SELECT format('%%I.%%I', s.schemaname, s.sequencename), s.data_type::text, s.start_value,
+                   s.increment_by, s.min_value, s.max_value, s.cycle, s.last_value,
+                   EXISTS (
+                       SELECT 1 FROM pg_depend d
+                       WHERE d.objid = format('%%I.%%I', s.schemaname, s.sequencename)::regclass
+                       AND d.deptype = 'i'
+                   )
+            FROM pg_sequences s
+            WHERE s.schemaname = %s
+            ORDER BY 1
+        """, (schema,))
+        catalog['sequences'] = cursor.fetchall()
+
+        cursor.execute("""
+            SELECT format('%%I.%%I', sn.nspname, s.relname), format('%%I.%%I', tn.nspname, t.relname),
+                   quote_ident(a.attname)
+            FROM pg_depend d
+            JOIN pg_class s ON s.oid = d.objid AND s.relkind = 'S'
+            JOIN pg_namespace sn ON sn.oid = s.relnamespace
+            JOIN pg_class t ON t.oid = d.refobjid
+            JOIN pg_namespace tn ON tn.oid = t.relnamespace
+            JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = d.refobjsubid
+            WHERE d.deptype = 'a' AND sn.nspname = %s
+            ORDER BY 1
+        """, (schema,))
+        catalog['sequence_owners'] = cursor.fetchall()
+
+        cursor.execute("""
+            SELECT pg_get_functiondef(p.oid)
+            FROM pg_proc p
+            JOIN pg_namespace n ON n.oid = p.pronamespace
+            WHERE n.nspname = %s
+            AND p.prokind IN ('f', 'p')
+            AND NOT EXISTS (SELECT 1 FROM pg_depend d WHERE d.objid = p.oid AND d.deptype = 'e')
+            ORDER BY p.oid
+        """, (schema,))
+        catalog['functions'] = [row[0] for row in cursor.fetchall()]
+
+        cursor.execute("""
+            SELECT c.oid, format('%%I.%%I', n.nspname, c.relname), c.relrowsecurity, c.relforcerowsecurity
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = %s
+            AND c.relkind = 'r'
+            AND NOT EXISTS (SELECT 1 FROM pg_depend d WHERE d.objid = c.oid AND d.deptype = 'e')
+            ORDER BY c.relname
+        """, (schema,))
+        tables = {
+            oid: {'name': name, 'columns': [], 'row_security': row_security, 'force_row_security': force_row_security}
+            for oid, name, row_security, force_row_security in cursor.fetchall()
+        }
+
+        if tables:
+            cursor.execute("""
+                SELECT a.attrelid, quote_ident(a.attname), format_type(a.atttypid, a.atttypmod), a.attnotnull,
+                       pg_get_expr(d.adbin, d.adrelid), a.attidentity, a.attgenerated
+                FROM pg_attribute a
+                LEFT JOIN pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+                WHERE a.attrelid = ANY(%s)
+                AND a.attnum > 0
+                AND NOT a.attisdropped
+                ORDER BY a.attrelid, a.attnum
+            """, (list(tables),))
+            for relid, name, data_type, not_null, default, identity, generated in cursor.fetchall():
+                tables[relid]['columns'].append({
+                    'name': name,
+                    'type': data_type,
+                    'not_null': not_null,
+                    'default': default,
+                    'identity': identity,
+                    'generated': generated == 's'
+                })
+        catalog['tables'] = list(tables.values())
+
+        # Foreign keys last, so they are added once every referenced key exists
+        cursor.execute("""
+            SELECT format('%%I.%%I', n.nspname, c.relname), quote_ident(con.conname),
+                   pg_get_constraintdef(con.oid), con.contype
+            FROM pg_constraint con
+            JOIN pg_class c ON c.oid = con.conrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = %s
+            AND c.relkind = 'r'
+            AND con.contype IN ('p', 'u', 'c', 'x', 'f')
+            ORDER BY con.contype = 'f', 1, 2
+        """, (schema,))
+        catalog['constraints'] = cursor.fetchall()
+
+        cursor.execute("""
+            SELECT i.indexdef
+            FROM pg_indexes i
+            WHERE i.schemaname = %s
+            AND NOT EXISTS (
+                SELECT 1 FROM pg_constraint c
+                WHERE c.conindid = format('%%I.%%I', i.schemaname, i.indexname)::regclass
+            )
+            ORDER BY i.tablename, i.indexname
+        """, (schema,))
+        catalog['indexes'] = [row[0] for row in cursor.fetchall()]
+
+        cursor.execute("""
+            SELECT format('%%I.%%I', n.nspname, c.relname), pg_get_viewdef(c.oid, true)
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = %s
+            AND c.relkind = 'v'
+            ORDER BY c.oid
+        """, (schema,))
+        catalog['views'] = cursor.fetchall()
+
+        cursor.execute("""
+            SELECT pg_get_triggerdef(t.oid, true)
+            FROM pg_trigger t
+            JOIN pg_class c ON c.oid = t.tgrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = %s
+            AND NOT t.tgisinternal
+            ORDER BY c.relname, t.tgname
+        """, (schema,))
+        catalog['triggers'] = [row[0] for row in cursor.fetchall()]
+
+        cursor.execute("""
+            SELECT format('%%I.%%I', n.nspname, c.relname), quote_ident(p.polname), p.polpermissive, p.polcmd,
+                   ARRAY(
+                       SELECT CASE WHEN r.oid = 0 THEN 'PUBLIC' ELSE quote_ident(pg_get_userbyid(r.oid)) END
+                       FROM unnest(p.polroles) AS r(oid)
+                       ORDER BY 1
+                   ),
+                   pg_get_expr(p.polqual, p.polrelid), pg_get_expr(p.polwithcheck, p.polrelid)
+            FROM pg_policy p
+            JOIN pg_class c ON c.oid = p.polrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = %s
+            ORDER BY 1, 2
+        """, (schema,))
+        catalog['policies'] = cursor.fetchall()
+
+        # Explicit privileges only; the owner's own privileges come with ownership on restore.
+        # Functions with an ACL start from REVOKE ALL FROM PUBLIC, as EXECUTE is granted by default.
+        cursor.execute("""
+            WITH acl AS (
+                SELECT CASE c.relkind WHEN 'S' THEN 'SEQUENCE' ELSE 'TABLE' END AS kind,
+                       format('%%I.%%I', n.nspname, c.relname) AS object, NULL AS column_name,
+                       c.relowner AS owner, (aclexplode(c.relacl)).*
+                FROM pg_class c
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE n.nspname = %s AND c.relkind IN ('r', 'v', 'S') AND c.relacl IS NOT NULL
+                UNION ALL
+                SELECT 'TABLE', format('%%I.%%I', n.nspname, c.relname), quote_ident(a.attname),
+                       c.relowner, (aclexplode(a.attacl)).*
+                FROM pg_attribute a
+                JOIN pg_class c ON c.oid = a.attrelid
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE n.nspname = %s AND c.relkind IN ('r', 'v') AND a.attnum > 0
+                AND NOT a.attisdropped AND a.attacl IS NOT NULL
+                UNION ALL
+                SELECT CASE p.prokind WHEN 'p' THEN 'PROCEDURE' ELSE 'FUNCTION' END,
+                       format('%%I.%%I(%%s)', n.nspname, p.proname, pg_get_function_identity_arguments(p.oid)),
+                       NULL, p.proowner, (aclexplode(p.proacl)).*
+                FROM pg_proc p
+                JOIN pg_namespace n ON n.oid = p.pronamespace
+                WHERE n.nspname = %s AND p.prokind IN ('f', 'p') AND p.proacl IS NOT NULL
+                AND NOT EXISTS (SELECT 1 FROM pg_depend d WHERE d.objid = p.oid AND d.deptype = 'e')
+            )
+            SELECT kind, object, column_name,
+                   CASE WHEN grantee = 0 THEN 'PUBLIC' ELSE quote_ident(pg_get_userbyid(grantee)) END,
+                   string_agg(privilege_type, ', ' ORDER BY privilege_type), is_grantable
+            FROM acl
+            WHERE grantee <> owner
+            GROUP BY kind, object, column_name, grantee, is_grantable
+            UNION ALL
+            SELECT DISTINCT kind, object, NULL, NULL, NULL, false
+            FROM acl
+            WHERE kind IN ('FUNCTION', 'PROCEDURE')
+            ORDER BY 2, 3 NULLS FIRST, 4 NULLS FIRST
+        """, (schema, schema, schema))
+        catalog['grants'] = cursor.fetchall()
+
+        # pg_identify_object gives identities COMMENT ON accepts: "public.t.col", "name on public.t", "public.f(integer)".
+        # Its schema is empty for triggers and policies, whose address starts with the table's schema instead.
+        cursor.execute("""
+            SELECT o.type, o.identity, quote_literal(d.description)
+            FROM pg_description d
+            CROSS JOIN LATERAL pg_identify_object(d.classoid, d.objoid, d.objsubid) o
+            CROSS JOIN LATERAL pg_identify_object_as_address(d.classoid, d.objoid, d.objsubid) a
+            WHERE COALESCE(o.schema, a.object_names[1]) = %s
+            AND o.type IN ('table', 'table column', 'view', 'view column', 'sequence', 'index', 'type',
+                           'function', 'procedure', 'table constraint', 'trigger', 'policy')
+            AND NOT EXISTS (SELECT 1 FROM pg_depend e WHERE e.objid = d.objoid AND e.deptype = 'e')
+            ORDER BY 1, 2
+        """, (schema,))
+        catalog['comments'] = cursor.fetchall()
+
+        return catalog
+
+    @staticmethod
+    def _column_ddl(column: Dict[str, Any]) -> str:
+        ddl = f"{column['name']} {column['type']}"
+
+        if column['generated']:
+            return f"{ddl} GENERATED ALWAYS AS ({column['default']}) STORED"
+        if column['identity']:
+            return f"{ddl} GENERATED {'ALWAYS' if column['identity'] == 'a' else 'BY DEFAULT'} AS IDENTITY"
+
+        if column['default'] is not None:
+            ddl += f" DEFAULT {column['default']}"
+        if column['not_null']:
+            ddl += " NOT NULL"
+        return ddl
+
+    def _pre_data(self, catalog: Dict[str, Any]) -> str:
+        lines = [
+            f"-- Logical dump of schema {self.schema}",
+            f"-- Created at: {datetime.now(timezone.utc).isoformat()}",
+            "",
+            "SET statement_timeout = 0;",
+            "SET client_encoding = 'UTF8';",
+            "SET standard_conforming_strings = on;",
+            "SET check_function_bodies = false;",
+            ""
+        ]
+
+        lines += [f"CREATE EXTENSION IF NOT EXISTS {extension};" for extension in catalog['extensions']]
+
+        # Equivalent of pg_dump --clean
+        lines += [f"DROP VIEW IF EXISTS {name} CASCADE;" for name, _ in reversed(catalog['views'])]
+        lines += [f"DROP TABLE IF EXISTS {table['name']} CASCADE;" for table in catalog['tables']]
+        lines += [f"DROP SEQUENCE IF EXISTS {row[0]} CASCADE;" for row in catalog['sequences'] if not row[8]]
+        lines += [f"DROP TYPE IF EXISTS {name} CASCADE;" for name, _ in catalog['enums']]
+        lines.append("")
+
+        lines += [f"CREATE TYPE {name} AS ENUM ({', '.join(labels)});" for name, labels in catalog['enums']]
+
+        for name, data_type, start, increment, minimum, maximum, cycle, _, identity in catalog['sequences']:
+            if not identity:
+                lines.append(
+                    f"CREATE SEQUENCE {name} AS {data_type} START WITH {start} INCREMENT BY {increment} "
+                    f"MINVALUE {minimum} MAXVALUE {maximum}{' CYCLE' if cycle else ''};"
+                )
+
+        # Functions before tables: defaults and checks may call them
+        lines += [f"{definition.rstrip()};\n" for definition in catalog['functions']]
+
+        for table in catalog['tables']:
+            columns = ',\n    '.join(self._column_ddl(column) for column in table['columns'])
+            lines.append(f"CREATE TABLE {table['name']} (\n    {columns}\n);\n")
+
+        return '\n'.join(lines) + '\n'
+
+    def _post_data(self, catalog: Dict[str, Any]) -> str:
+        lines = [""]
+
+        lines += [
+            f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition};"
+            for table, name, definition, _ in catalog['constraints']
+        ]
+        lines += [f"{definition};" for definition in catalog['indexes']]
+        lines += [
+            f"ALTER SEQUENCE {sequence} OWNED BY {table}.{column};"
+            for sequence, table, column in catalog['sequence_owners']
+        ]
+        lines += [
+            f"SELECT pg_catalog.setval('{row[0]}', {row[7]}, true);"
+            for row in catalog['sequences'] if row[7] is not None
+        ]
+        lines += [f"CREATE VIEW {name} AS\n{definition}\n" for name, definition in catalog['views']]
+        lines += [f"{definition};" for definition in catalog['triggers']]
+
+        # Row security after the data, so loading it is not filtered by the policies
+        for table in catalog['tables']:
+            if table['row_security']:
+                lines.append(f"ALTER TABLE {table['name']} ENABLE ROW LEVEL SECURITY;")
+            if table['force_row_security']:
+                lines.append(f"ALTER TABLE {table['name']} FORCE ROW LEVEL SECURITY;")
+        lines += [self._policy_ddl(*policy) for policy in catalog['policies']]
+
+        for kind, name, column, grantee, privileges, grantable in catalog['grants']:
+            if grantee is None:
+                lines.append(f"REVOKE ALL ON {kind} {name} FROM PUBLIC;")
+            elif column is not None:
+                columns = ', '.join(f"{privilege} ({column})" for privilege in privileges.split(', '))
+                lines.append(f"GRANT {columns} ON {kind} {name} TO {grantee}{' WITH GRANT OPTION' if grantable else ''};")
+            else:
+                lines.append(f"GRANT {privileges} ON {kind} {name} TO {grantee}{' WITH GRANT OPTION' if grantable else ''};")
+
+        for object_type, identity, comment in catalog['comments']:
+            keyword = self.COMMENT_KEYWORDS[object_type]
+            if keyword in ('CONSTRAINT', 'TRIGGER', 'POLICY'):
+                name, _, table = identity.rpartition(' on ')
+                identity = f"{name} ON {table}"
+            lines.append(f"COMMENT ON {keyword} {identity} IS {comment};")
+
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _policy_ddl(table: str, name: str, permissive: bool, command: str, roles: List[str],
+                    using: Optional[str], with_check: Optional[str]) -> str:
+        ddl = (
+            f"CREATE POLICY {name} ON {table} AS {'PERMISSIVE' if permissive else 'RESTRICTIVE'} "
+            f"FOR {LogicalDumper.POLICY_COMMANDS[command]} TO {', '.join(roles) or 'PUBLIC'}"
+        )
+        if using is not None:
+            ddl += f" USING ({using})"
+        if with_check is not None:
+            ddl += f" WITH CHECK ({with_check})"
+        return ddl + ";"
+
+    def summary(self) -> Dict[str, Any]:
+        """Per-table statistics of the finished dump"""
+
+        raw_bytes = sum(stats['raw_bytes'] for stats in self.tables.values())
+        return {
+            'compression': self.compression,
+            'tables': self.tables,
+            'rows': sum(stats['rows'] for stats in self.tables.values()),
+            'raw_bytes': raw_bytes,
+            'compressed_bytes': self.compressed_bytes
+        }
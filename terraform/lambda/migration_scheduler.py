@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Migration Scheduler Module
+DM_CRM Sales Dashboard - Data Migration Scheduling
+
+Runs per-table migration tasks concurrently on a worker pool while
+respecting the foreign-key dependency graph between tables: a table is
+only started once every table it references has finished successfully.
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Dict, Any, List, Set, Callable, ContextManager, Optional
+
+logger = logging.getLogger(__name__)
+
+class SchedulerError(Exception):
+    """Custom exception for migration scheduling errors"""
+    pass
+
+class MigrationScheduler:
+    """Foreign-key aware scheduler for concurrent table migration"""
+
+    def __init__(self, tables: List[str], dependencies: Dict[str, Set[str]], max_workers: int = 4):
+        self.tables = list(tables)
+        self.dependencies = {table: (set(dependencies.get(table, set())) & set(tables)) - {table} for table in tables}
+        self.max_workers = max(1, max_workers)
+
+        self._check_acyclic()
+
+    @staticmethod
+    def dependencies_from_rules(validation_rules: Dict[str, Dict[str, Any]]) -> Dict[str, Set[str]]:
+        """Build table -> referenced tables from DataValidators validation rules"""
+
+        dependencies = {}
+        for table_name, rules in validation_rules.items():
+            dependencies[table_name] = {
+                fk['references'].split('.')[0] for fk in rules.get('foreign_keys', [])
+            }
+
+        return dependencies
+
+    @staticmethod
+    def dependencies_from_catalog(cursor) -> Dict[str, Set[str]]:
+        """Build table -> referenced tables from the foreign keys declared in pg_constraint"""
+
+        cursor.execute("""
+            SELECT child.relname, parent.relname
+            FROM pg_constraint c
+            JOIN pg_class child ON child.oid = c.conrelid
+            JOIN pg_class parent ON parent.oid = c.confrelid
+            JOIN pg_namespace n ON n.oid = child.relnamespace
+            WHERE c.contype = 'f'
+            AND n.nspname = 'public'
+        """)
+
+        dependencies: Dict[str, Set[str]] = {}
+        for child, parent in cursor.fetchall():
+            dependencies.setdefault(child, set()).add(parent)
+
+        return dependencies
+
+    @staticmethod
+    def merge_dependencies(*graphs: Dict[str, Set[str]]) -> Dict[str, Set[str]]:
+        """Union several dependency graphs"""
+
+        merged: Dict[str, Set[str]] = {}
+        for graph in graphs:
+            for table_name, parents in graph.items():
+                merged.setdefault(table_name, set()).update(parents)
+
+        return merged
+
+    @staticmethod
+    def reverse_dependencies(dependencies: Dict[str, Set[str]]) -> Dict[str, Set[str]]:
+        """Invert a dependency graph so referencing tables run before the tables they reference"""
+
+        reversed_graph: Dict[str, Set[str]] = {table_name: set() for table_name in dependencies}
+        for table_name, parents in dependencies.items():
+            for parent in parents:
+                reversed_graph.setdefault(parent, set()).add(table_name)
+
+        return reversed_graph
+
+    def _check_acyclic(self):
+        """Reject dependency cycles, which would leave tables that can never start"""
+
+        remaining = {table: set(parents) for table, parents in self.dependencies.items()}
+
+        while remaining:
+            ready = [table for table, parents in remaining.items() if not parents]
+            if not ready:
+                raise SchedulerError(f"Foreign key dependency cycle between tables: {sorted(remaining)}")
+
+            for table in ready:
+                del remaining[table]
+            for parents in remaining.values():
+                parents.difference_update(ready)
+
+    def run(self, task: Callable[[Any, str], Any], worker_context: Callable[[], ContextManager]) -> Dict[str, Dict[str, Any]]:
+        """
+        Execute task(context, table) for every table.
+
+        Each worker enters worker_context() once (e.g. to open its own source
+        and target connections) and reuses it for all tables it processes.
+        When a table fails, every table that depends on it, directly or
+        transitively, is not run; its outcome is marked skipped and names the
+        failed table. Returns table -> outcome, in the original table order.
+        """
+
+        children: Dict[str, List[str]] = {table: [] for table in self.tables}
+        pending_parents = {table: len(parents) for table, parents in self.dependencies.items()}
+        for table in self.tables:
+            for parent in self.dependencies[table]:
+                children[parent].append(table)
+
+        ready: queue.Queue = queue.Queue()
+        for table in self.tables:
+            if pending_parents[table] == 0:
+                ready.put(table)
+
+        outcomes: Dict[str, Dict[str, Any]] = {}
+        lock = threading.Lock()
+        all_done = threading.Event()
+        run_started = time.monotonic()
+
+        def skip_dependents(table: str):
+            # Dependents cannot have started: each still waits on the failed table
+            stack = list(children[table])
+            while stack:
+                child = stack.pop()
+                if child in outcomes:
+                    continue
+                logger.warning(f"Skipping {child}: it depends on {table}, which failed")
+                outcomes[child] = {
+                    'result': None,
+                    'error': f"Skipped because {table} failed",
+                    'error_type': 'DependencyFailed',
+                    'skipped': True,
+                    'failed_dependency': table,
+                    'started_offset_seconds': None,
+                    'wall_seconds': 0.0
+                }
+                stack.extend(children[child])
+
+        def finish(table: str, outcome: Dict[str, Any]):
+            with lock:
+                outcomes[table] = dict(outcome, skipped=False)
+                if outcome['error']:
+                    skip_dependents(table)
+                else:
+                    for child in children[table]:
+                        pending_parents[child] -= 1
+                        if pending_parents[child] == 0 and child not in outcomes:
+                            ready.put(child)
+                if len(outcomes) == len(self.tables):
+                    all_done.set()
+                    for _ in range(self.max_workers):
+                        ready.put(None)
+
+        def worker():
+            context_error: Optional[Exception] = None
+            try:
+                with worker_context() as context:
+                    while True:
+                        table = ready.get()
+                        if table is None:
+                            return
+
+                        started = time.monotonic()
+                        try:
+                            result = task(context, table)
+                            error = None
+                            error_type = None
+                        except Exception as e:
+                            result = None
+                            error = str(e)
+                            error_type = type(e).__name__
+                            logger.error(f"Scheduled task for {table} failed: {error}")
+                        finished = time.monotonic()
+
+                        finish(table, {
+                            'result': result,
+                            'error': error,
+                            'error_type': error_type,
+                            'started_offset_seconds': round(started - run_started, 3),
+                            'wall_seconds': round(finished - started, 3)
+                        })
+            except Exception as e:
+                context_error = e
+
+            if context_error is not None:
+                # Could not set up this worker; fail whatever it picks up so dependents are not stranded
+                logger.error(f"Scheduler worker failed to start: {context_error}")
+                while not all_done.is_set():
+                    table = ready.get()
+                    if table is None:
+                        return
+                    finish(table, {
+                        'result': None,
+                        'error': f"Worker setup failed: {context_error}",
+                        'error_type': type(context_error).__name__,
+                        'started_offset_seconds': round(time.monotonic() - run_started, 3),
+                        'wall_seconds': 0.0
+                    })
+
+        if not self.tables:
+            return {}
+
+        workers = [
+            threading.Thread(target=worker, name=f"migration-worker-{i}", daemon=True)
+            for i in range(min(self.max_workers, len(self.tables)))
+        ]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        return {table: outcomes[table] for table in self.tables if table in outcomes}
+
+    def critical_path(self, durations: Dict[str, float]) -> Dict[str, Any]:
+        """Find the longest dependency chain weighted by per-table duration"""
+
+        finish_time: Dict[str, float] = {}
+        previous: Dict[str, Optional[str]] = {}
+
+        def longest(table: str) -> float:
+            if table not in finish_time:
+                best_parent = max(self.dependencies[table], key=longest, default=None)
+                start = longest(best_parent) if best_parent else 0.0
+                finish_time[table] = start + durations.get(table, 0.0)
+                previous[table] = best_parent
+            return finish_time[table]
+
+        if not self.tables:
+            return {'tables': [], 'seconds': 0.0}
+
+        end = max(self.tables, key=longest)
+        path = []
+        node: Optional[str] = end
+        while node:
+            path.append(node)
+            node = previous[node]
+
+        return {
+            'tables': list(reversed(path)),
+            'seconds': round(finish_time[end], 3)
+        }
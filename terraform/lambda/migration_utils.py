@@ -7,13 +7,21 @@ Utility functions for data migration operations including S3 storage,
 encryption, logging, and common migration tasks.
 """
 
+import hashlib
 import json
 import logging
 import os
+import resource
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from typing import Dict, Any, Optional, List
-import boto3
-from botocore.exceptions import ClientError
+from typing import Dict, Any, Optional, List, Iterator
+
+try:
+    import zstandard
+except ImportError:  # optional; gzip is always available
+    zstandard = None
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +42,8 @@ class MigrationUtils:
     def store_migration_artifact(self, key: str, data: Any) -> str:
         """Store migration artifact in S3 with encryption"""
         
+        from botocore.exceptions import ClientError
+        
         try:
             full_key = f"{self.migration_prefix}/{key}"
             
@@ -54,7 +64,8 @@ class MigrationUtils:
                 Metadata={
                     'migration-id': self.migration_id,
                     'created-at': datetime.now(timezone.utc).isoformat(),
-                    'content-type': 'migration-artifact'
+                    'content-type': 'migration-artifact',
+                    'peak-memory-mb': str(self.get_peak_memory_mb())
                 }
             )
             
@@ -65,9 +76,52 @@ class MigrationUtils:
             logger.error(f"Failed to store migration artifact {key}: {e}")
             raise
     
+    def open_artifact_writer(self, key: str, content_type: str = 'application/octet-stream',
+                             part_size: int = 8 * 1024 * 1024, compression: str = 'none',
+                             compression_level: Optional[int] = None,
+                             max_concurrency: int = 4) -> 'MultipartArtifactWriter':
+        """Open a streaming multipart writer for a large artifact (KMS encrypted like put artifacts)"""
+        
+        return MultipartArtifactWriter(
+            self.s3_client,
+            self.bucket_name,
+            f"{self.migration_prefix}/{key}",
+            self.kms_key_id,
+            metadata={
+                'migration-id': self.migration_id,
+                'created-at': datetime.now(timezone.utc).isoformat(),
+                'content-type': 'migration-artifact'
+            },
+            content_type=content_type,
+            part_size=part_size,
+            compression=compression,
+            compression_level=compression_level,
+            max_concurrency=max_concurrency
+        )
+    
+    def open_artifact_reader(self, key: str, part_size: int = 8 * 1024 * 1024,
+                             max_concurrency: int = 4) -> 'MultipartArtifactReader':
+        """Open a streaming reader for an artifact; compression is taken from its metadata"""
+        
+        from botocore.exceptions import ClientError
+        
+        try:
+            return MultipartArtifactReader(
+                self.s3_client,
+                self.bucket_name,
+                f"{self.migration_prefix}/{key}",
+                part_size=part_size,
+                max_concurrency=max_concurrency
+            )
+        except ClientError as e:
+            logger.error(f"Failed to open migration artifact {key}: {e}")
+            raise
+    
     def retrieve_migration_artifact(self, key: str) -> Any:
         """Retrieve migration artifact from S3"""
         
+        from botocore.exceptions import ClientError
+        
         try:
             full_key = f"{self.migration_prefix}/{key}"
             
@@ -88,24 +142,45 @@ class MigrationUtils:
             logger.error(f"Failed to retrieve migration artifact {key}: {e}")
             raise
     
-    def list_migration_artifacts(self) -> List[str]:
-        """List all artifacts for this migration"""
+    def list_migration_artifacts(self, prefix: str = '') -> List[str]:
+        """List all artifacts for this migration, optionally below a sub-prefix"""
+        
+        from botocore.exceptions import ClientError
         
         try:
-            response = self.s3_client.list_objects_v2(
-                Bucket=self.bucket_name,
-                Prefix=f"{self.migration_prefix}/"
-            )
+            paginator = self.s3_client.get_paginator('list_objects_v2')
+            keys = []
             
-            if 'Contents' not in response:
-                return []
+            for page in paginator.paginate(Bucket=self.bucket_name, Prefix=f"{self.migration_prefix}/{prefix}"):
+                keys.extend(obj['Key'] for obj in page.get('Contents', []))
             
-            return [obj['Key'] for obj in response['Contents']]
+            return keys
             
         except ClientError as e:
             logger.error(f"Failed to list migration artifacts: {e}")
             raise
     
+    def delete_migration_artifacts(self, prefix: str) -> int:
+        """Delete all artifacts of this migration below a sub-prefix"""
+        
+        from botocore.exceptions import ClientError
+        
+        try:
+            keys = self.list_migration_artifacts(prefix)
+            
+            # delete_objects accepts at most 1000 keys per call
+            for i in range(0, len(keys), 1000):
+                self.s3_client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={'Objects': [{'Key': key} for key in keys[i:i + 1000]]}
+                )
+            
+            return len(keys)
+            
+        except ClientError as e:
+            logger.error(f"Failed to delete migration artifacts under {prefix}: {e}")
+            raise
+    
     def create_migration_report(self, migration_data: Dict[str, Any]) -> str:
         """Create a comprehensive migration report"""
         
@@ -131,6 +206,8 @@ class MigrationUtils:
     def cleanup_old_migrations(self, retention_days: int = 30) -> List[str]:
         """Clean up old migration artifacts"""
         
+        from botocore.exceptions import ClientError
+        
         try:
             # List all migration prefixes
             response = self.s3_client.list_objects_v2(
@@ -174,6 +251,12 @@ class MigrationUtils:
             logger.error(f"Failed to cleanup old migrations: {e}")
             raise
     
+    @staticmethod
+    def get_peak_memory_mb() -> float:
+        """Get the memory high-water mark of this process in MB (ru_maxrss is in KB on Linux)"""
+        
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    
     @staticmethod
     def format_data_size(size_bytes: int) -> str:
         """Format data size in human-readable format"""
@@ -217,8 +300,8 @@ class MigrationUtils:
             }
         }
     
-    def generate_rollback_plan(self, backup_key: str) -> Dict[str, Any]:
-        """Generate a rollback plan for the migration"""
+    def generate_rollback_plan(self, backup_key: str, restore_metrics: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Generate a rollback plan for the migration, timed from a measured restore if available"""
         
         rollback_plan = {
             'rollback_id': f"rollback_{self.migration_id}",
@@ -246,18 +329,25 @@ class MigrationUtils:
                     'description': 'Restart application services'
                 }
             ],
-            'estimated_rollback_time_minutes': 15,
+            'estimated_rollback_time_minutes': (
+                restore_metrics['estimated_rollback_time_minutes'] if restore_metrics else 15
+            ),
             'contact_information': {
                 'notification_topic': 'SNS topic for emergency notifications',
                 'escalation_procedure': 'Contact DevOps team immediately'
             }
         }
         
+        if restore_metrics:
+            rollback_plan['measured_restore'] = restore_metrics
+        
         return self.store_migration_artifact('rollback_plan.json', rollback_plan)
     
     def validate_s3_access(self) -> bool:
         """Validate S3 bucket access and permissions"""
         
+        from botocore.exceptions import ClientError
+        
         try:
             # Test write access
             test_key = f"{self.migration_prefix}/access_test.txt"
@@ -286,4 +376,438 @@ class MigrationUtils:
             
         except ClientError as e:
             logger.error(f"S3 access validation failed: {e}")
-            return False
\ No newline at end of file
+            return False
+
+class MigrationCheckpoint:
+    """Chunk-level progress manifest for resumable migrations
+    
+    Layout under the migration prefix:
+        checkpoints/manifest.json                 run settings and status
+        checkpoints/<table>/plan.json             chunk plan for the table
+        checkpoints/<table>/chunk_<id>.json       one object per committed chunk
+    
+    Every chunk is written as its own object so parallel workers never
+    overwrite each other's progress.
+    """
+    
+    PREFIX = 'checkpoints'
+    
+    def __init__(self, utils: MigrationUtils):
+        self.utils = utils
+        self.manifest: Dict[str, Any] = {}
+        self.plans: Dict[str, List[Dict[str, Any]]] = {}
+        self.chunks: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+    
+    def load(self) -> bool:
+        """Load the manifest, plans and committed chunks; returns False if no manifest exists"""
+        
+        keys = self.utils.list_migration_artifacts(f"{self.PREFIX}/")
+        prefix_length = len(f"{self.utils.get_migration_prefix()}/")
+        
+        for full_key in keys:
+            key = full_key[prefix_length:]
+            parts = key.split('/')
+            
+            if key == f"{self.PREFIX}/manifest.json":
+                self.manifest = self.utils.retrieve_migration_artifact(key)
+            elif len(parts) == 3 and parts[2] == 'plan.json':
+                self.plans[parts[1]] = self.utils.retrieve_migration_artifact(key)
+            elif len(parts) == 3 and parts[2].startswith('chunk_'):
+                record = self.utils.retrieve_migration_artifact(key)
+                self.chunks.setdefault(parts[1], {})[record['chunk_id']] = record
+        
+        logger.info(f"Loaded checkpoint manifest with {sum(len(c) for c in self.chunks.values())} committed chunks")
+        return bool(self.manifest)
+    
+    def save_manifest(self, **fields) -> None:
+        """Create or update the run-level manifest"""
+        
+        with self._lock:
+            self.manifest.update(fields)
+            self.manifest['updated_at'] = datetime.now(timezone.utc).isoformat()
+            manifest = dict(self.manifest)
+        
+        self.utils.store_migration_artifact(f"{self.PREFIX}/manifest.json", manifest)
+    
+    def get_plan(self, table: str) -> Optional[List[Dict[str, Any]]]:
+        """Get the stored chunk plan for a table"""
+        return self.plans.get(table)
+    
+    def save_plan(self, table: str, chunks: List[Dict[str, Any]]) -> None:
+        """Persist the chunk plan for a table before any of its chunks are copied
+        
+        Any chunks recorded against a previous plan for the table are discarded.
+        """
+        
+        with self._lock:
+            self.plans[table] = chunks
+            self.chunks.pop(table, None)
+        
+        self.utils.delete_migration_artifacts(f"{self.PREFIX}/{table}/chunk_")
+        self.utils.store_migration_artifact(f"{self.PREFIX}/{table}/plan.json", chunks)
+    
+    def completed_chunks(self, table: str) -> Dict[str, Dict[str, Any]]:
+        """Get committed chunk records for a table keyed by chunk id"""
+        
+        with self._lock:
+            return dict(self.chunks.get(table, {}))
+    
+    def record_chunk(self, table: str, chunk_id: str, rows: int, checksum: Optional[str],
+                     chunk: Optional[Dict[str, Any]] = None) -> None:
+        """Record a chunk once its rows are committed on the target"""
+        
+        record = {
+            'table': table,
+            'chunk_id': chunk_id,
+            'range': chunk,
+            'rows': rows,
+            'checksum': checksum,
+            'committed_at': datetime.now(timezone.utc).isoformat()
+        }
+        
+        with self._lock:
+            self.chunks.setdefault(table, {})[chunk_id] = record
+        
+        self.utils.store_migration_artifact(f"{self.PREFIX}/{table}/chunk_{chunk_id}.json", record)
+    
+    def is_table_complete(self, table: str) -> bool:
+        """Check whether every planned chunk of a table is committed"""
+        
+        plan = self.get_plan(table)
+        if not plan:
+            return False
+        
+        completed = self.completed_chunks(table)
+        return all(chunk['chunk_id'] in completed for chunk in plan)
+
+COMPRESSION_TYPES = ('none', 'gzip', 'zstd')
+
+def _compressor(compression: str, level: Optional[int] = None):
+    """Incremental compressor with compress()/flush(), or None for uncompressed artifacts"""
+    
+    if compression == 'gzip':
+        return zlib.compressobj(6 if level is None else level, zlib.DEFLATED, 31)
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ValueError("zstd compression requires the zstandard package")
+        return zstandard.ZstdCompressor(level=3 if level is None else level).compressobj()
+    if compression in (None, 'none'):
+        return None
+    raise ValueError(f"Unsupported compression: {compression} (expected one of {', '.join(COMPRESSION_TYPES)})")
+
+def _decompressor(compression: str):
+    if compression == 'gzip':
+        return zlib.decompressobj(31)
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ValueError("zstd compression requires the zstandard package")
+        return zstandard.ZstdDecompressor().decompressobj()
+    if compression in (None, 'none'):
+        return None
+    raise ValueError(f"Unsupported compression: {compression} (expected one of {', '.join(COMPRESSION_TYPES)})")
+
+class MultipartArtifactWriter:
+    """File-like writer that compresses and uploads an artifact to S3 as multipart parts
+    
+    Up to max_concurrency parts are uploaded in parallel, so memory stays
+    around (max_concurrency + 1) * part_size whatever the artifact size.
+    The upload is aborted if the writer is closed because of an exception,
+    so no partial object appears. Only the injected s3_client is used, so a
+    moto or MinIO client works the same as the real one.
+    """
+    
+    MIN_PART_SIZE = 5 * 1024 * 1024
+    
+    def __init__(self, s3_client, bucket_name: str, key: str, kms_key_id: str,
+                 metadata: Dict[str, str], content_type: str, part_size: int = 8 * 1024 * 1024,
+                 compression: str = 'none', compression_level: Optional[int] = None, max_concurrency: int = 4):
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.key = key
+        self.part_size = max(part_size, self.MIN_PART_SIZE)
+        self.compression = compression or 'none'
+        self.compressor = _compressor(self.compression, compression_level)
+        self.buffer = bytearray()
+        self.parts: List[Dict[str, Any]] = []
+        self.bytes_written = 0
+        self.raw_bytes = 0
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency))
+        self.max_in_flight = max(1, max_concurrency)
+        self.in_flight = []
+        self.closed = False
+        
+        response = self.s3_client.create_multipart_upload(
+            Bucket=bucket_name,
+            Key=key,
+            ServerSideEncryption='aws:kms',
+            SSEKMSKeyId=kms_key_id,
+            ContentType=content_type,
+            Metadata=dict(metadata, compression=self.compression)
+        )
+        self.upload_id = response['UploadId']
+    
+    def write(self, data: bytes) -> int:
+        self.raw_bytes += len(data)
+        self._write_stored(self.compressor.compress(data) if self.compressor else data)
+        return len(data)
+    
+    def _write_stored(self, data: bytes):
+        self.buffer.extend(data)
+        self.bytes_written += len(data)
+        
+        while len(self.buffer) >= self.part_size:
+            self._submit_part(bytes(self.buffer[:self.part_size]))
+            del self.buffer[:self.part_size]
+    
+    def tell(self) -> int:
+        """Bytes of stored (compressed) output so far, i.e. the object offset of the next write"""
+        return self.bytes_written
+    
+    def _submit_part(self, body: bytes):
+        # Bound memory: wait for the oldest upload before queuing another part
+        while len(self.in_flight) >= self.max_in_flight:
+            self.parts.append(self.in_flight.pop(0).result())
+        
+        part_number = len(self.parts) + len(self.in_flight) + 1
+        self.in_flight.append(self.executor.submit(self._upload_part, part_number, body))
+    
+    def _upload_part(self, part_number: int, body: bytes) -> Dict[str, Any]:
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket_name,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=body
+        )
+        return {'ETag': response['ETag'], 'PartNumber': part_number}
+    
+    def close(self):
+        """Flush the compressor, upload the last part and complete the multipart upload"""
+        
+        if self.closed:
+            return
+        
+        if self.compressor:
+            self._write_stored(self.compressor.flush())
+        if self.buffer or not (self.parts or self.in_flight):
+            self._submit_part(bytes(self.buffer))
+            self.buffer.clear()
+        
+        self.parts.extend(future.result() for future in self.in_flight)
+        self.in_flight = []
+        self.executor.shutdown()
+        
+        self.s3_client.complete_multipart_upload(
+            Bucket=self.bucket_name,
+            Key=self.key,
+            UploadId=self.upload_id,
+            MultipartUpload={'Parts': sorted(self.parts, key=lambda part: part['PartNumber'])}
+        )
+        self.closed = True
+        logger.info(f"Stored streamed artifact: s3://{self.bucket_name}/{self.key} "
+                    f"({self.raw_bytes} bytes, {self.bytes_written} stored, {len(self.parts)} parts)")
+    
+    def abort(self):
+        if self.closed:
+            return
+        
+        self.buffer.clear()
+        for future in self.in_flight:
+            future.cancel()
+        self.executor.shutdown()
+        self.s3_client.abort_multipart_upload(Bucket=self.bucket_name, Key=self.key, UploadId=self.upload_id)
+        self.closed = True
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+class MultipartArtifactReader:
+    """File-like reader that streams an S3 artifact with ranged GETs and decompresses it
+    
+    The object (or the byte range start..start+length) is fetched in
+    part_size windows, up to max_concurrency ahead of the consumer.
+    Compression defaults to the 'compression' metadata written by
+    MultipartArtifactWriter.
+    """
+    
+    def __init__(self, s3_client, bucket_name: str, key: str, part_size: int = 8 * 1024 * 1024,
+                 max_concurrency: int = 4, compression: Optional[str] = None,
+                 start: int = 0, length: Optional[int] = None):
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.key = key
+        self.part_size = max(1, part_size)
+        
+        if compression is None or length is None:
+            head = self.s3_client.head_object(Bucket=bucket_name, Key=key)
+            if compression is None:
+                compression = head.get('Metadata', {}).get('compression', 'none')
+            if length is None:
+                length = head['ContentLength'] - start
+        
+        self.compression = compression
+        self.decompressor = _decompressor(compression)
+        self.start = start
+        self.end = start + length
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency))
+        self.max_in_flight = max(1, max_concurrency)
+        self.in_flight = []
+        self.next_offset = start
+        self.pending = b''
+        self.finished = False
+        self.closed = False
+        self.bytes_read = 0
+    
+    def _fetch(self, first: int, last: int) -> bytes:
+        response = self.s3_client.get_object(Bucket=self.bucket_name, Key=self.key, Range=f"bytes={first}-{last}")
+        return response['Body'].read()
+    
+    def _next_stored_chunk(self) -> Optional[bytes]:
+        while len(self.in_flight) < self.max_in_flight and self.next_offset < self.end:
+            last = min(self.next_offset + self.part_size, self.end) - 1
+            self.in_flight.append(self.executor.submit(self._fetch, self.next_offset, last))
+            self.next_offset = last + 1
+        
+        if not self.in_flight:
+            return None
+        
+        chunk = self.in_flight.pop(0).result()
+        self.bytes_read += len(chunk)
+        return chunk
+    
+    def read(self, size: int = -1) -> bytes:
+        """Return up to size decompressed bytes (all remaining if size < 0); b'' at the end"""
+        
+        while not self.finished and (size is None or size < 0 or len(self.pending) < size):
+            chunk = self._next_stored_chunk()
+            if chunk is None:
+                if self.decompressor and hasattr(self.decompressor, 'flush'):
+                    self.pending += self.decompressor.flush()
+                self.finished = True
+                self.close()
+                break
+            self.pending += self.decompressor.decompress(chunk) if self.decompressor else chunk
+        
+        if size is None or size < 0:
+            data, self.pending = self.pending, b''
+        else:
+            data, self.pending = self.pending[:size], self.pending[size:]
+        return data
+    
+    def iter_chunks(self, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        while True:
+            data = self.read(chunk_size)
+            if not data:
+                return
+            yield data
+    
+    def close(self):
+        for future in self.in_flight:
+            future.cancel()
+        self.in_flight = []
+        self.executor.shutdown(wait=False)
+        self.closed = True
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+class StreamingBackupWriter:
+    """Database backup written as one gzip member per table into a single S3 object
+    
+    Each table's COPY text output is compressed into its own gzip member, so
+    the whole object is still a valid .gz file while any single table can be
+    restored with a ranged GET of its member. The per-table index with
+    offsets, lengths, row counts and checksums is stored next to the backup
+    as <key>.index.json.
+    """
+    
+    FORMAT = 'copy-text'
+    
+    def __init__(self, utils: MigrationUtils, key: str, compression_level: int = 6, part_size: int = 8 * 1024 * 1024):
+        self.utils = utils
+        self.key = key
+        self.compression_level = compression_level
+        self.writer = utils.open_artifact_writer(key, content_type='application/gzip', part_size=part_size)
+        self.tables: List[Dict[str, Any]] = []
+        self._current: Optional[Dict[str, Any]] = None
+        self._compressor = None
+        self._digest = None
+    
+    def begin_table(self, table_name: str, columns: List[str]):
+        self._current = {
+            'table': table_name,
+            'columns': columns,
+            'format': self.FORMAT,
+            'offset': self.writer.tell(),
+            'raw_bytes': 0
+        }
+        self._compressor = zlib.compressobj(self.compression_level, zlib.DEFLATED, 31)
+        self._digest = hashlib.md5()
+    
+    def write(self, data: bytes) -> int:
+        """Receive COPY output for the current table"""
+        
+        self._current['raw_bytes'] += len(data)
+        self._digest.update(data)
+        self.writer.write(self._compressor.compress(data))
+        return len(data)
+    
+    def end_table(self, rows: int, completed: bool = True) -> Optional[Dict[str, Any]]:
+        """Close the table's gzip member; failed tables are left out of the index"""
+        
+        if self._current is None:
+            return None
+        
+        self.writer.write(self._compressor.flush())
+        entry = dict(self._current, length=self.writer.tell() - self._current['offset'],
+                     rows=rows, checksum=self._digest.hexdigest())
+        self._current = None
+        
+        if not completed:
+            return None
+        
+        self.tables.append(entry)
+        return entry
+    
+    def close(self) -> Dict[str, Any]:
+        self.writer.close()
+        
+        index = {
+            'backup_key': self.key,
+            'format': self.FORMAT,
+            'compression': 'gzip',
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'size_bytes': self.writer.tell(),
+            'tables': self.tables
+        }
+        self.utils.store_migration_artifact(f"{self.key}.index.json", index)
+        return index
+    
+    def abort(self):
+        self.writer.abort()
+
+class BackupTableReader(MultipartArtifactReader):
+    """Read one table's COPY text back from a streaming backup with ranged GETs of its gzip member"""
+    
+    def __init__(self, utils: MigrationUtils, backup_key: str, entry: Dict[str, Any],
+                 part_size: int = 8 * 1024 * 1024, max_concurrency: int = 4):
+        super().__init__(
+            utils.s3_client,
+            utils.bucket_name,
+            f"{utils.get_migration_prefix()}/{backup_key}",
+            part_size=part_size,
+            max_concurrency=max_concurrency,
+            compression='gzip',
+            start=entry['offset'],
+            length=entry['length']
+        )
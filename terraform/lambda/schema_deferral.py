@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Schema Deferral Module
+DM_CRM Sales Dashboard - Bulk Load Support
+
+Captures the secondary indexes and foreign key constraints of a set of
+tables, drops them before a bulk load and recreates them afterwards in
+parallel. Loading into bare tables avoids maintaining every index and
+checking every foreign key row by row; rebuilding once at the end is a
+single sort per index and a single join per constraint.
+
+Rebuilding skips objects that already exist, so captured statements can be
+replayed safely after a run that failed part way through.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Callable, ContextManager
+
+logger = logging.getLogger(__name__)
+
+class SchemaDeferral:
+    """Drop and rebuild deferrable indexes and foreign keys around a bulk load"""
+
+    def __init__(self, maintenance_work_mem: str = '256MB', max_workers: int = 4):
+        self.maintenance_work_mem = maintenance_work_mem
+        self.max_workers = max(1, max_workers)
+        self.statements: List[Dict[str, Any]] = []
+
+    def load(self, statements: List[Dict[str, Any]]) -> None:
+        """Use previously captured statements, e.g. from a stored artifact"""
+
+        self.statements = list(statements)
+
+    def capture(self, cursor, tables: List[str]) -> List[Dict[str, Any]]:
+        """
+        Record the DDL of foreign keys and of indexes not backing a constraint.
+
+        Primary key, unique and check constraints stay in place; they are
+        needed for ON CONFLICT and are cheap compared with secondary indexes.
+        Foreign keys are captured if either side is one of the tables, along
+        with whether they were validated, so a constraint that was NOT VALID
+        before the load is not validated afterwards.
+        """
+
+        cursor.execute("""
+            SELECT conrelid::regclass::text, conname, pg_get_constraintdef(oid), convalidated
+            FROM pg_constraint
+            WHERE contype = 'f'
+            AND (conrelid = ANY(%s::regclass[]) OR confrelid = ANY(%s::regclass[]))
+            ORDER BY conrelid::regclass::text, conname
+        """, (tables, tables))
+        foreign_keys = []
+        for table, name, definition, validated in cursor.fetchall():
+            # pg_get_constraintdef already ends in NOT VALID for unvalidated constraints
+            if definition.endswith(' NOT VALID'):
+                definition = definition[:-len(' NOT VALID')]
+            foreign_keys.append({
+                'kind': 'foreign_key', 'table': table, 'name': name, 'validated': validated,
+                'ddl': f'ALTER TABLE {table} ADD CONSTRAINT "{name}" {definition} NOT VALID'
+            })
+
+        cursor.execute("""
+            SELECT i.tablename, i.indexname, i.indexdef
+            FROM pg_indexes i
+            WHERE i.schemaname = 'public'
+            AND i.tablename = ANY(%s)
+            AND NOT EXISTS (
+                SELECT 1 FROM pg_constraint c
+                WHERE c.conindid = format('%%I.%%I', i.schemaname, i.indexname)::regclass
+            )
+            ORDER BY i.tablename, i.indexname
+        """, (tables,))
+        indexes = [
+            {'kind': 'index', 'table': table, 'name': name, 'ddl': definition}
+            for table, name, definition in cursor.fetchall()
+        ]
+
+        self.statements = indexes + foreign_keys
+        logger.info(f"Captured {len(indexes)} indexes and {len(foreign_keys)} foreign keys for deferral")
+        return self.statements
+
+    def drop(self, conn) -> None:
+        """Drop the captured foreign keys and indexes in one transaction"""
+
+        cursor = conn.cursor()
+        for statement in self.statements:
+            if statement['kind'] == 'foreign_key':
+                cursor.execute(f'ALTER TABLE {statement["table"]} DROP CONSTRAINT IF EXISTS "{statement["name"]}"')
+
+        for statement in self.statements:
+            if statement['kind'] == 'index':
+                cursor.execute(f'DROP INDEX IF EXISTS public."{statement["name"]}"')
+
+        conn.commit()
+        logger.info(f"Dropped {len(self.statements)} deferred indexes and constraints")
+
+    def recreate(self, connection_factory: Callable[[], ContextManager]) -> Dict[str, Any]:
+        """
+        Rebuild indexes, then foreign keys, each phase spread over max_workers sessions.
+
+        Foreign keys are added NOT VALID and then validated, which only takes
+        a SHARE UPDATE EXCLUSIVE lock so validations of different tables run
+        side by side. Statements that fail are reported, not raised, so one
+        bad definition does not leave the rest of the schema missing. Indexes
+        that exist are skipped; existing foreign keys are only validated.
+        Foreign keys that were not valid when captured are left NOT VALID.
+        """
+
+        started = time.monotonic()
+        results: List[Dict[str, Any]] = []
+
+        indexes = [statement for statement in self.statements if statement['kind'] == 'index']
+        foreign_keys = [statement for statement in self.statements if statement['kind'] == 'foreign_key']
+
+        results.extend(self._run_parallel(connection_factory, [[statement['ddl']] for statement in indexes], indexes))
+        results.extend(self._run_parallel(
+            connection_factory,
+            [[statement['ddl']] + (
+                [f'ALTER TABLE {statement["table"]} VALIDATE CONSTRAINT "{statement["name"]}"']
+                if statement.get('validated', True) else []
+             ) for statement in foreign_keys],
+            foreign_keys
+        ))
+
+        errors = [f"{result['kind']} {result['name']}: {result['error']}" for result in results if result['error']]
+        skipped = sum(1 for result in results if result['skipped'] and not result['error'])
+        return {
+            'recreated': len(results) - len(errors) - skipped,
+            'skipped': skipped,
+            'errors': errors,
+            'statements': results,
+            'seconds': round(time.monotonic() - started, 3)
+        }
+
+    def _run_parallel(self, connection_factory: Callable[[], ContextManager],
+                      batches: List[List[str]], statements: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+
+        def run(item):
+            sql_batch, statement = item
+            item_started = time.monotonic()
+            skipped = False
+            error = None
+
+            try:
+                with connection_factory() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute("SET maintenance_work_mem = %s", (self.maintenance_work_mem,))
+                    if self._exists(cursor, statement):
+                        skipped = True
+                        sql_batch = sql_batch[1:]
+                    # Commit after each step so ADD's short lock is released before VALIDATE scans
+                    for sql in sql_batch:
+                        cursor.execute(sql)
+                        conn.commit()
+            except Exception as e:
+                error = str(e)
+                logger.error(f"Could not recreate {statement['kind']} {statement['name']}: {error}")
+
+            return {
+                'kind': statement['kind'],
+                'table': statement['table'],
+                'name': statement['name'],
+                'skipped': skipped,
+                'error': error,
+                'seconds': round(time.monotonic() - item_started, 3)
+            }
+
+        if not statements:
+            return []
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(run, zip(batches, statements)))
+
+    @staticmethod
+    def _exists(cursor, statement: Dict[str, Any]) -> bool:
+        """Whether the index or foreign key of a captured statement is already present"""
+
+        if statement['kind'] == 'index':
+            cursor.execute("SELECT to_regclass(format('public.%%I', %s::text)) IS NOT NULL", (statement['name'],))
+        else:
+            cursor.execute("""
+                SELECT EXISTS (
+                    SELECT 1 FROM pg_constraint
+                    WHERE conrelid = %s::regclass AND conname = %s
+                )
+            """, (statement['table'], statement['name']))
+
+        return cursor.fetchone()[0]
@@ -1,73 +1,95 @@
+# Imported first so that its import timer sees the rest of init
+from lambda_runtime import get_client, report_cold_start, secret_cache
+
 import json
-import boto3
 import logging
 import os
-import psycopg2
+import random
 import secrets
 import string
-from botocore.exceptions import ClientError
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Rotation steps, in the order Secrets Manager invokes them
+ROTATION_STEPS = ('createSecret', 'setSecret', 'testSecret', 'finishSecret')
+
+# Secret families rotated by this function, by the last component of the secret name
+SECRET_FAMILIES = ('database', 'jwt', 'app-config')
+
+# RDS rejects '/', '@', '"' and spaces in master passwords
+DB_PASSWORD_SPECIALS = "!#$%^&*"
+
+BACKOFF_BASE_SECONDS = float(os.environ.get('ROTATION_BACKOFF_BASE_SECONDS', '2'))
+BACKOFF_MAX_SECONDS = float(os.environ.get('ROTATION_BACKOFF_MAX_SECONDS', '20'))
+STEP_TIME_MARGIN_SECONDS = int(os.environ.get('ROTATION_STEP_TIME_MARGIN_SECONDS', '15'))
+FLEET_MAX_WORKERS = int(os.environ.get('ROTATION_FLEET_MAX_WORKERS', '8'))
+
+class RotationPending(Exception):
+    """A step could not finish within this invocation; Secrets Manager retries the rotation."""
+    pass
+
+@report_cold_start
 def handler(event, context):
     """
     Lambda function to rotate database and application secrets.
     
-    This function:
-    1. Generates new secure passwords
-    2. Updates database credentials
-    3. Updates application secrets
-    4. Validates the new credentials
-    5. Activates the new secret versions
+    Invoked by Secrets Manager with a Step, it runs one step of the standard
+    rotation of the secret in SecretId:
+    1. createSecret: store newly generated values as AWSPENDING
+    2. setSecret: apply the pending database password to RDS
+    3. testSecret: wait for RDS to apply it and log in with it
+    4. finishSecret: move AWSCURRENT to the pending version
+    
+    Every step is idempotent, so a step retried after a timeout or failure
+    picks up where the last attempt stopped. Invoked without a Step (for
+    example by hand), it asks Secrets Manager to start rotating the
+    database, JWT and app config secrets of this project, or of every
+    project/environment pair in the event's targets, all concurrently.
+    With wait set, it also waits for the rotations to complete.
     """
     
     # Environment variables
     project_name = os.environ.get('PROJECT_NAME', '${project_name}')
     environment = os.environ.get('ENVIRONMENT', '${environment}')
     
-    # AWS clients
-    secrets_client = boto3.client('secretsmanager')
-    rds_client = boto3.client('rds')
+    # AWS clients, cached across warm invocations
+    secrets_client = get_client('secretsmanager')
+    
+    if event.get('Step'):
+        return run_rotation_step(secrets_client, event, context)
     
     try:
-        logger.info(f"Starting secret rotation for {project_name} {environment}")
-        
-        # Rotate database credentials
-        db_rotation_result = rotate_database_credentials(
-            secrets_client, 
-            rds_client, 
-            project_name, 
-            environment
-        )
-        
-        # Rotate JWT secrets
-        jwt_rotation_result = rotate_jwt_secrets(
-            secrets_client, 
-            project_name, 
-            environment
+        fleet = 'targets' in event
+        targets = event['targets'] if fleet else [{'project_name': project_name, 'environment': environment}]
+        logger.info(f"Starting secret rotation for {len(targets)} target(s)")
+        
+        results = rotate_targets(
+            secrets_client,
+            targets,
+            max_workers=event.get('max_workers', FLEET_MAX_WORKERS),
+            wait=event.get('wait', False),
+            deadline=step_deadline(context)
         )
+        failed = [result['target'] for result in results if result['status'] == 'FAILED']
         
-        # Rotate application configuration secrets
-        app_rotation_result = rotate_app_config_secrets(
-            secrets_client, 
-            project_name, 
-            environment
-        )
+        logger.info(f"Secret rotation finished; failed targets: {failed or 'none'}")
         
-        logger.info("Secret rotation completed successfully")
+        body = {'status': 'FAILED' if failed else rollup_status([result['status'] for result in results])}
+        if fleet:
+            body['targets'] = results
+            body['failed_targets'] = failed
+        else:
+            body.update({key: value for key, value in results[0].items() if key.endswith('_rotation')})
         
         return {
-            'statusCode': 200,
-            'body': json.dumps({
-                'status': 'SUCCESS',
-                'database_rotation': db_rotation_result,
-                'jwt_rotation': jwt_rotation_result,
-                'app_config_rotation': app_rotation_result
-            })
+            'statusCode': 500 if failed else 200,
+            'body': json.dumps(body)
         }
-        
+    
     except Exception as e:
         logger.error(f"Secret rotation failed: {str(e)}")
         
@@ -79,149 +101,304 @@ def handler(event, context):
             })
         }
 
-def rotate_database_credentials(secrets_client, rds_client, project_name, environment):
-    """Rotate database credentials."""
+def rotate_targets(secrets_client, targets, max_workers=FLEET_MAX_WORKERS, wait=False, deadline=None):
+    """
+    Start rotation of every secret family of every target on a bounded pool; results per target.
     
-    secret_name = f"{project_name}/{environment}/database"
+    Each (target, family) pair is a separate task, so the JWT and app
+    config rotations do not queue behind the slower database rotation, and
+    one target's failure does not hold up the others.
+    """
     
-    try:
-        # Get current secret
-        current_secret = secrets_client.get_secret_value(SecretId=secret_name)
-        current_data = json.loads(current_secret['SecretString'])
-        
-        # Generate new password
-        new_password = generate_secure_password(16)
-        
-        # Create new secret version
-        new_data = current_data.copy()
-        new_data['password'] = new_password
-        
-        # Test connection with current credentials
-        if not test_database_connection(current_data):
-            raise Exception("Current database credentials are invalid")
-        
-        # Update RDS master password
-        db_instance_id = f"{project_name}-db-{environment}"
-        
-        logger.info(f"Updating RDS master password for {db_instance_id}")
-        rds_client.modify_db_instance(
-            DBInstanceIdentifier=db_instance_id,
-            MasterUserPassword=new_password,
-            ApplyImmediately=True
-        )
-        
-        # Wait for RDS modification to complete
-        wait_for_rds_modification(rds_client, db_instance_id)
-        
-        # Test connection with new credentials
-        if not test_database_connection(new_data):
-            raise Exception("New database credentials are invalid")
-        
-        # Update secret with new password
-        secrets_client.put_secret_value(
-            SecretId=secret_name,
-            SecretString=json.dumps(new_data),
-            VersionStage='AWSPENDING'
-        )
-        
-        # Activate new version
-        secrets_client.update_secret_version_stage(
-            SecretId=secret_name,
-            VersionStage='AWSCURRENT',
-            MoveToVersionId=secrets_client.describe_secret(SecretId=secret_name)['VersionIdsToStages'].keys().__iter__().__next__()
-        )
+    tasks = [(target['project_name'], target['environment'], family) for target in targets for family in SECRET_FAMILIES]
+    deadline = deadline or step_deadline(None)
+    
+    def run(task):
+        project_name, environment, family = task
+        secret_name = f"{project_name}/{environment}/{family}"
+        started = time.monotonic()
         
-        logger.info("Database credentials rotated successfully")
-        return {'status': 'SUCCESS', 'rotated': True}
+        result = start_rotation(secrets_client, secret_name)
+        if wait and result['status'] == 'STARTED':
+            result['status'] = wait_for_rotation(secrets_client, secret_name, result['version_id'], deadline)
         
-    except Exception as e:
-        logger.error(f"Database credential rotation failed: {str(e)}")
-        return {'status': 'FAILED', 'error': str(e)}
+        result['seconds'] = round(time.monotonic() - started, 3)
+        return result
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tasks) or 1))) as executor:
+        outcomes = list(executor.map(run, tasks))
+    
+    results = []
+    for target in targets:
+        rotations = {
+            family: outcome
+            for (project_name, environment, family), outcome in zip(tasks, outcomes)
+            if (project_name, environment) == (target['project_name'], target['environment'])
+        }
+        results.append({
+            'target': f"{target['project_name']}/{target['environment']}",
+            'status': rollup_status([rotation['status'] for rotation in rotations.values()]),
+            'seconds': max(rotation['seconds'] for rotation in rotations.values()),
+            'database_rotation': rotations['database'],
+            'jwt_rotation': rotations['jwt'],
+            'app_config_rotation': rotations['app-config']
+        })
+    
+    return results
 
-def rotate_jwt_secrets(secrets_client, project_name, environment):
-    """Rotate JWT secrets."""
+def rollup_status(statuses):
+    """FAILED if anything failed, then PENDING if anything is still rotating, else the common status."""
     
-    secret_name = f"{project_name}/{environment}/jwt"
+    for status in ('FAILED', 'PENDING', 'STARTED'):
+        if status in statuses:
+            return status
+    return 'ROTATED'
+
+def wait_for_rotation(secrets_client, secret_name, version_id, deadline):
+    """ROTATED once version_id is AWSCURRENT, PENDING if the deadline passes first."""
+    
+    def rotated():
+        versions = secrets_client.describe_secret(SecretId=secret_name)['VersionIdsToStages']
+        return 'AWSCURRENT' in versions.get(version_id, [])
+    
+    return 'ROTATED' if wait_with_backoff(rotated, deadline) else 'PENDING'
+
+def start_rotation(secrets_client, secret_name):
+    """Ask Secrets Manager to rotate a secret now; the steps then arrive as separate invocations."""
+    
+    from botocore.exceptions import ClientError
     
     try:
-        # Get current secret
-        current_secret = secrets_client.get_secret_value(SecretId=secret_name)
-        current_data = json.loads(current_secret['SecretString'])
-        
-        # Generate new JWT secret
-        new_jwt_secret = generate_secure_password(64, include_special=True)
-        
-        # Create new secret version
-        new_data = current_data.copy()
-        new_data['jwt_secret'] = new_jwt_secret
-        
-        # Update secret
-        secrets_client.put_secret_value(
-            SecretId=secret_name,
-            SecretString=json.dumps(new_data),
-            VersionStage='AWSPENDING'
-        )
-        
-        # Activate new version (JWT rotation requires application restart)
-        secrets_client.update_secret_version_stage(
-            SecretId=secret_name,
-            VersionStage='AWSCURRENT',
-            MoveToVersionId=secrets_client.describe_secret(SecretId=secret_name)['VersionIdsToStages'].keys().__iter__().__next__()
-        )
-        
-        logger.info("JWT secrets rotated successfully")
-        return {'status': 'SUCCESS', 'rotated': True}
-        
-    except Exception as e:
-        logger.error(f"JWT secret rotation failed: {str(e)}")
+        response = secrets_client.rotate_secret(SecretId=secret_name, RotateImmediately=True)
+        logger.info(f"Started rotation of {secret_name}: version {response['VersionId']}")
+        return {'status': 'STARTED', 'version_id': response['VersionId']}
+    except ClientError as e:
+        logger.error(f"Could not start rotation of {secret_name}: {e}")
         return {'status': 'FAILED', 'error': str(e)}
 
-def rotate_app_config_secrets(secrets_client, project_name, environment):
-    """Rotate application configuration secrets."""
+def run_rotation_step(secrets_client, event, context):
+    """
+    Run the rotation step named in a Secrets Manager rotation event.
+    
+    The project, environment and family come from the secret's name
+    (<project>/<environment>/<family>), so one function can rotate the
+    secrets of several environments.
+    """
+    
+    secret_id = event['SecretId']
+    token = event['ClientRequestToken']
+    step = event['Step']
+    
+    if step not in ROTATION_STEPS:
+        raise ValueError(f"Unknown rotation step: {step}")
+    
+    metadata = secrets_client.describe_secret(SecretId=secret_id)
+    name_parts = metadata['Name'].split('/')
+    if len(name_parts) != 3 or name_parts[2] not in SECRET_FAMILIES:
+        raise ValueError(f"Secret {metadata['Name']} is not a secret this function rotates")
+    project_name, environment, family = name_parts
+    
+    if not metadata.get('RotationEnabled'):
+        raise ValueError(f"Secret {metadata['Name']} does not have rotation enabled")
+    
+    versions = metadata['VersionIdsToStages']
+    if token not in versions:
+        raise ValueError(f"Secret version {token} has no stage for rotation of {metadata['Name']}")
+    if 'AWSCURRENT' in versions[token]:
+        logger.info(f"Secret version {token} is already AWSCURRENT for {metadata['Name']}")
+        return {'status': 'SUCCESS', 'step': step, 'secret': metadata['Name']}
+    if 'AWSPENDING' not in versions[token]:
+        raise ValueError(f"Secret version {token} is not AWSPENDING for {metadata['Name']}")
     
-    secret_name = f"{project_name}/{environment}/app-config"
+    deadline = step_deadline(context)
+    started = time.monotonic()
+    logger.info(f"Running {step} for {metadata['Name']} version {token}")
+    
+    # Only database rotations talk to RDS
+    rds_client = get_client('rds') if family == 'database' and step in ('setSecret', 'testSecret') else None
+    
+    if step == 'createSecret':
+        create_secret(secrets_client, secret_id, token, family)
+    elif step == 'setSecret':
+        set_secret(secrets_client, rds_client, secret_id, token, family, project_name, environment)
+    elif step == 'testSecret':
+        test_secret(secrets_client, rds_client, secret_id, token, family, project_name, environment, deadline)
+    else:
+        finish_secret(secrets_client, secret_id, token, versions)
+    
+    seconds = round(time.monotonic() - started, 3)
+    logger.info(f"{step} for {metadata['Name']} completed in {seconds}s")
+    return {'status': 'SUCCESS', 'step': step, 'secret': metadata['Name'], 'seconds': seconds}
+
+def step_deadline(context):
+    """Monotonic time by which a step must give up, leaving a margin before the Lambda timeout."""
+    
+    remaining_ms = context.get_remaining_time_in_millis() if hasattr(context, 'get_remaining_time_in_millis') else 300000
+    return time.monotonic() + remaining_ms / 1000 - STEP_TIME_MARGIN_SECONDS
+
+def create_secret(secrets_client, secret_id, token, family):
+    """Store new values as the AWSPENDING version for token, unless that version already exists."""
+    
+    from botocore.exceptions import ClientError
     
     try:
-        # Get current secret
-        current_secret = secrets_client.get_secret_value(SecretId=secret_name)
-        current_data = json.loads(current_secret['SecretString'])
-        
-        # Generate new secrets
-        new_session_secret = generate_secure_password(64, include_special=True)
-        new_encryption_key = generate_secure_password(32, include_special=False)
-        
-        # Create new secret version
-        new_data = current_data.copy()
-        new_data['session_secret'] = new_session_secret
-        new_data['encryption_key'] = new_encryption_key
-        
-        # Update secret
-        secrets_client.put_secret_value(
-            SecretId=secret_name,
-            SecretString=json.dumps(new_data),
-            VersionStage='AWSPENDING'
-        )
-        
-        # Activate new version
-        secrets_client.update_secret_version_stage(
-            SecretId=secret_name,
-            VersionStage='AWSCURRENT',
-            MoveToVersionId=secrets_client.describe_secret(SecretId=secret_name)['VersionIdsToStages'].keys().__iter__().__next__()
+        secrets_client.get_secret_value(SecretId=secret_id, VersionId=token, VersionStage='AWSPENDING')
+        logger.info(f"createSecret: pending version {token} already exists")
+        return
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ResourceNotFoundException':
+            raise
+    
+    current_data = json.loads(
+        secrets_client.get_secret_value(SecretId=secret_id, VersionStage='AWSCURRENT')['SecretString']
+    )
+    
+    if family == 'database':
+        new_data = generate_database_secret(current_data)
+    elif family == 'jwt':
+        new_data = generate_jwt_secret(current_data)
+    else:
+        new_data = generate_app_config_secret(current_data)
+    
+    secrets_client.put_secret_value(
+        SecretId=secret_id,
+        ClientRequestToken=token,
+        SecretString=json.dumps(new_data),
+        VersionStages=['AWSPENDING']
+    )
+    logger.info(f"createSecret: stored pending version {token}")
+
+def generate_database_secret(current_data):
+    """Database secret with a new password."""
+    
+    new_data = current_data.copy()
+    new_data['password'] = generate_secure_password(16, specials=DB_PASSWORD_SPECIALS)
+    return new_data
+
+def generate_jwt_secret(current_data):
+    """JWT secret with a new signing key (takes effect when the application reloads it)."""
+    
+    new_data = current_data.copy()
+    new_data['jwt_secret'] = generate_secure_password(64, include_special=True)
+    return new_data
+
+def generate_app_config_secret(current_data):
+    """Application config with a new session secret and encryption key."""
+    
+    new_data = current_data.copy()
+    new_data['session_secret'] = generate_secure_password(64, include_special=True)
+    new_data['encryption_key'] = generate_secure_password(32, include_special=False)
+    return new_data
+
+def set_secret(secrets_client, rds_client, secret_id, token, family, project_name, environment):
+    """Apply the pending database password to RDS; the application secrets need no external change."""
+    
+    if family != 'database':
+        return
+    
+    pending_data = get_pending_secret(secrets_client, secret_id, token)
+    
+    # A retried setSecret must not reset a password RDS has already applied
+    if test_database_connection(pending_data):
+        logger.info("setSecret: pending database password is already active")
+        return
+    
+    db_instance_id = f"{project_name}-db-{environment}"
+    logger.info(f"setSecret: updating RDS master password for {db_instance_id}")
+    rds_client.modify_db_instance(
+        DBInstanceIdentifier=db_instance_id,
+        MasterUserPassword=pending_data['password'],
+        ApplyImmediately=True
+    )
+
+def test_secret(secrets_client, rds_client, secret_id, token, family, project_name, environment, deadline):
+    """Check that the pending values are usable: a database login, or well-formed application secrets."""
+    
+    pending_data = get_pending_secret(secrets_client, secret_id, token)
+    
+    if family == 'jwt':
+        if len(pending_data.get('jwt_secret', '')) < 32:
+            raise ValueError("Pending JWT secret is missing or too short")
+        return
+    
+    if family == 'app-config':
+        for field in ('session_secret', 'encryption_key'):
+            if not pending_data.get(field):
+                raise ValueError(f"Pending app config secret has no {field}")
+        return
+    
+    db_instance_id = f"{project_name}-db-{environment}"
+    
+    def password_applied():
+        return rds_password_change_applied(rds_client, db_instance_id) and test_database_connection(pending_data)
+    
+    if not wait_with_backoff(password_applied, deadline):
+        raise RotationPending(
+            f"RDS has not applied the new master password of {db_instance_id} yet; the rotation will be retried"
         )
+
+def finish_secret(secrets_client, secret_id, token, versions):
+    """Make the pending version AWSCURRENT and take the stage off the previous version."""
+    
+    current_version = next(
+        (version for version, stages in versions.items() if 'AWSCURRENT' in stages), None
+    )
+    
+    secrets_client.update_secret_version_stage(
+        SecretId=secret_id,
+        VersionStage='AWSCURRENT',
+        MoveToVersionId=token,
+        **({'RemoveFromVersionId': current_version} if current_version else {})
+    )
+    secret_cache.invalidate(secret_id)
+    logger.info(f"finishSecret: version {token} is now AWSCURRENT (was {current_version})")
+
+def get_pending_secret(secrets_client, secret_id, token):
+    """Values of the AWSPENDING version created for token."""
+    
+    response = secrets_client.get_secret_value(SecretId=secret_id, VersionId=token, VersionStage='AWSPENDING')
+    return json.loads(response['SecretString'])
+
+def rds_password_change_applied(rds_client, db_instance_id):
+    """Whether the instance is available with no master password change still pending."""
+    
+    db_instance = rds_client.describe_db_instances(DBInstanceIdentifier=db_instance_id)['DBInstances'][0]
+    status = db_instance['DBInstanceStatus']
+    pending = db_instance.get('PendingModifiedValues', {})
+    
+    if status != 'available' or 'MasterUserPassword' in pending:
+        logger.info(f"RDS instance {db_instance_id} status: {status}, password change pending: {'MasterUserPassword' in pending}")
+        return False
+    
+    return True
+
+def wait_with_backoff(check, deadline, base_delay=BACKOFF_BASE_SECONDS, max_delay=BACKOFF_MAX_SECONDS):
+    """
+    Call check() until it returns True or the deadline would pass.
+    
+    Delays grow exponentially up to max_delay and are drawn uniformly below
+    that bound (full jitter), so a change that completes early is noticed
+    early and concurrent rotations do not poll in lockstep.
+    """
+    
+    attempt = 0
+    while True:
+        if check():
+            return True
         
-        logger.info("Application config secrets rotated successfully")
-        return {'status': 'SUCCESS', 'rotated': True}
+        delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+        if time.monotonic() + delay > deadline:
+            return False
         
-    except Exception as e:
-        logger.error(f"App config secret rotation failed: {str(e)}")
-        return {'status': 'FAILED', 'error': str(e)}
+        time.sleep(delay)
+        attempt += 1
 
-def generate_secure_password(length=16, include_special=True):
+def generate_secure_password(length=16, include_special=True, specials="!@#$%^&*"):
     """Generate a secure random password."""
     
     characters = string.ascii_letters + string.digits
     if include_special:
-        characters += "!@#$%^&*"
+        characters += specials
     
     # Ensure password has at least one of each type
     password = [
@@ -231,7 +408,7 @@ def generate_secure_password(length=16, include_special=True):
     ]
     
     if include_special:
-        password.append(secrets.choice("!@#$%^&*"))
+        password.append(secrets.choice(specials))
     
     # Fill the rest randomly
     for _ in range(length - len(password)):
@@ -245,9 +422,15 @@ def generate_secure_password(length=16, include_special=True):
 def test_database_connection(db_config):
     """Test database connection with given credentials."""
     
+    # Only database rotation needs psycopg2; JWT and config rotations skip loading libpq
+    import psycopg2
+    
+    # The secret's host is the RDS endpoint, which carries the port
+    host = db_config['host'].split(':')[0]
+    
     try:
         connection = psycopg2.connect(
-            host=db_config['host'],
+            host=host,
             port=db_config['port'],
             database=db_config['dbname'],
             user=db_config['username'],
@@ -263,48 +446,16 @@ def test_database_connection(db_config):
         connection.close()
         
         return result[0] == 1
-        
+    
     except Exception as e:
         logger.error(f"Database connection test failed: {str(e)}")
         return False
 
-def wait_for_rds_modification(rds_client, db_instance_id, max_wait_time=600):
-    """Wait for RDS modification to complete."""
-    
-    import time
-    
-    start_time = time.time()
-    
-    while time.time() - start_time < max_wait_time:
-        try:
-            response = rds_client.describe_db_instances(
-                DBInstanceIdentifier=db_instance_id
-            )
-            
-            db_instance = response['DBInstances'][0]
-            status = db_instance['DBInstanceStatus']
-            
-            if status == 'available':
-                logger.info(f"RDS instance {db_instance_id} is available")
-                return True
-            elif status == 'modifying':
-                logger.info(f"RDS instance {db_instance_id} is still modifying, waiting...")
-                time.sleep(30)
-            else:
-                logger.warning(f"RDS instance {db_instance_id} status: {status}")
-                time.sleep(30)
-                
-        except Exception as e:
-            logger.error(f"Error checking RDS status: {str(e)}")
-            time.sleep(30)
-    
-    raise Exception(f"RDS modification timeout after {max_wait_time} seconds")
-
 def send_notification(message, status):
     """Send notification about rotation status."""
     
     try:
-        sns_client = boto3.client('sns')
+        sns_client = get_client('sns')
         topic_arn = os.environ.get('SNS_TOPIC_ARN')
         
         if topic_arn:
@@ -316,7 +467,7 @@ def send_notification(message, status):
             logger.info(f"Notification sent: {status}")
         else:
             logger.warning("SNS topic not configured, skipping notification")
-            
+    
     except Exception as e:
         logger.error(f"Failed to send notification: {e}")
 
@@ -326,4 +477,4 @@ if __name__ == "__main__":
     test_event = {}
     test_context = {}
     result = handler(test_event, test_context)
-    print(json.dumps(result, indent=2))
\ No newline at end of file
+    print(json.dumps(result, indent=2))
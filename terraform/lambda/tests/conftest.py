@@ -0,0 +1,80 @@
+"""
+Shared fixtures for the Lambda module tests.
+
+S3 tests run against moto. Database tests need real PostgreSQL servers and
+are skipped unless their connection strings are set:
+
+    TEST_SOURCE_DATABASE_URL=postgresql://postgres@127.0.0.1:5432/postgres
+    TEST_TARGET_DATABASE_URL=postgresql://postgres@127.0.0.1:5433/postgres
+
+Each database test creates its own scratch database on those servers and
+drops it afterwards. The source server needs wal_level=logical for the
+replication tests.
+"""
+
+import os
+import sys
+import uuid
+
+import pytest
+
+# The Lambda modules are packaged flat, so import them the same way here
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def aws_credentials(monkeypatch):
+    for name, value in {
+        'AWS_ACCESS_KEY_ID': 'testing',
+        'AWS_SECRET_ACCESS_KEY': 'testing',
+        'AWS_SESSION_TOKEN': 'testing',
+        'AWS_DEFAULT_REGION': 'us-east-1'
+    }.items():
+        monkeypatch.setenv(name, value)
+
+@pytest.fixture
+def s3_bucket(aws_credentials):
+    """(s3_client, bucket_name, kms_key_id) on a moto account"""
+
+    moto = pytest.importorskip('moto')
+    import boto3
+
+    with moto.mock_aws():
+        s3_client = boto3.client('s3', region_name='us-east-1')
+        kms_key_id = boto3.client('kms', region_name='us-east-1').create_key()['KeyMetadata']['KeyId']
+        bucket_name = f"test-migrations-{uuid.uuid4().hex[:8]}"
+        s3_client.create_bucket(Bucket=bucket_name)
+        yield s3_client, bucket_name, kms_key_id
+
+def _scratch_database(env_name: str):
+    url = os.environ.get(env_name)
+    if not url:
+        pytest.skip(f"{env_name} is not set")
+
+    psycopg2 = pytest.importorskip('psycopg2')
+    from psycopg2.extensions import parse_dsn
+
+    server = parse_dsn(url)
+    admin = psycopg2.connect(**server)
+    admin.autocommit = True
+    name = f"lambda_test_{uuid.uuid4().hex[:12]}"
+    with admin.cursor() as cursor:
+        cursor.execute(f'CREATE DATABASE "{name}"')
+
+    try:
+        yield dict(server, dbname=name)
+    finally:
+        with admin.cursor() as cursor:
+            cursor.execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
+        admin.close()
+
+@pytest.fixture
+def source_db():
+    """Connection kwargs of a scratch database on the source server"""
+
+    yield from _scratch_database('TEST_SOURCE_DATABASE_URL')
+
+@pytest.fixture
+def target_db():
+    """Connection kwargs of a scratch database on the target server"""
+
+    yield from _scratch_database('TEST_TARGET_DATABASE_URL')
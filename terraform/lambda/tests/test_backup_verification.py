@@ -0,0 +1,192 @@
+"""
+Backup then verify round trips: a backup of the source database restored
+into a scratch database on the target server must reproduce the dump-time
+row counts and checksums.
+
+Needs both test servers, moto, and the PostgreSQL client tools on PATH
+(psql for Python dumps, pg_dump and pg_restore for custom dumps).
+"""
+
+import json
+import shutil
+
+import pytest
+
+psycopg2 = pytest.importorskip('psycopg2')
+
+import db_backup
+from logical_dump import table_checksums
+
+SCHEMA = """
+    CREATE TABLE customers (
+        id serial PRIMARY KEY,
+        name text NOT NULL,
+        notes text,
+        balance numeric(14, 2),
+        profile jsonb,
+        avatar bytea,
+        created_at timestamptz DEFAULT now()
+    );
+    CREATE TABLE orders (
+        id bigint GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+        customer_id integer NOT NULL REFERENCES customers (id),
+        total numeric(14, 2) NOT NULL CHECK (total >= 0)
+    );
+    CREATE INDEX orders_customer_id ON orders (customer_id);
+    CREATE TABLE tenant_notes (id integer PRIMARY KEY, tenant text NOT NULL, body text);
+    ALTER TABLE tenant_notes ENABLE ROW LEVEL SECURITY;
+    CREATE POLICY tenant_notes_by_tenant ON tenant_notes USING (tenant = current_user);
+    CREATE TABLE empty_table (id integer PRIMARY KEY);
+
+    INSERT INTO customers (name, notes, balance, profile, avatar, created_at)
+    SELECT 'customer ' || g,
+           CASE WHEN g % 7 = 0 THEN NULL ELSE E'tab\\there\\nnew line \\\\ backslash ' || g END,
+           g * 1.25,
+           jsonb_build_object('tier', g % 3, 'tags', jsonb_build_array('a', g)),
+           decode(md5(g::text), 'hex'),
+           timestamptz '2024-01-01 00:00:00+00' + g * interval '1 hour'
+    FROM generate_series(1, 2000) g;
+    INSERT INTO orders (customer_id, total) SELECT 1 + g % 2000, g % 500 FROM generate_series(1, 5000) g;
+    INSERT INTO tenant_notes SELECT g, 'tenant' || g % 4, 'note ' || g FROM generate_series(1, 100) g;
+"""
+
+DUMPERS = {
+    'python': ('psql',),
+    'pg_dump': ('pg_dump', 'pg_restore')
+}
+
+def _endpoint(db):
+    return f"{db.get('host', 'localhost')}:{db.get('port', 5432)}"
+
+@pytest.fixture
+def source(source_db):
+    conn = psycopg2.connect(**source_db)
+    with conn.cursor() as cursor:
+        cursor.execute(SCHEMA)
+    conn.commit()
+    yield source_db, conn
+    conn.close()
+
+@pytest.fixture(params=sorted(DUMPERS))
+def backup(request, source, s3_bucket):
+    missing = [tool for tool in DUMPERS[request.param] if shutil.which(tool) is None]
+    if missing:
+        pytest.skip(f"{', '.join(missing)} not on PATH")
+
+    source_db, _ = source
+    s3_client, bucket, _ = s3_bucket
+    timestamp = '20240101_000000'
+    args = (s3_client, bucket, _endpoint(source_db), source_db['dbname'], source_db.get('user'),
+            source_db.get('password', ''), f"test_{timestamp}.sql.gz", timestamp)
+
+    if request.param == 'python':
+        upload = db_backup.stream_python_dump(*args)
+    else:
+        upload = db_backup.stream_database_dump(*args)
+
+    return request.param, upload['s3_key']
+
+@pytest.fixture
+def verify(target_db, s3_bucket):
+    s3_client, bucket, _ = s3_bucket
+    scratch_db = f"{target_db['dbname']}_scratch"
+
+    def run(backup_key, **kwargs):
+        return db_backup.verify_backup(
+            s3_client, bucket, _endpoint(target_db), scratch_db, target_db.get('user'),
+            target_db.get('password', ''), backup_key=backup_key, jobs=2, **kwargs
+        )
+
+    yield run
+    db_backup.recreate_scratch_database(_endpoint(target_db), target_db.get('user'), target_db.get('password', ''),
+                                        scratch_db, create=False)
+
+def _reference(s3_bucket, backup_key):
+    s3_client, bucket, _ = s3_bucket
+    response = s3_client.get_object(Bucket=bucket, Key=f"{backup_key}.verify.json")
+    return json.loads(response['Body'].read())
+
+def test_restored_backup_matches_dump_time_checksums(source, backup, verify, s3_bucket):
+    _, conn = source
+    dumper, backup_key = backup
+
+    with conn.cursor() as cursor:
+        source_checksums = table_checksums(cursor)
+    conn.rollback()
+
+    reference = _reference(s3_bucket, backup_key)
+    assert reference['tables'] == source_checksums
+    assert reference['tables']['public.customers']['rows'] == 2000
+
+    result = verify(backup_key)
+
+    assert result['verified'], result['mismatches']
+    assert result['backup_format'] == ('gzip' if dumper == 'python' else 'custom')
+    assert result['tables_verified'] == len(source_checksums)
+    assert result['rows_verified'] == sum(table['rows'] for table in source_checksums.values())
+
+def test_restored_copy_keeps_row_security(source, backup, verify, target_db):
+    _, backup_key = backup
+
+    verify(backup_key, keep_scratch=True)
+
+    conn = psycopg2.connect(**dict(target_db, dbname=f"{target_db['dbname']}_scratch"))
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT relrowsecurity FROM pg_class WHERE oid = 'tenant_notes'::regclass")
+            assert cursor.fetchone()[0]
+            cursor.execute("SELECT polname FROM pg_policy")
+            assert cursor.fetchall() == [('tenant_notes_by_tenant',)]
+    finally:
+        conn.close()
+
+def test_changed_reference_fails_verification(backup, verify, s3_bucket):
+    s3_client, bucket, _ = s3_bucket
+    _, backup_key = backup
+
+    reference = _reference(s3_bucket, backup_key)
+    reference['tables']['public.orders']['checksum'] = '0'
+    reference['tables']['public.customers']['rows'] += 1
+    reference['tables']['public.dropped_table'] = {'rows': 1, 'checksum': '1'}
+    db_backup.store_verification_reference(s3_client, bucket, backup_key, reference)
+
+    result = verify(backup_key)
+
+    assert not result['verified']
+    assert result['reference_available']
+    assert sorted(result['mismatches'], key=lambda mismatch: mismatch['table']) == [
+        {'table': 'public.customers', 'problem': 'row_count', 'expected': 2001, 'actual': 2000},
+        {'table': 'public.dropped_table', 'problem': 'missing'},
+        {'table': 'public.orders', 'problem': 'checksum'}
+    ]
+
+@pytest.mark.parametrize('event', [
+    {},
+    {'verify_endpoint': 'production.example.com:5432'},
+    {'verify_endpoint': 'production.example.com'},
+    {'verify_endpoint': 'Production.Example.com.:5432'},
+    {'verify_endpoint': 'scratch.example.com', 'scratch_db_name': 'crm'},
+    {'verify_endpoint': 'scratch.example.com', 'scratch_db_name': 'postgres'}
+])
+def test_verification_refuses_to_touch_production(monkeypatch, event):
+    monkeypatch.delenv('BACKUP_VERIFY_ENDPOINT', raising=False)
+    monkeypatch.delenv('BACKUP_VERIFY_DATABASE', raising=False)
+    monkeypatch.delenv('SNS_TOPIC_ARN', raising=False)
+    monkeypatch.setenv('DB_ENDPOINT', 'production.example.com:5432')
+    monkeypatch.setenv('DB_NAME', 'crm')
+
+    credentials_requested = []
+    monkeypatch.setattr(db_backup, 'get_db_credentials', lambda *args: credentials_requested.append(args))
+
+    response = db_backup.handle_backup_verification(
+        event, None, None, None, 'bucket', 'crm', 'project', 'test', '20240101_000000'
+    )
+    assert response['statusCode'] == 500
+    # Rejected before anything connects to a database
+    assert not credentials_requested
+
+def test_same_instance_compares_host_and_port():
+    assert db_backup.same_instance('db.example.com', 'DB.example.com:5432')
+    assert not db_backup.same_instance('db.example.com:5433', 'db.example.com:5432')
+    assert not db_backup.same_instance('scratch.example.com', 'db.example.com')
+    assert not db_backup.same_instance('scratch.example.com', None)
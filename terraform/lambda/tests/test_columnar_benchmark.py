@@ -0,0 +1,113 @@
+"""
+Arrow IPC backup against the JSON backup format on the same rows.
+
+Run with -s to see the size and encode time comparison. Needs pyarrow,
+moto and the source test server.
+"""
+
+import math
+
+import pytest
+
+pyarrow = pytest.importorskip('pyarrow')
+psycopg2 = pytest.importorskip('psycopg2')
+
+from columnar_backup import ColumnarBackupWriter, json_backup_bytes, restore_table
+from migration_utils import MigrationUtils
+
+ROWS = 20000
+BATCH_SIZE = 3000
+
+SCHEMA = f"""
+    CREATE TABLE customers (
+        id integer PRIMARY KEY,
+        name text NOT NULL,
+        status text NOT NULL,
+        balance numeric(14, 2),
+        active boolean,
+        profile jsonb,
+        created_at timestamptz
+    );
+    INSERT INTO customers
+    SELECT g,
+           'customer ' || g,
+           (ARRAY['lead', 'prospect', 'customer', 'churned'])[1 + g % 4],
+           g * 1.25,
+           g % 3 <> 0,
+           CASE WHEN g % 5 = 0 THEN NULL ELSE jsonb_build_object('tier', g % 3, 'owner', 'rep ' || g) END,
+           timestamptz '2024-01-01 00:00:00+00' + g * interval '1 minute'
+    FROM generate_series(1, {ROWS}) g;
+"""
+
+@pytest.fixture
+def conn(source_db):
+    conn = psycopg2.connect(**source_db)
+    with conn.cursor() as cursor:
+        cursor.execute(SCHEMA)
+    conn.commit()
+    yield conn
+    conn.close()
+
+@pytest.fixture
+def utils(s3_bucket):
+    s3_client, bucket_name, kms_key_id = s3_bucket
+    return MigrationUtils(s3_client, bucket_name, kms_key_id, 'benchmark')
+
+def test_json_comparison_encodes_one_object_per_row(conn, utils):
+    writer = ColumnarBackupWriter(utils, 'backups/benchmark', batch_size=BATCH_SIZE, benchmark=True)
+    entry = writer.backup_table(conn, 'customers')
+    index = writer.close()
+    conn.rollback()
+
+    # The same rows as the writer selects them, encoded as one JSON document
+    columns = writer.describe_table(conn.cursor(), 'customers')
+    select_list = ', '.join(
+        f'"{column["name"]}"' if column['arrow_type'] is not None else f'"{column["name"]}"::text'
+        for column in columns
+    )
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT {select_list} FROM customers")
+    whole_table = json_backup_bytes(entry['columns'], cursor.fetchall())
+    conn.rollback()
+
+    # Each batch is its own JSON list: "[\n" and "\n]" instead of one ",\n" separator between batches
+    batches = math.ceil(ROWS / BATCH_SIZE)
+    comparison = entry['json_comparison']
+    assert comparison['json_bytes'] == len(whole_table) + 2 * (batches - 1)
+    assert whole_table.startswith(b'[\n  {\n    "id": ')
+
+    assert entry['rows'] == ROWS
+    assert entry['dictionary_columns'] == ['status']
+    assert comparison['size_ratio'] > 1
+    assert index['json_comparison']['json_bytes'] == comparison['json_bytes']
+    assert index['json_comparison']['columnar_bytes'] == entry['size_bytes']
+
+    print(
+        f"\n{ROWS} rows: JSON {comparison['json_bytes']} bytes in {comparison['json_encode_seconds']}s, "
+        f"Arrow IPC {entry['size_bytes']} bytes in {comparison['arrow_encode_seconds']}s "
+        f"({comparison['size_ratio']}x smaller)"
+    )
+
+def test_benchmarked_backup_restores(conn, utils):
+    writer = ColumnarBackupWriter(utils, 'backups/benchmark', batch_size=BATCH_SIZE, benchmark=True)
+    entry = writer.backup_table(conn, 'customers')
+    writer.close()
+    conn.rollback()
+
+    with conn.cursor() as cursor:
+        cursor.execute("CREATE TABLE customers_restored (LIKE customers)")
+    conn.commit()
+
+    rows, _ = restore_table(utils, conn, entry, target_table='customers_restored')
+    conn.commit()
+
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT count(*) FROM (
+                (TABLE customers EXCEPT ALL TABLE customers_restored)
+                UNION ALL
+                (TABLE customers_restored EXCEPT ALL TABLE customers)
+            ) difference
+        """)
+        assert cursor.fetchone()[0] == 0
+    assert rows == ROWS
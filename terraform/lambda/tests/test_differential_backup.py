@@ -0,0 +1,166 @@
+"""
+Differential backups: a base, then a dump of only the changed tables,
+restored together into a database on the target server.
+
+Needs both test servers, moto, and pg_dump, pg_restore and psql on PATH.
+"""
+
+import shutil
+import time
+
+import pytest
+
+psycopg2 = pytest.importorskip('psycopg2')
+
+import db_backup
+from logical_dump import table_checksums
+
+SCHEMA = """
+    CREATE TABLE parent (id serial PRIMARY KEY, name text NOT NULL);
+    CREATE TABLE child (
+        id serial PRIMARY KEY,
+        parent_id integer NOT NULL REFERENCES parent (id),
+        amount numeric(12, 2)
+    );
+    CREATE TABLE untouched (id integer PRIMARY KEY, body text);
+
+    INSERT INTO parent (name) SELECT 'parent ' || g FROM generate_series(1, 50) g;
+    INSERT INTO child (parent_id, amount) SELECT 1 + g % 50, g * 0.5 FROM generate_series(1, 500) g;
+    INSERT INTO untouched SELECT g, 'row ' || g FROM generate_series(1, 100) g;
+"""
+
+def _endpoint(db):
+    return f"{db.get('host', 'localhost')}:{db.get('port', 5432)}"
+
+@pytest.fixture
+def source(source_db):
+    missing = [tool for tool in ('pg_dump', 'pg_restore', 'psql') if shutil.which(tool) is None]
+    if missing:
+        pytest.skip(f"{', '.join(missing)} not on PATH")
+
+    conn = psycopg2.connect(**source_db)
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute(SCHEMA)
+    _flush_statistics(conn)
+    yield source_db, conn
+    conn.close()
+
+@pytest.fixture
+def backup(source, s3_bucket, monkeypatch):
+    """Run create_differential_backup as a weekly (base) or daily run"""
+
+    source_db, _ = source
+    s3_client, bucket, _ = s3_bucket
+    runs = iter(range(1, 100))
+
+    def run(backup_type):
+        monkeypatch.setattr(db_backup, 'determine_backup_type', lambda timestamp: backup_type)
+        timestamp = f"20240101_0000{next(runs):02d}"
+        return db_backup.create_differential_backup(
+            s3_client, bucket, _endpoint(source_db), source_db['dbname'], source_db.get('user'),
+            source_db.get('password', ''), f"test_{timestamp}.sql.gz", timestamp
+        )
+
+    return run
+
+@pytest.fixture
+def restore(target_db, s3_bucket):
+    s3_client, bucket, _ = s3_bucket
+
+    def run():
+        return db_backup.restore_differential_backup(
+            s3_client, bucket, _endpoint(target_db), target_db['dbname'], target_db.get('user'),
+            target_db.get('password', '')
+        )
+
+    return run
+
+def _flush_statistics(conn):
+    # Change counters reach pg_stat_user_tables up to a second after the statements that made them
+    if conn.server_version >= 150000:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_stat_force_next_flush()")
+            cursor.execute("SELECT 1")
+    else:
+        time.sleep(1.5)
+
+def _state(conn):
+    with conn.cursor() as cursor:
+        checksums = table_checksums(cursor)
+        cursor.execute("SELECT last_value FROM child_id_seq")
+        last_value = cursor.fetchone()[0]
+    conn.rollback()
+    return checksums, last_value
+
+def test_restore_applies_the_latest_differential(source, backup, restore, target_db):
+    _, conn = source
+
+    assert backup('weekly')['differential']['type'] == 'base'
+
+    with conn.cursor() as cursor:
+        cursor.execute("INSERT INTO child (parent_id, amount) SELECT 1, g FROM generate_series(1, 40) g")
+        cursor.execute("DELETE FROM child WHERE id % 10 = 0")
+        cursor.execute("UPDATE child SET amount = amount + 1 WHERE parent_id = 2")
+    _flush_statistics(conn)
+
+    upload = backup('daily')
+    assert upload['differential']['type'] == 'differential'
+    assert upload['differential']['changed'] == ['public.child']
+    assert upload['s3_key'].endswith('_diff.sql.gz')
+
+    result = restore()
+    assert result['differential_tables'] == ['public.child']
+
+    restored = psycopg2.connect(**target_db)
+    try:
+        assert _state(restored) == _state(conn)
+    finally:
+        restored.close()
+
+def test_restore_without_changes_uses_the_base(source, backup, restore, target_db):
+    _, conn = source
+
+    backup('weekly')
+    assert backup('daily')['differential']['tables_changed'] == 0
+
+    result = restore()
+    assert result['differential_backup'] is None
+
+    restored = psycopg2.connect(**target_db)
+    try:
+        assert _state(restored) == _state(conn)
+    finally:
+        restored.close()
+
+def test_column_change_writes_a_new_base(source, backup, restore, target_db):
+    _, conn = source
+
+    backup('weekly')
+
+    # ADD COLUMN with no default keeps the filenode and the set of tables
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT pg_relation_filenode('child')")
+        filenode = cursor.fetchone()[0]
+        cursor.execute("ALTER TABLE child ADD COLUMN note text")
+        cursor.execute("UPDATE child SET note = 'noted' WHERE id <= 20")
+        cursor.execute("SELECT pg_relation_filenode('child')")
+        assert cursor.fetchone()[0] == filenode
+    _flush_statistics(conn)
+
+    upload = backup('daily')
+    assert upload['differential']['type'] == 'base'
+
+    # The next daily run is a differential against the new base again
+    with conn.cursor() as cursor:
+        cursor.execute("UPDATE child SET note = 'later' WHERE id > 480")
+    _flush_statistics(conn)
+    assert backup('daily')['differential']['changed'] == ['public.child']
+
+    restore()
+
+    restored = psycopg2.connect(**target_db)
+    try:
+        assert _state(restored) == _state(conn)
+    finally:
+        restored.close()
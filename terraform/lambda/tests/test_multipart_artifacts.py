@@ -0,0 +1,106 @@
+"""Multipart artifact writer and reader round trips against moto S3"""
+
+import os
+
+import pytest
+
+from migration_utils import MigrationUtils, MultipartArtifactReader, MultipartArtifactWriter
+
+PART_SIZE = MultipartArtifactWriter.MIN_PART_SIZE
+
+@pytest.fixture
+def utils(s3_bucket):
+    s3_client, bucket_name, kms_key_id = s3_bucket
+    return MigrationUtils(s3_client, bucket_name, kms_key_id, 'test-migration')
+
+def _pending_uploads(utils):
+    return utils.s3_client.list_multipart_uploads(Bucket=utils.bucket_name).get('Uploads', [])
+
+def test_uncompressed_round_trip_spans_several_parts(utils):
+    data = os.urandom(2 * PART_SIZE + 12345)
+
+    with utils.open_artifact_writer('raw.bin', part_size=PART_SIZE, max_concurrency=2) as writer:
+        for start in range(0, len(data), 1024 * 1024):
+            writer.write(data[start:start + 1024 * 1024])
+
+    assert len(writer.parts) == 3
+    assert writer.tell() == len(data)
+    assert not _pending_uploads(utils)
+
+    stored = utils.s3_client.get_object(Bucket=utils.bucket_name, Key='migrations/test-migration/raw.bin')
+    assert stored['Body'].read() == data
+    assert stored['Metadata']['compression'] == 'none'
+    assert stored['ServerSideEncryption'] == 'aws:kms'
+
+    # Reader windows smaller than, and not aligned with, the uploaded parts
+    with utils.open_artifact_reader('raw.bin', part_size=3 * 1024 * 1024 + 7, max_concurrency=3) as reader:
+        assert b''.join(reader.iter_chunks(999_999)) == data
+        assert reader.bytes_read == len(data)
+
+def test_gzip_round_trip_takes_compression_from_metadata(utils):
+    lines = b''.join(f"{i}\tcustomer {i}\t{i * 3.5}\n".encode() for i in range(400_000))
+
+    with utils.open_artifact_writer('rows.copy.gz', compression='gzip', part_size=PART_SIZE) as writer:
+        for start in range(0, len(lines), 65536):
+            writer.write(lines[start:start + 65536])
+
+    assert writer.raw_bytes == len(lines)
+    assert writer.bytes_written < len(lines)
+
+    reader = utils.open_artifact_reader('rows.copy.gz', part_size=64 * 1024)
+    assert reader.compression == 'gzip'
+    assert reader.read() == lines
+    assert reader.read() == b''
+    assert reader.closed
+
+def test_empty_artifact_completes_with_one_part(utils):
+    with utils.open_artifact_writer('empty.bin') as writer:
+        pass
+
+    assert len(writer.parts) == 1
+    assert utils.open_artifact_reader('empty.bin').read() == b''
+
+def test_ranged_reader_returns_only_the_requested_bytes(utils):
+    data = bytes(range(256)) * 40_000
+
+    with utils.open_artifact_writer('ranged.bin') as writer:
+        writer.write(data)
+
+    reader = MultipartArtifactReader(utils.s3_client, utils.bucket_name, 'migrations/test-migration/ranged.bin',
+                                     part_size=100_000, start=1_000_003, length=2_500_000)
+    assert reader.read() == data[1_000_003:3_500_003]
+
+def test_exception_inside_writer_aborts_upload(utils):
+    with pytest.raises(RuntimeError):
+        with utils.open_artifact_writer('failed.bin', part_size=PART_SIZE) as writer:
+            writer.write(os.urandom(PART_SIZE + 1))
+            assert _pending_uploads(utils)
+            raise RuntimeError("source read failed")
+
+    assert writer.closed
+    assert not _pending_uploads(utils)
+    listing = utils.s3_client.list_objects_v2(Bucket=utils.bucket_name, Prefix='migrations/test-migration/')
+    assert listing['KeyCount'] == 0
+
+def test_abort_after_close_keeps_the_object(utils):
+    writer = utils.open_artifact_writer('kept.bin')
+    writer.write(b'complete')
+    writer.close()
+    writer.abort()
+
+    assert utils.open_artifact_reader('kept.bin').read() == b'complete'
+
+def test_zstd_round_trip(utils):
+    pytest.importorskip('zstandard')
+    data = b'zstd artifact line\n' * 200_000
+
+    with utils.open_artifact_writer('rows.zst', compression='zstd') as writer:
+        writer.write(data)
+
+    assert utils.open_artifact_reader('rows.zst').read() == data
+
+def test_unknown_compression_is_rejected_before_upload(utils):
+    with pytest.raises(ValueError, match='Unsupported compression'):
+        utils.open_artifact_writer('bad.bin', compression='lz4')
+
+    assert not _pending_uploads(utils)
@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+"""
+Transfer Engine Module
+DM_CRM Sales Dashboard - Data Migration Bulk Transfer
+
+COPY-protocol table transfer between the source and target databases.
+Rows are streamed from COPY ... TO STDOUT on the source straight into
+COPY ... FROM STDIN on the target through a bounded in-memory pipe, so a
+table is never materialized as Python tuples.
+"""
+
+import hashlib
+import itertools
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, Iterator, Callable, ContextManager
+
+logger = logging.getLogger(__name__)
+
+COPY_FORMATS = ('binary', 'text', 'csv')
+INTEGER_KEY_TYPES = ('smallint', 'integer', 'bigint')
+
+class TransferError(Exception):
+    """Custom exception for bulk transfer errors"""
+    pass
+
+class TransferDeferred(TransferError):
+    """Raised when a transfer is not started because the time budget is spent"""
+    pass
+
+class CopyPipe:
+    """Bounded buffer joining a COPY TO STDOUT writer with a COPY FROM STDIN reader"""
+
+    _EOF = object()
+
+    def __init__(self, chunk_size: int = 1024 * 1024, max_chunks: int = 16):
+        self.chunk_size = chunk_size
+        self.bytes_transferred = 0
+        self._digest = hashlib.md5()
+        self._chunks = queue.Queue(maxsize=max_chunks)
+        self._pending = bytearray()
+        self._current = memoryview(b'')
+        self._finished = False
+        self._aborted = threading.Event()
+
+    # Writer side - called by psycopg2 for every row of the source COPY
+
+    def write(self, data) -> int:
+        """Buffer COPY output, handing full chunks to the reader"""
+
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+
+        self._pending += data
+        if len(self._pending) >= self.chunk_size:
+            self._put(bytes(self._pending))
+            self._pending = bytearray()
+
+        return len(data)
+
+    def close(self, error: Optional[BaseException] = None):
+        """Flush remaining output and signal end of stream (or a source failure)"""
+
+        if error is None and self._pending:
+            self._put(bytes(self._pending))
+        self._pending = bytearray()
+        self._put(error if error is not None else self._EOF)
+
+    def abort(self):
+        """Stop the writer after the reader side has failed"""
+        self._aborted.set()
+
+    def _put(self, item):
+        # Block while the buffer is full so the source cannot outrun the target
+        while True:
+            if self._aborted.is_set():
+                raise TransferError("COPY pipe aborted by target")
+            try:
+                self._chunks.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    # Reader side - called by psycopg2 to feed the target COPY
+
+    def read(self, size: int = -1) -> bytes:
+        """Return up to size bytes of COPY data, or b'' at end of stream"""
+
+        if not self._current:
+            if self._finished:
+                return b''
+
+            item = self._chunks.get()
+            if item is self._EOF:
+                self._finished = True
+                return b''
+            if isinstance(item, BaseException):
+                self._finished = True
+                raise TransferError(f"Source COPY failed: {item}")
+
+            self._current = memoryview(item)
+
+        if size is None or size < 0:
+            size = len(self._current)
+
+        data = self._current[:size].tobytes()
+        self._current = self._current[size:]
+        self.bytes_transferred += len(data)
+        self._digest.update(data)
+        return data
+
+    @property
+    def checksum(self) -> str:
+        """MD5 of the COPY stream delivered to the target so far"""
+        return self._digest.hexdigest()
+
+    def readline(self, size: int = -1) -> bytes:
+        return self.read(size)
+
+class CopyTransferEngine:
+    """Stream tables between two PostgreSQL connections using the COPY protocol"""
+
+    def __init__(self, copy_format: str = 'binary', chunk_size: int = 1024 * 1024, max_buffered_chunks: int = 16):
+        if copy_format not in COPY_FORMATS:
+            raise TransferError(f"Unsupported COPY format: {copy_format}")
+
+        self.copy_format = copy_format
+        self.chunk_size = chunk_size
+        self.max_buffered_chunks = max_buffered_chunks
+
+    def get_table_columns(self, cursor, table_name: str) -> List[str]:
+        """Get the ordered column list of a table"""
+
+        cursor.execute("""
+            SELECT column_name
+            FROM information_schema.columns
+            WHERE table_schema = 'public'
+            AND table_name = %s
+            ORDER BY ordinal_position
+        """, (table_name,))
+
+        return [row[0] for row in cursor.fetchall()]
+
+    def table_has_rows(self, cursor, table_name: str, where: Optional[str] = None) -> bool:
+        """Check whether a table (or a filtered slice of it) has any rows"""
+
+        where_clause = f"WHERE {where}" if where else ""
+        cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {table_name} {where_clause})")
+        return cursor.fetchone()[0]
+
+    def transfer_table(self, source_conn, target_conn, table_name: str,
+                       columns: Optional[List[str]] = None, where: Optional[str] = None,
+                       target_table: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Copy rows of a table from source to target.
+
+        The source COPY runs on a background thread and writes into a bounded
+        CopyPipe; the target COPY consumes the pipe on the calling thread.
+        Rows go to target_table when given (e.g. a staging table), otherwise
+        to the table of the same name. Transaction control is left to the caller.
+        """
+
+        if columns is None:
+            columns = self.get_table_columns(source_conn.cursor(), table_name)
+        if not columns:
+            raise TransferError(f"No columns found for table {table_name}")
+
+        column_list = ', '.join(f'"{column}"' for column in columns)
+        where_clause = f"WHERE {where}" if where else ""
+        options = f"(FORMAT {self.copy_format})"
+
+        copy_out = f"COPY (SELECT {column_list} FROM {table_name} {where_clause}) TO STDOUT WITH {options}"
+        copy_in = f"COPY {target_table or table_name} ({column_list}) FROM STDIN WITH {options}"
+
+        pipe = CopyPipe(self.chunk_size, self.max_buffered_chunks)
+        source_errors = []
+
+        def produce():
+            try:
+                source_conn.cursor().copy_expert(copy_out, pipe, size=self.chunk_size)
+                pipe.close()
+            except Exception as e:
+                source_errors.append(e)
+                try:
+                    pipe.close(e)
+                except TransferError:
+                    pass
+
+        started = time.monotonic()
+        producer = threading.Thread(target=produce, name=f"copy-out-{table_name}", daemon=True)
+        producer.start()
+
+        target_cursor = target_conn.cursor()
+        try:
+            target_cursor.copy_expert(copy_in, pipe, size=self.chunk_size)
+        except Exception:
+            # Unblock and stop the source COPY before surfacing the target error
+            pipe.abort()
+            source_conn.cancel()
+            producer.join()
+            raise
+
+        producer.join()
+        if source_errors:
+            raise source_errors[0]
+
+        elapsed = time.monotonic() - started
+        rows = target_cursor.rowcount
+
+        logger.info(f"COPY {table_name}: {rows} rows, {pipe.bytes_transferred} bytes in {elapsed:.2f}s")
+
+        return {
+            'table': table_name,
+            'rows': rows,
+            'bytes': pipe.bytes_transferred,
+            'checksum': pipe.checksum,
+            'seconds': round(elapsed, 3),
+            'format': self.copy_format
+        }
+
+class TableStreamReader:
+    """Read query results through server-side (named) cursors in bounded batches"""
+
+    _cursor_ids = itertools.count(1)
+
+    def __init__(self, batch_size: int = 2000):
+        self.batch_size = batch_size
+        self.rows_read = 0
+        self.columns: List[str] = []
+
+    def iter_batches(self, conn, query: str, params: Optional[tuple] = None) -> Iterator[List[tuple]]:
+        """
+        Yield result rows in lists of at most batch_size.
+
+        Only one batch is held client-side at a time; the rest of the result
+        stays on the server. Named cursors need an open transaction, so the
+        connection must not be in autocommit mode. The column names of the
+        current query are available in self.columns after the first fetch.
+        """
+
+        cursor = conn.cursor(name=f"stream_{next(self._cursor_ids)}")
+        cursor.itersize = self.batch_size
+        self.columns = []
+
+        try:
+            cursor.execute(query, params)
+
+            while True:
+                rows = cursor.fetchmany(self.batch_size)
+
+                if not self.columns and cursor.description:
+                    self.columns = [desc[0] for desc in cursor.description]
+
+                if not rows:
+                    break
+
+                self.rows_read += len(rows)
+                yield rows
+        finally:
+            cursor.close()
+
+    def iter_records(self, conn, table_name: str) -> Iterator[Dict[str, Any]]:
+        """Yield every row of a table as a column -> value dict"""
+
+        for rows in self.iter_batches(conn, f"SELECT * FROM {table_name}"):
+            for row in rows:
+                yield dict(zip(self.columns, row))
+
+class RangePartitioner:
+    """Split a large table into key or ctid ranges and copy them concurrently"""
+
+    def __init__(self, engine: CopyTransferEngine, partitions: int = 4, key_column: str = 'id',
+                 max_workers: Optional[int] = None):
+        self.engine = engine
+        self.partitions = max(1, partitions)
+        self.key_column = key_column
+        self.max_workers = max(1, max_workers or self.partitions)
+
+    def estimate_row_count(self, cursor, table_name: str) -> int:
+        """Cheap row estimate from planner statistics (pg_class.reltuples)"""
+
+        cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", (table_name,))
+        row = cursor.fetchone()
+        return max(int(row[0]), 0) if row else 0
+
+    def plan_ranges(self, cursor, table_name: str) -> List[Dict[str, Any]]:
+        """
+        Build non-overlapping WHERE clauses that together cover the whole table.
+
+        Integer keys are split evenly between min and max; other tables are
+        split by heap page (ctid) ranges. The first and last ranges are
+        open-ended so rows outside the sampled bounds are never missed, which
+        also keeps a stored plan valid if the source changes before a resume.
+        """
+
+        cursor.execute("""
+            SELECT data_type
+            FROM information_schema.columns
+            WHERE table_schema = 'public'
+            AND table_name = %s
+            AND column_name = %s
+        """, (table_name, self.key_column))
+        key_type = cursor.fetchone()
+
+        if key_type and key_type[0] in INTEGER_KEY_TYPES:
+            cursor.execute(f'SELECT MIN("{self.key_column}"), MAX("{self.key_column}") FROM {table_name}')
+            low, high = cursor.fetchone()
+            if low is None:
+                return [self.whole_table()]
+
+            return self._build_ranges('key', f'"{self.key_column}"', self._split(low, high + 1), str)
+
+        cursor.execute(
+            "SELECT pg_relation_size(%s::regclass) / current_setting('block_size')::bigint",
+            (table_name,)
+        )
+        pages = cursor.fetchone()[0]
+        if not pages:
+            return [self.whole_table()]
+
+        return self._build_ranges('ctid', 'ctid', self._split(0, pages), lambda page: f"'({page},0)'::tid")
+
+    @staticmethod
+    def whole_table() -> Dict[str, Any]:
+        """Single-chunk plan covering the whole table"""
+        return {'chunk_id': '0', 'method': 'none', 'where': None}
+
+    @staticmethod
+    def _build_ranges(method: str, column: str, bounds: List[tuple], literal: Callable[[int], str]) -> List[Dict[str, Any]]:
+        ranges = []
+        for i, (start, end) in enumerate(bounds):
+            conditions = []
+            if i > 0:
+                conditions.append(f"{column} >= {literal(start)}")
+            if i < len(bounds) - 1:
+                conditions.append(f"{column} < {literal(end)}")
+
+            ranges.append({
+                'chunk_id': str(i),
+                'method': method,
+                'start': start,
+                'end': end,
+                'where': ' AND '.join(conditions) or None
+            })
+
+        return ranges
+
+    def _split(self, start: int, end: int) -> List[tuple]:
+        """Split [start, end) into at most self.partitions contiguous ranges"""
+
+        count = max(1, min(self.partitions, end - start))
+        step = (end - start) // count
+        edges = [start + i * step for i in range(count)] + [end]
+        return [(edges[i], edges[i + 1]) for i in range(count)]
+
+    def transfer_table(self, source_conn, table_name: str,
+                       connection_factory: Callable[[], ContextManager]) -> Dict[str, Any]:
+        """Plan ranges for a table and copy all of them"""
+
+        ranges = self.plan_ranges(source_conn.cursor(), table_name)
+        source_conn.rollback()
+        return self.transfer_ranges(source_conn, table_name, ranges, connection_factory)
+
+    def transfer_ranges(self, source_conn, table_name: str, ranges: List[Dict[str, Any]],
+                        connection_factory: Callable[[], ContextManager],
+                        skip_chunks: Optional[set] = None,
+                        replace_existing: bool = False,
+                        on_range_committed: Optional[Callable[[Dict[str, Any], Dict[str, Any]], None]] = None,
+                        should_stop: Optional[Callable[[], bool]] = None) -> Dict[str, Any]:
+        """
+        Copy the given ranges of a table on parallel connection pairs.
+
+        source_conn exports a REPEATABLE READ snapshot that every range
+        worker imports with SET TRANSACTION SNAPSHOT, so all ranges see the
+        same source state. Each range commits on its own target connection,
+        then on_range_committed(range, stats) is called. With
+        replace_existing, target rows inside the range are deleted in the
+        same transaction first, which makes re-copying a key range safe.
+        Ranges not yet started when should_stop() turns true raise
+        TransferDeferred.
+        """
+
+        skip_chunks = skip_chunks or set()
+        pending = [table_range for table_range in ranges if table_range['chunk_id'] not in skip_chunks]
+
+        source_conn.rollback()
+        cursor = source_conn.cursor()
+        cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        cursor.execute("SELECT pg_export_snapshot()")
+        snapshot_id = cursor.fetchone()[0]
+
+        try:
+            columns = self.engine.get_table_columns(cursor, table_name)
+
+            logger.info(
+                f"Copying {table_name} in {len(pending)} of {len(ranges)} {ranges[0]['method']} ranges "
+                f"(snapshot {snapshot_id})"
+            )
+
+            def copy_range(table_range: Dict[str, Any]) -> Dict[str, Any]:
+                if should_stop and should_stop():
+                    raise TransferDeferred(f"Range {table_range['chunk_id']} of {table_name} deferred")
+
+                with connection_factory() as (range_source, range_target):
+                    range_source.rollback()
+                    range_cursor = range_source.cursor()
+                    range_cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                    range_cursor.execute("SET TRANSACTION SNAPSHOT %s", (snapshot_id,))
+
+                    if replace_existing:
+                        where_clause = f"WHERE {table_range['where']}" if table_range['where'] else ""
+                        range_target.cursor().execute(f"DELETE FROM {table_name} {where_clause}")
+
+                    stats = self.engine.transfer_table(
+                        range_source, range_target, table_name, columns=columns, where=table_range['where']
+                    )
+                    range_target.commit()
+                    range_source.rollback()
+
+                    stats['range'] = {key: value for key, value in table_range.items() if key != 'where'}
+                    if on_range_committed:
+                        on_range_committed(table_range, stats)
+                    return stats
+
+            started = time.monotonic()
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, max(len(pending), 1)),
+                                    thread_name_prefix=f"range-{table_name}") as executor:
+                range_stats = list(executor.map(copy_range, pending))
+            elapsed = time.monotonic() - started
+
+        finally:
+            # Ending the exporting transaction releases the snapshot
+            source_conn.rollback()
+
+        return {
+            'table': table_name,
+            'rows': sum(stats['rows'] for stats in range_stats),
+            'bytes': sum(stats['bytes'] for stats in range_stats),
+            'seconds': round(elapsed, 3),
+            'format': self.engine.copy_format,
+            'partitions': range_stats
+        }
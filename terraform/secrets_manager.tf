@@ -284,6 +284,11 @@ data "archive_file" "secret_rotation_zip" {
     })
     filename = "index.py"
   }
+  
+  source {
+    content = file("${path.module}/lambda/lambda_runtime.py")
+    filename = "lambda_runtime.py"
+  }
 }
 
 resource "aws_iam_role" "lambda_rotation_role" {
@@ -325,19 +330,23 @@ resource "aws_iam_role_policy" "lambda_rotation_policy" {
           "secretsmanager:DescribeSecret",
           "secretsmanager:GetSecretValue",
           "secretsmanager:PutSecretValue",
-          "secretsmanager:UpdateSecretVersionStage"
+          "secretsmanager:UpdateSecretVersionStage",
+          "secretsmanager:RotateSecret"
         ]
         Resource = [
           aws_secretsmanager_secret.database_credentials.arn,
           aws_secretsmanager_secret.jwt_secrets.arn,
+          aws_secretsmanager_secret.app_config.arn,
           "${aws_secretsmanager_secret.database_credentials.arn}*",
-          "${aws_secretsmanager_secret.jwt_secrets.arn}*"
+          "${aws_secretsmanager_secret.jwt_secrets.arn}*",
+          "${aws_secretsmanager_secret.app_config.arn}*"
         ]
       },
       {
         Effect = "Allow"
         Action = [
-          "rds:ModifyDBInstance"
+          "rds:ModifyDBInstance",
+          "rds:DescribeDBInstances"
         ]
         Resource = aws_db_instance.main.arn
       }
@@ -368,27 +377,43 @@ resource "aws_cloudwatch_metric_alarm" "secret_access_failures" {
   }
 }
 
-# EventBridge rule for secret rotation schedule
-resource "aws_cloudwatch_event_rule" "secret_rotation_schedule" {
-  name                = "${var.project_name}-secret-rotation-schedule-${var.environment}"
-  description         = "Trigger secret rotation"
-  schedule_expression = "rate(30 days)"  # Rotate every 30 days
+# Secrets Manager schedules rotation and invokes the function once per step
+resource "aws_lambda_permission" "allow_secretsmanager_rotation" {
+  statement_id  = "AllowExecutionFromSecretsManager"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.secret_rotation.function_name
+  principal     = "secretsmanager.amazonaws.com"
+}
+
+resource "aws_secretsmanager_secret_rotation" "database_credentials" {
+  secret_id           = aws_secretsmanager_secret.database_credentials.id
+  rotation_lambda_arn = aws_lambda_function.secret_rotation.arn
   
-  tags = {
-    Name = "${var.project_name}-secret-rotation-schedule-${var.environment}"
+  rotation_rules {
+    automatically_after_days = 30
   }
+  
+  depends_on = [aws_lambda_permission.allow_secretsmanager_rotation]
 }
 
-resource "aws_cloudwatch_event_target" "secret_rotation_lambda" {
-  rule      = aws_cloudwatch_event_rule.secret_rotation_schedule.name
-  target_id = "SecretRotationLambdaTarget"
-  arn       = aws_lambda_function.secret_rotation.arn
+resource "aws_secretsmanager_secret_rotation" "jwt_secrets" {
+  secret_id           = aws_secretsmanager_secret.jwt_secrets.id
+  rotation_lambda_arn = aws_lambda_function.secret_rotation.arn
+  
+  rotation_rules {
+    automatically_after_days = 30
+  }
+  
+  depends_on = [aws_lambda_permission.allow_secretsmanager_rotation]
 }
 
-resource "aws_lambda_permission" "allow_eventbridge_rotation" {
-  statement_id  = "AllowExecutionFromEventBridge"
-  action        = "lambda:InvokeFunction"
-  function_name = aws_lambda_function.secret_rotation.function_name
-  principal     = "events.amazonaws.com"
-  source_arn    = aws_cloudwatch_event_rule.secret_rotation_schedule.arn
+resource "aws_secretsmanager_secret_rotation" "app_config" {
+  secret_id           = aws_secretsmanager_secret.app_config.id
+  rotation_lambda_arn = aws_lambda_function.secret_rotation.arn
+  
+  rotation_rules {
+    automatically_after_days = 30
+  }
+  
+  depends_on = [aws_lambda_permission.allow_secretsmanager_rotation]
 }
\ No newline at end of file
@@ -393,6 +393,12 @@ variable "backup_notification_email" {
   default     = ""
 }
 
+variable "backup_verify_endpoint" {
+  description = "host:port of a scratch PostgreSQL instance that backups are restored into for verification; leave empty to disable scheduled verification"
+  type        = string
+  default     = ""
+}
+
 # Security Service Configuration
 variable "enable_guardduty" {
   description = "Enable AWS GuardDuty for threat detection"